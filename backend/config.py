@@ -10,6 +10,19 @@ class Settings:
     MONGO_URL: str = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
     DB_NAME: str = os.environ.get('DB_NAME', 'trailroom_db')
     
+    # MongoDB pool and timeouts (0 disables the optional limits)
+    MONGO_MAX_POOL_SIZE: int = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+    MONGO_MIN_POOL_SIZE: int = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '0'))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    MONGO_CONNECT_TIMEOUT_MS: int = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000'))
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '0'))
+    MONGO_COMPRESSORS: str = os.environ.get('MONGO_COMPRESSORS', '')  # e.g. "zstd,zlib"
+    # Analytics/admin reads (Database.get_analytics_db)
+    MONGO_ANALYTICS_READ_PREFERENCE: str = os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+    MONGO_ANALYTICS_MAX_STALENESS_SECONDS: int = int(os.environ.get('MONGO_ANALYTICS_MAX_STALENESS_SECONDS', '0'))
+    
     # JWT
     JWT_SECRET: str = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
     JWT_ALGORITHM: str = 'HS256'
@@ -28,6 +41,127 @@ class Settings:
     RAZORPAY_KEY_ID: str = os.environ.get('RAZORPAY_KEY_ID', '')
     RAZORPAY_KEY_SECRET: str = os.environ.get('RAZORPAY_KEY_SECRET', '')
     
+    # Outbound webhook HTTP client
+    WEBHOOK_HTTP_MAX_CONNECTIONS: int = int(os.environ.get('WEBHOOK_HTTP_MAX_CONNECTIONS', '200'))
+    WEBHOOK_HTTP_MAX_KEEPALIVE: int = int(os.environ.get('WEBHOOK_HTTP_MAX_KEEPALIVE', '50'))
+    WEBHOOK_HTTP_KEEPALIVE_EXPIRY: float = float(os.environ.get('WEBHOOK_HTTP_KEEPALIVE_EXPIRY', '30'))
+    WEBHOOK_HTTP_TIMEOUT: float = float(os.environ.get('WEBHOOK_HTTP_TIMEOUT', '30'))
+    WEBHOOK_HTTP_CONNECT_TIMEOUT: float = float(os.environ.get('WEBHOOK_HTTP_CONNECT_TIMEOUT', '5'))
+    WEBHOOK_HTTP2_ENABLED: bool = os.environ.get('WEBHOOK_HTTP2_ENABLED', 'true').lower() == 'true'
+    
+    # Webhook fan-out
+    WEBHOOK_MAX_CONCURRENT_DELIVERIES: int = int(os.environ.get('WEBHOOK_MAX_CONCURRENT_DELIVERIES', '100'))
+    WEBHOOK_MAX_CONCURRENCY_PER_HOST: int = int(os.environ.get('WEBHOOK_MAX_CONCURRENCY_PER_HOST', '4'))
+    # Per destination host: open at FAILURE_RATE over WINDOW_SECONDS once MIN_CALLS were made
+    WEBHOOK_BREAKER_FAILURE_RATE: float = float(os.environ.get('WEBHOOK_BREAKER_FAILURE_RATE', '0.5'))
+    WEBHOOK_BREAKER_MIN_CALLS: int = int(os.environ.get('WEBHOOK_BREAKER_MIN_CALLS', '5'))
+    WEBHOOK_BREAKER_WINDOW_SECONDS: int = int(os.environ.get('WEBHOOK_BREAKER_WINDOW_SECONDS', '60'))
+    WEBHOOK_BREAKER_RECOVERY_TIMEOUT: int = int(os.environ.get('WEBHOOK_BREAKER_RECOVERY_TIMEOUT', '60'))
+    WEBHOOK_BREAKER_HALF_OPEN_PROBES: int = int(os.environ.get('WEBHOOK_BREAKER_HALF_OPEN_PROBES', '1'))
+    WEBHOOK_SUBSCRIPTION_CACHE_TTL: int = int(os.environ.get('WEBHOOK_SUBSCRIPTION_CACHE_TTL', '60'))
+    WEBHOOK_SUBSCRIPTION_CACHE_MAX_USERS: int = int(os.environ.get('WEBHOOK_SUBSCRIPTION_CACHE_MAX_USERS', '50000'))
+    # Batched events wait in webhook_batch_outbox until their batch is recorded; a sweep delivers
+    # those older than RECOVERY_AFTER (longer than any batch window), left behind by a crashed instance
+    WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS: int = int(os.environ.get('WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS', '360'))
+    WEBHOOK_BATCH_RECOVERY_INTERVAL_SECONDS: int = int(os.environ.get('WEBHOOK_BATCH_RECOVERY_INTERVAL_SECONDS', '60'))
+    WEBHOOK_BATCH_RECOVERY_BATCH_SIZE: int = int(os.environ.get('WEBHOOK_BATCH_RECOVERY_BATCH_SIZE', '5000'))
+    
+    # Try-on rate limits (per user)
+    TRYON_REQUESTS_PER_MINUTE: int = int(os.environ.get('TRYON_REQUESTS_PER_MINUTE', '30'))
+    TRYON_JOBS_PER_HOUR: int = int(os.environ.get('TRYON_JOBS_PER_HOUR', '200'))
+    # 'memory' keeps counters in each process, so over-limit callers are refused without
+    # any database work, but each worker enforces its own limit; 'mongo' shares one limit
+    # across workers at the cost of queries on every request
+    RATE_LIMIT_STORE: str = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    # Set when the API runs as a single worker, so in-memory counts are complete enough
+    # for abuse detection to read instead of querying tryon_jobs
+    RATE_LIMIT_SINGLE_PROCESS: bool = os.environ.get('RATE_LIMIT_SINGLE_PROCESS', 'false').lower() == 'true'
+    
+    # IP blocklist
+    IP_BLOCKLIST_REFRESH_SECONDS: int = int(os.environ.get('IP_BLOCKLIST_REFRESH_SECONDS', '30'))
+    
+    # Prompt registry reload interval (picks up prompt edits made on other instances)
+    PROMPT_REGISTRY_REFRESH_SECONDS: int = int(os.environ.get('PROMPT_REGISTRY_REFRESH_SECONDS', '30'))
+    
+    # Admin listing enrichment
+    USER_EMAIL_CACHE_TTL: int = int(os.environ.get('USER_EMAIL_CACHE_TTL', '300'))
+    USER_EMAIL_CACHE_MAX_SIZE: int = int(os.environ.get('USER_EMAIL_CACHE_MAX_SIZE', '10000'))
+    
+    # Admin listing totals
+    COUNT_CACHE_TTL: int = int(os.environ.get('COUNT_CACHE_TTL', '30'))
+    COUNT_CACHE_MAX_SIZE: int = int(os.environ.get('COUNT_CACHE_MAX_SIZE', '1000'))
+    
+    # Retention in days (0 keeps documents forever); expired documents are
+    # archived to RETENTION_ARCHIVE_DIR, with TTL indexes as a backstop after the grace period
+    AUDIT_LOG_RETENTION_DAYS: int = int(os.environ.get('AUDIT_LOG_RETENTION_DAYS', '0'))
+    USAGE_EVENTS_RETENTION_DAYS: int = int(os.environ.get('USAGE_EVENTS_RETENTION_DAYS', '90'))
+    WEBHOOK_DELIVERIES_RETENTION_DAYS: int = int(os.environ.get('WEBHOOK_DELIVERIES_RETENTION_DAYS', '30'))
+    # Opt-in: stripped try-on results are only recoverable from the archive
+    TRYON_RESULT_RETENTION_DAYS: int = int(os.environ.get('TRYON_RESULT_RETENTION_DAYS', '0'))
+    RETENTION_TTL_GRACE_DAYS: int = int(os.environ.get('RETENTION_TTL_GRACE_DAYS', '7'))
+    RETENTION_ARCHIVE_DIR: str = os.environ.get('RETENTION_ARCHIVE_DIR', str(ROOT_DIR / 'archive'))
+    RETENTION_BATCH_SIZE: int = int(os.environ.get('RETENTION_BATCH_SIZE', '1000'))
+    RETENTION_MAX_DOCS_PER_RUN: int = int(os.environ.get('RETENTION_MAX_DOCS_PER_RUN', '50000'))
+    RETENTION_RUN_HOUR: int = int(os.environ.get('RETENTION_RUN_HOUR', '3'))
+    # Only the instance holding the archival lease runs it; a crashed holder's lease lapses after this
+    RETENTION_LEASE_SECONDS: int = int(os.environ.get('RETENTION_LEASE_SECONDS', '3600'))
+    
+    # Read-through caches (utils.cache): "memory" per process, or "mongo"
+    # to share entries and invalidations across workers
+    CACHE_BACKEND: str = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_MAX_SIZE: int = int(os.environ.get('CACHE_DEFAULT_MAX_SIZE', '10000'))
+    
+    # Model (LLM) client pool, per provider/model/params
+    LLM_CLIENT_POOL_SIZE: int = int(os.environ.get('LLM_CLIENT_POOL_SIZE', '16'))
+    LLM_CLIENT_POOL_WARM_SIZE: int = int(os.environ.get('LLM_CLIENT_POOL_WARM_SIZE', '2'))
+    LLM_CLIENT_MAX_USES: int = int(os.environ.get('LLM_CLIENT_MAX_USES', '100'))  # 0 reuses clients indefinitely
+    
+    # Adaptive (AIMD) concurrency limit for model calls; keep LLM_LIMIT_MAX
+    # at or below LLM_CLIENT_POOL_SIZE
+    LLM_LIMIT_INITIAL: int = int(os.environ.get('LLM_LIMIT_INITIAL', '4'))
+    LLM_LIMIT_MIN: int = int(os.environ.get('LLM_LIMIT_MIN', '1'))
+    LLM_LIMIT_MAX: int = int(os.environ.get('LLM_LIMIT_MAX', '16'))
+    LLM_LIMIT_BACKOFF_RATIO: float = float(os.environ.get('LLM_LIMIT_BACKOFF_RATIO', '0.5'))  # On 429/5xx/timeout
+    LLM_LIMIT_LATENCY_BACKOFF_RATIO: float = float(os.environ.get('LLM_LIMIT_LATENCY_BACKOFF_RATIO', '0.9'))
+    LLM_LIMIT_LATENCY_TOLERANCE: float = float(os.environ.get('LLM_LIMIT_LATENCY_TOLERANCE', '3.0'))  # x baseline latency
+    LLM_LIMIT_COOLDOWN_SECONDS: float = float(os.environ.get('LLM_LIMIT_COOLDOWN_SECONDS', '5'))
+    
+    # Gemini circuit breaker (429/5xx/timeouts count as failures)
+    GEMINI_BREAKER_FAILURE_RATE: float = float(os.environ.get('GEMINI_BREAKER_FAILURE_RATE', '0.5'))
+    GEMINI_BREAKER_MIN_CALLS: int = int(os.environ.get('GEMINI_BREAKER_MIN_CALLS', '10'))
+    GEMINI_BREAKER_WINDOW_SECONDS: int = int(os.environ.get('GEMINI_BREAKER_WINDOW_SECONDS', '60'))
+    GEMINI_BREAKER_RECOVERY_TIMEOUT: int = int(os.environ.get('GEMINI_BREAKER_RECOVERY_TIMEOUT', '30'))
+    GEMINI_BREAKER_HALF_OPEN_PROBES: int = int(os.environ.get('GEMINI_BREAKER_HALF_OPEN_PROBES', '2'))
+    
+    # Model call deadline, retries and hedging (utils.resilient_call)
+    LLM_CALL_DEADLINE_SECONDS: float = float(os.environ.get('LLM_CALL_DEADLINE_SECONDS', '180'))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.environ.get('LLM_ATTEMPT_TIMEOUT_SECONDS', '90'))
+    LLM_MAX_ATTEMPTS: int = int(os.environ.get('LLM_MAX_ATTEMPTS', '3'))
+    LLM_RETRY_BASE_DELAY: float = float(os.environ.get('LLM_RETRY_BASE_DELAY', '1'))
+    LLM_RETRY_MAX_DELAY: float = float(os.environ.get('LLM_RETRY_MAX_DELAY', '10'))
+    # Hedged requests double provider cost for the slowest ~5% of calls
+    LLM_HEDGE_ENABLED: bool = os.environ.get('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+    
+    # Recovery of try-on jobs orphaned by a crashed instance
+    # Must stay well above LLM_CALL_DEADLINE_SECONDS so live jobs are never taken over
+    JOB_STALE_AFTER_SECONDS: int = int(os.environ.get('JOB_STALE_AFTER_SECONDS', '600'))
+    # Running jobs refresh updated_at this often, so only dead runs go stale
+    JOB_HEARTBEAT_SECONDS: int = int(os.environ.get('JOB_HEARTBEAT_SECONDS', '30'))
+    JOB_RECOVERY_INTERVAL_SECONDS: int = int(os.environ.get('JOB_RECOVERY_INTERVAL_SECONDS', '120'))
+    JOB_RECOVERY_BATCH_SIZE: int = int(os.environ.get('JOB_RECOVERY_BATCH_SIZE', '20'))
+    JOB_MAX_RECOVERIES: int = int(os.environ.get('JOB_MAX_RECOVERIES', '3'))
+    # Full job inputs are kept this long so failed jobs can still be retried
+    TRYON_JOB_INPUT_TTL_HOURS: int = int(os.environ.get('TRYON_JOB_INPUT_TTL_HOURS', '72'))
+    # Per base64 image; three of them must fit one 16MB Mongo document
+    TRYON_MAX_IMAGE_BYTES: int = int(os.environ.get('TRYON_MAX_IMAGE_BYTES', str(4 * 1024 * 1024)))
+    
+    # Buffered audit writer
+    AUDIT_QUEUE_MAX_SIZE: int = int(os.environ.get('AUDIT_QUEUE_MAX_SIZE', '10000'))
+    AUDIT_BATCH_SIZE: int = int(os.environ.get('AUDIT_BATCH_SIZE', '200'))
+    AUDIT_FLUSH_INTERVAL: float = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '0.5'))
+    AUDIT_WRITE_RETRIES: int = int(os.environ.get('AUDIT_WRITE_RETRIES', '3'))
+    
     # CORS
     CORS_ORIGINS: str = os.environ.get('CORS_ORIGINS', '*')
     
@@ -1,17 +1,61 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import read_preferences
 from config import settings
+from utils.mongo_metrics import PoolMetrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+READ_PREFERENCES = {
+    "primary": read_preferences.Primary,
+    "primaryPreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondaryPreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
 class Database:
     client: AsyncIOMotorClient = None
+    pool_metrics: PoolMetrics = None
+    _analytics_db = None
+    
+    @staticmethod
+    def client_options() -> dict:
+        """Pool, timeout and compression options from settings"""
+        options = {
+            "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS or None,
+            "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+            "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS or None,
+        }
+        if settings.MONGO_COMPRESSORS:
+            options["compressors"] = settings.MONGO_COMPRESSORS
+        return options
+    
+    @staticmethod
+    def analytics_read_preference():
+        name = settings.MONGO_ANALYTICS_READ_PREFERENCE
+        if name not in READ_PREFERENCES:
+            raise ValueError(f"Unknown read preference: {name}")
+        if name == "primary":
+            return read_preferences.Primary()
+        max_staleness = settings.MONGO_ANALYTICS_MAX_STALENESS_SECONDS
+        return READ_PREFERENCES[name](max_staleness=max_staleness if max_staleness > 0 else -1)
     
     @classmethod
     async def connect_db(cls):
         """Connect to MongoDB"""
         try:
-            cls.client = AsyncIOMotorClient(settings.MONGO_URL)
+            cls.pool_metrics = PoolMetrics()
+            cls.client = AsyncIOMotorClient(
+                settings.MONGO_URL,
+                event_listeners=[cls.pool_metrics],
+                **cls.client_options()
+            )
+            cls._analytics_db = None
             # Test connection
             await cls.client.admin.command('ping')
             logger.info(f"Connected to MongoDB at {settings.MONGO_URL}")
@@ -32,6 +76,22 @@ class Database:
         if not cls.client:
             raise Exception("Database not connected. Call connect_db() first.")
         return cls.client[settings.DB_NAME]
+    
+    @classmethod
+    def get_analytics_db(cls):
+        """
+        Database handle for analytics and admin reads, which tolerate slightly
+        stale data; routed per MONGO_ANALYTICS_READ_PREFERENCE (secondaries by
+        default). Job, credit and payment reads-before-write stay on get_db().
+        """
+        if not cls.client:
+            raise Exception("Database not connected. Call connect_db() first.")
+        if cls._analytics_db is None:
+            cls._analytics_db = cls.client.get_database(
+                settings.DB_NAME,
+                read_preference=cls.analytics_read_preference()
+            )
+        return cls._analytics_db
 
 # Convenience function
 def get_database():
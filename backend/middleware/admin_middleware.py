@@ -16,6 +16,18 @@ class AdminMiddleware:
     Middleware to check if user has admin privileges
     """
     
+    @staticmethod
+    async def _load_identity(user_id: str):
+        """
+        Only the fields role checks and audit logging need. Read on every
+        request, so role changes and suspensions apply at once on all workers.
+        """
+        db = Database.get_db()
+        return await db.users.find_one(
+            {"id": user_id},
+            {"_id": 0, "id": 1, "email": 1, "role": 1, "admin_type": 1, "is_active": 1, "is_suspended": 1}
+        )
+    
     @staticmethod
     async def verify_admin(
         request: Request,
@@ -44,8 +56,7 @@ class AdminMiddleware:
                 )
             
             # Get user from database
-            db = Database.get_db()
-            user = await db.users.find_one({"id": user_id})
+            user = await AdminMiddleware._load_identity(user_id)
             
             if not user:
                 raise HTTPException(
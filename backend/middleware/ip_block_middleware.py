@@ -0,0 +1,32 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import logging
+
+from utils.ip_blocklist import ip_blocklist
+
+logger = logging.getLogger(__name__)
+
+class IPBlockMiddleware:
+    """
+    ASGI middleware rejecting requests from blocked IPs before routing,
+    auth or any database access. Checks the in-memory blocklist only.
+    The client address comes from the ASGI scope; behind a reverse proxy run
+    uvicorn with --proxy-headers so it reflects the real client.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            client = scope.get("client")
+            if client and ip_blocklist.is_blocked(client[0]):
+                logger.info(f"Rejected request from blocked IP {client[0]}")
+                response = JSONResponse(
+                    status_code=403,
+                    content={"detail": "Access denied"}
+                )
+                await response(scope, receive, send)
+                return
+        
+        await self.app(scope, receive, send)
@@ -0,0 +1,52 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
+import math
+import logging
+
+from auth.jwt_handler import decode_token
+from config import settings
+from utils.rate_limiter import RateLimitResult, tryon_request_limiter, tryon_job_counter
+
+logger = logging.getLogger(__name__)
+security = HTTPBearer(auto_error=False)
+
+def _too_many_requests(detail: str, result: RateLimitResult) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={
+            "Retry-After": str(max(math.ceil(result.retry_after), 1)),
+            "X-RateLimit-Limit": str(result.limit),
+            "X-RateLimit-Remaining": str(result.remaining)
+        }
+    )
+
+async def enforce_tryon_rate_limit(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> None:
+    """
+    Reject try-on traffic over the per-user limits.
+    Runs from the token alone, before the user lookup or any job work;
+    unauthenticated requests are left to get_current_user.
+    """
+    if not credentials:
+        return
+
+    payload = decode_token(credentials.credentials)
+    user_id = payload.get("sub") if payload else None
+    if not user_id:
+        return
+
+    result = await tryon_request_limiter.hit(user_id)
+    if not result.allowed:
+        logger.warning(f"Try-on request rate limit hit for user {user_id}")
+        raise _too_many_requests("Too many try-on requests. Please slow down.", result)
+
+    jobs = await tryon_job_counter.count(user_id)
+    if jobs >= tryon_job_counter.limit:
+        logger.warning(f"Hourly try-on job limit hit for user {user_id}")
+        raise _too_many_requests(
+            f"Hourly try-on limit reached ({settings.TRYON_JOBS_PER_HOUR} jobs per hour)",
+            RateLimitResult(False, jobs, tryon_job_counter.limit, 60.0)
+        )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 from datetime import datetime
 import uuid
 
@@ -18,6 +18,13 @@ class TryOnJobModel(BaseModel):
     result_image_base64: Optional[str] = None
     error_message: Optional[str] = None
     credits_used: int = 1
+    prompt_id: Optional[str] = None  # None when the built-in default prompt was used
+    prompt_version: Optional[int] = None  # 0 for the built-in default
+    # Model calls made for this job: attempt, hedge, started_at, duration_ms, outcome, error
+    inference_attempts: List[Dict[str, Any]] = Field(default_factory=list)
+    recovery_count: int = 0  # Times re-enqueued after being orphaned by a crashed instance
+    recovered_at: Optional[datetime] = None
+    run_id: Optional[str] = None  # Set by the run that owns the job while processing
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
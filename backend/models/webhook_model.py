@@ -13,6 +13,9 @@ class WebhookModel(BaseModel):
     events: List[str]  # List of event types to listen to
     secret: str  # Secret for signature verification
     is_active: bool = True
+    batch_enabled: bool = False  # Coalesce events into one signed batch delivery
+    batch_window_seconds: int = 5  # Max time an event waits in the batch
+    batch_max_events: int = 50  # Flush early once this many events are buffered
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     last_triggered_at: Optional[datetime] = None
@@ -33,7 +36,7 @@ class WebhookDeliveryModel(BaseModel):
     """Model for storing webhook delivery attempts"""
     id: str = Field(default_factory=lambda: str(uuid4()))
     webhook_id: str
-    event_type: str
+    event_type: str  # Event name, or 'batch' for batched deliveries
     payload: Dict[str, Any]
     status: str  # 'pending', 'success', 'failed'
     response_code: Optional[int] = None
@@ -62,13 +65,17 @@ class WebhookCreateRequest(BaseModel):
     url: str
     name: str
     events: List[str]
+    batch_enabled: bool = False
+    batch_window_seconds: int = Field(5, ge=1, le=300)
+    batch_max_events: int = Field(50, ge=2, le=500)
 
     class Config:
         json_schema_extra = {
             "example": {
                 "url": "https://example.com/webhook",
                 "name": "My Webhook",
-                "events": ["tryon.completed", "tryon.failed"]
+                "events": ["tryon.completed", "tryon.failed"],
+                "batch_enabled": False
             }
         }
 
@@ -79,3 +86,6 @@ class WebhookUpdateRequest(BaseModel):
     name: Optional[str] = None
     events: Optional[List[str]] = None
     is_active: Optional[bool] = None
+    batch_enabled: Optional[bool] = None
+    batch_window_seconds: Optional[int] = Field(None, ge=1, le=300)
+    batch_max_events: Optional[int] = Field(None, ge=2, le=500)
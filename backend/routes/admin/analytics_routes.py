@@ -2,9 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
 
+from config import settings
 from database import Database
 from middleware.admin_middleware import AdminMiddleware
 from services.admin_analytics_service import AdminAnalyticsService
+from utils.adaptive_limiter import limiter_stats
+from utils.cache import cache_stats
+from utils.circuit_breaker import breaker_stats
+from utils.model_client_pool import model_client_pool
+from utils.resilient_call import caller_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/analytics", tags=["Admin - Analytics"])
@@ -87,6 +93,32 @@ async def get_jobs_chart(
             detail="Error retrieving jobs chart"
         )
 
+@router.get("/prompt-versions")
+async def get_prompt_version_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    days: int = Query(30, ge=1, le=365, description="Number of days to include")
+):
+    """
+    Get job outcomes per prompt version
+    Requires: any admin
+    """
+    try:
+        # Verify admin access
+        admin = await AdminMiddleware.verify_admin(None, credentials)
+        
+        stats = await AdminAnalyticsService.get_prompt_version_stats(days)
+        
+        return {"data": stats}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting prompt version stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving prompt version stats"
+        )
+
 @router.get("/user-growth-chart")
 async def get_user_growth_chart(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -112,3 +144,107 @@ async def get_user_growth_chart(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error retrieving user growth chart"
         )
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get MongoDB connection pool metrics for this process
+    Requires: super_admin
+    """
+    try:
+        # Verify admin access
+        admin = await AdminMiddleware.verify_super_admin(None, credentials)
+        
+        return {
+            "pool": Database.pool_metrics.snapshot() if Database.pool_metrics else {},
+            "options": Database.client_options(),
+            "analytics_read_preference": settings.MONGO_ANALYTICS_READ_PREFERENCE
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting DB pool metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving DB pool metrics"
+        )
+
+@router.get("/caches")
+async def get_cache_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get hit ratio and size of each read-through cache in this process
+    Requires: super_admin
+    """
+    try:
+        # Verify admin access
+        admin = await AdminMiddleware.verify_super_admin(None, credentials)
+        
+        return {
+            "backend": settings.CACHE_BACKEND,
+            "caches": cache_stats()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting cache metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving cache metrics"
+        )
+
+@router.get("/model-clients")
+async def get_model_client_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get in-flight calls, latency, adaptive concurrency limits and
+    retry/hedging counters per model client in this process
+    Requires: super_admin
+    """
+    try:
+        # Verify admin access
+        admin = await AdminMiddleware.verify_super_admin(None, credentials)
+        
+        return {
+            "clients": model_client_pool.stats(),
+            "limiters": limiter_stats(),
+            "callers": caller_stats()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting model client metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving model client metrics"
+        )
+
+@router.get("/circuit-breakers")
+async def get_circuit_breaker_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get state, window failure rate and state changes per circuit breaker in this process
+    Requires: super_admin
+    """
+    try:
+        # Verify admin access
+        admin = await AdminMiddleware.verify_super_admin(None, credentials)
+        
+        return {"breakers": breaker_stats()}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting circuit breaker metrics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving circuit breaker metrics"
+        )
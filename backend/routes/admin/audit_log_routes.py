@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from datetime import datetime
 from typing import Optional
 import logging
 
 from middleware.admin_middleware import AdminMiddleware
 from services.audit_service import AuditService
+from utils.pagination import next_cursor
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/audit-logs", tags=["Admin - Audit Logs"])
@@ -16,8 +18,12 @@ async def get_audit_logs(
     target_type: Optional[str] = Query(None, description="Filter by target type"),
     target_id: Optional[str] = Query(None, description="Filter by target ID"),
     admin_id: Optional[str] = Query(None, description="Filter by admin ID"),
+    start: Optional[datetime] = Query(None, description="Only logs at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, description="Only logs before this time (UTC)"),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Only logs in this month (YYYY-MM)"),
     limit: int = Query(100, ge=1, le=500),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)")
 ):
     """
     Get audit logs with filters
@@ -31,19 +37,29 @@ async def get_audit_logs(
             target_type=target_type,
             target_id=target_id,
             admin_id=admin_id,
+            start=start,
+            end=end,
+            month=month,
             limit=limit,
-            skip=skip
+            skip=skip,
+            cursor=cursor
         )
         
         return {
             "logs": logs,
             "count": len(logs),
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor(logs, limit, "timestamp")
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting audit logs: {str(e)}")
         raise HTTPException(
@@ -75,6 +91,11 @@ async def search_audit_logs(
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error searching audit logs: {str(e)}")
         raise HTTPException(
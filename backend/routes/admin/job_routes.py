@@ -6,6 +6,10 @@ import logging
 from database import Database
 from middleware.admin_middleware import AdminMiddleware
 from services.audit_service import AuditService
+from services.tryon_service import get_tryon_service
+from utils.counting import count_total
+from utils.pagination import apply_cursor, keyset_sort, next_cursor
+from utils.user_enrichment import attach_user_emails
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/jobs", tags=["Admin - Jobs"])
@@ -17,7 +21,9 @@ async def get_jobs(
     status_filter: Optional[str] = Query(None, description="Filter by status"),
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)"),
+    exact_total: bool = Query(False, description="Run an exact count instead of an estimate/cached total")
 ):
     """
     Get list of try-on jobs
@@ -27,7 +33,7 @@ async def get_jobs(
         # Verify admin access
         admin = await AdminMiddleware.verify_support_admin(None, credentials)
         
-        db = Database.get_db()
+        db = Database.get_analytics_db()
         
         # Build query
         query = {}
@@ -37,26 +43,32 @@ async def get_jobs(
             query["user_id"] = user_id
         
         # Get total count
-        total = await db.tryon_jobs.count_documents(query)
+        total, total_is_estimate = await count_total(db.tryon_jobs, query, exact=exact_total)
         
-        # Get jobs
-        jobs = await db.tryon_jobs.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(None)
+        # Get jobs (keyset page when a cursor is given)
+        jobs = await db.tryon_jobs.find(
+            apply_cursor(query, "created_at", cursor)
+        ).sort(keyset_sort("created_at")).skip(0 if cursor else skip).limit(limit).to_list(None)
         
         # Get user emails
-        for job in jobs:
-            user = await db.users.find_one({"id": job["user_id"]})
-            if user:
-                job["user_email"] = user.get("email")
+        await attach_user_emails(jobs)
         
         return {
             "jobs": jobs,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor(jobs, limit, "created_at")
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting jobs: {str(e)}")
         raise HTTPException(
@@ -133,14 +145,19 @@ async def retry_job(
                 detail="Can only retry failed jobs"
             )
         
-        # Reset job status to queued
-        await db.tryon_jobs.update_one(
-            {"id": job_id},
-            {"$set": {
-                "status": "queued",
-                "error_message": None
-            }}
-        )
+        # Re-run it from the stored inputs; credits are only charged once per job
+        try:
+            requeued = await get_tryon_service().retry_failed_job(job_id)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        if requeued is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Job is no longer failed"
+            )
         
         # Log action
         await AuditService.log_action(
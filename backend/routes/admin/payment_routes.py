@@ -7,6 +7,9 @@ from database import Database
 from middleware.admin_middleware import AdminMiddleware
 from services.audit_service import AuditService
 from services.credit_service import CreditService
+from utils.counting import count_total
+from utils.pagination import apply_cursor, keyset_sort, next_cursor
+from utils.user_enrichment import attach_user_emails
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/payments", tags=["Admin - Payments"])
@@ -18,7 +21,9 @@ async def get_all_payments(
     status_filter: Optional[str] = Query(None, description="Filter by status"),
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)"),
+    exact_total: bool = Query(False, description="Run an exact count instead of an estimate/cached total")
 ):
     """
     Get all payments with filters
@@ -28,7 +33,7 @@ async def get_all_payments(
         # Verify admin access
         admin = await AdminMiddleware.verify_finance_admin(None, credentials)
         
-        db = Database.get_db()
+        db = Database.get_analytics_db()
         
         # Build query
         query = {}
@@ -38,26 +43,32 @@ async def get_all_payments(
             query["user_id"] = user_id
         
         # Get total count
-        total = await db.payments.count_documents(query)
+        total, total_is_estimate = await count_total(db.payments, query, exact=exact_total)
         
         # Get payments
-        payments = await db.payments.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(None)
+        payments = await db.payments.find(
+            apply_cursor(query, "created_at", cursor)
+        ).sort(keyset_sort("created_at")).skip(0 if cursor else skip).limit(limit).to_list(None)
         
         # Get user emails
-        for payment in payments:
-            user = await db.users.find_one({"id": payment["user_id"]})
-            if user:
-                payment["user_email"] = user.get("email")
+        await attach_user_emails(payments)
         
         return {
             "payments": payments,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor(payments, limit, "created_at")
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting payments: {str(e)}")
         raise HTTPException(
@@ -71,7 +82,9 @@ async def get_credit_transactions(
     user_id: Optional[str] = Query(None, description="Filter by user ID"),
     transaction_type: Optional[str] = Query(None, description="Filter by type"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)"),
+    exact_total: bool = Query(False, description="Run an exact count instead of an estimate/cached total")
 ):
     """
     Get all credit transactions
@@ -81,7 +94,7 @@ async def get_credit_transactions(
         # Verify admin access
         admin = await AdminMiddleware.verify_finance_admin(None, credentials)
         
-        db = Database.get_db()
+        db = Database.get_analytics_db()
         
         # Build query
         query = {}
@@ -91,26 +104,32 @@ async def get_credit_transactions(
             query["type"] = transaction_type
         
         # Get total count
-        total = await db.credit_transactions.count_documents(query)
+        total, total_is_estimate = await count_total(db.credit_transactions, query, exact=exact_total)
         
         # Get transactions
-        transactions = await db.credit_transactions.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(None)
+        transactions = await db.credit_transactions.find(
+            apply_cursor(query, "created_at", cursor)
+        ).sort(keyset_sort("created_at")).skip(0 if cursor else skip).limit(limit).to_list(None)
         
         # Get user emails
-        for transaction in transactions:
-            user = await db.users.find_one({"id": transaction["user_id"]})
-            if user:
-                transaction["user_email"] = user.get("email")
+        await attach_user_emails(transactions)
         
         return {
             "transactions": transactions,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor(transactions, limit, "created_at")
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting credit transactions: {str(e)}")
         raise HTTPException(
@@ -7,6 +7,7 @@ from database import Database
 from middleware.admin_middleware import AdminMiddleware
 from models.prompt_model import PromptCreate, PromptUpdate, PromptInDB
 from services.audit_service import AuditService
+from services.prompt_registry import PromptRegistry
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/prompts", tags=["Admin - Prompts"])
@@ -66,6 +67,7 @@ async def create_prompt(
         )
         
         await db.prompts.insert_one(prompt.model_dump())
+        await PromptRegistry.refresh()
         
         # Log action
         await AuditService.log_action(
@@ -144,6 +146,7 @@ async def update_prompt(
         )
         
         await db.prompts.insert_one(new_prompt.model_dump())
+        await PromptRegistry.refresh()
         
         # Log action
         await AuditService.log_action(
@@ -219,6 +222,7 @@ async def rollback_prompt(
             {"id": previous_version_id},
             {"$set": {"is_active": True}}
         )
+        await PromptRegistry.refresh()
         
         # Log action
         await AuditService.log_action(
@@ -258,12 +262,7 @@ async def get_active_prompt(
         # Verify admin access
         admin = await AdminMiddleware.verify_admin(None, credentials)
         
-        db = Database.get_db()
-        
-        prompt = await db.prompts.find_one({
-            "mode": mode,
-            "is_active": True
-        })
+        prompt = PromptRegistry.get_active(mode)
         
         if not prompt:
             raise HTTPException(
@@ -77,7 +77,7 @@ async def check_user_abuse(
 
 @router.post("/block-ip")
 async def block_ip(
-    ip_address: str = Query(..., description="IP address to block"),
+    ip_address: str = Query(..., description="IP address or CIDR range to block"),
     reason: str = Query(..., description="Reason for blocking"),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -107,6 +107,11 @@ async def block_ip(
         
     except HTTPException:
         raise
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid IP address or CIDR range"
+        )
     except Exception as e:
         logger.error(f"Error blocking IP: {str(e)}")
         raise HTTPException(
@@ -116,7 +121,7 @@ async def block_ip(
 
 @router.post("/unblock-ip")
 async def unblock_ip(
-    ip_address: str = Query(..., description="IP address to unblock"),
+    ip_address: str = Query(..., description="IP address or CIDR range to unblock"),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
@@ -150,6 +155,11 @@ async def unblock_ip(
         
     except HTTPException:
         raise
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid IP address or CIDR range"
+        )
     except Exception as e:
         logger.error(f"Error unblocking IP: {str(e)}")
         raise HTTPException(
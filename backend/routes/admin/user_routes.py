@@ -7,6 +7,9 @@ from database import Database
 from middleware.admin_middleware import AdminMiddleware
 from services.credit_service import CreditService
 from services.audit_service import AuditService
+from utils.counting import count_total
+from utils.pagination import apply_cursor, keyset_sort, next_cursor
+from utils.user_search import search_query
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin/users", tags=["Admin - Users"])
@@ -19,7 +22,9 @@ async def get_users(
     role: Optional[str] = Query(None, description="Filter by role"),
     is_suspended: Optional[bool] = Query(None, description="Filter by suspension status"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides skip)"),
+    exact_total: bool = Query(False, description="Run an exact count instead of an estimate/cached total")
 ):
     """
     Get list of users with search and filters
@@ -29,26 +34,25 @@ async def get_users(
         # Verify admin access
         admin = await AdminMiddleware.verify_support_admin(None, credentials)
         
-        db = Database.get_db()
+        db = Database.get_analytics_db()
         
         # Build query
         query = {}
         if search:
-            query["$or"] = [
-                {"email": {"$regex": search, "$options": "i"}},
-                {"first_name": {"$regex": search, "$options": "i"}},
-                {"last_name": {"$regex": search, "$options": "i"}}
-            ]
+            query.update(await search_query(db, search))
         if role:
             query["role"] = role
         if is_suspended is not None:
             query["is_suspended"] = is_suspended
         
         # Get total count
-        total = await db.users.count_documents(query)
+        total, total_is_estimate = await count_total(db.users, query, exact=exact_total)
         
         # Get users
-        users = await db.users.find(query).skip(skip).limit(limit).sort("created_at", -1).to_list(None)
+        users = await db.users.find(
+            apply_cursor(query, "created_at", cursor),
+            {"search_ngrams": 0}
+        ).sort(keyset_sort("created_at")).skip(0 if cursor else skip).limit(limit).to_list(None)
         
         # Remove sensitive data
         for user in users:
@@ -57,12 +61,19 @@ async def get_users(
         return {
             "users": users,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor(users, limit, "created_at")
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting users: {str(e)}")
         raise HTTPException(
@@ -83,6 +94,7 @@ async def get_user_detail(
         # Verify admin access
         admin = await AdminMiddleware.verify_support_admin(None, credentials)
         
+        # Primary, so the detail reflects admin changes made just before
         db = Database.get_db()
         
         # Get user
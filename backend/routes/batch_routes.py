@@ -2,8 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
 from middleware.auth_middleware import get_current_user
+from middleware.rate_limit_middleware import enforce_tryon_rate_limit
 from services.tryon_service import TryOnService
 from database import Database
+from utils.rate_limiter import tryon_job_counter
 import asyncio
 
 router = APIRouter(prefix="/api/v1/batch", tags=["batch"])
@@ -18,11 +20,19 @@ class BatchTryOnItem(BaseModel):
 class BatchTryOnRequest(BaseModel):
     items: List[BatchTryOnItem]
 
-@router.post("/tryon")
+@router.post("/tryon", dependencies=[Depends(enforce_tryon_rate_limit)])
 async def create_batch_tryon(request: BatchTryOnRequest, current_user: dict = Depends(get_current_user)):
     """Create batch try-on jobs"""
     user_id = current_user["id"]
     
+    # Make sure the whole batch fits in the hourly job allowance
+    jobs_this_hour = await tryon_job_counter.count(user_id)
+    if jobs_this_hour + len(request.items) > tryon_job_counter.limit:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Batch would exceed hourly try-on limit. Remaining: {max(tryon_job_counter.limit - jobs_this_hour, 0)}"
+        )
+    
     # Get user from database to check credits
     db = Database.get_db()
     user = await db.users.find_one({"id": user_id})
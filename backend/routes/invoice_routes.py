@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import PlainTextResponse
+from typing import Optional
 
 from ..services.invoice_service import InvoiceService
+from ..utils.pagination import next_cursor
 from ..middleware.auth_middleware import get_current_user
 from ..database import get_database
 
@@ -11,6 +13,7 @@ router = APIRouter(prefix="/api/v1/invoices", tags=["invoices"])
 async def get_invoices(
     limit: int = 50,
     skip: int = 0,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -19,6 +22,7 @@ async def get_invoices(
     Query Parameters:
     - limit: Number of records to return (default: 50)
     - skip: Number of records to skip (default: 0)
+    - cursor: next_cursor from the previous page (overrides skip)
     
     Returns:
     - List of invoices
@@ -30,14 +34,18 @@ async def get_invoices(
         invoices = await invoice_service.get_invoices_by_user(
             user_id=current_user["id"],
             limit=limit,
-            skip=skip
+            skip=skip,
+            page_cursor=cursor
         )
         
         return {
             "success": True,
             "invoices": invoices,
-            "count": len(invoices)
+            "count": len(invoices),
+            "next_cursor": next_cursor(invoices, limit, "invoice_date")
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
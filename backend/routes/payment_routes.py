@@ -3,6 +3,7 @@ from typing import Optional
 import json
 
 from ..services.payment_service import PaymentService
+from ..utils.pagination import next_cursor
 from ..services.invoice_service import InvoiceService
 from ..models.payment_model import CreateOrderRequest, VerifyPaymentRequest
 from ..middleware.auth_middleware import get_current_user
@@ -132,6 +133,7 @@ async def razorpay_webhook(
 async def get_payment_history(
     limit: int = 50,
     skip: int = 0,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -140,6 +142,7 @@ async def get_payment_history(
     Query Parameters:
     - limit: Number of records to return (default: 50)
     - skip: Number of records to skip (default: 0)
+    - cursor: next_cursor from the previous page (overrides skip)
     
     Returns:
     - List of payments
@@ -151,14 +154,18 @@ async def get_payment_history(
         payments = await payment_service.get_payment_history(
             user_id=current_user["id"],
             limit=limit,
-            skip=skip
+            skip=skip,
+            page_cursor=cursor
         )
         
         return {
             "success": True,
             "payments": payments,
-            "count": len(payments)
+            "count": len(payments),
+            "next_cursor": next_cursor(payments, limit, "created_at")
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
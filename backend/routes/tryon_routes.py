@@ -3,16 +3,18 @@ from typing import Optional
 import logging
 
 from middleware.auth_middleware import get_current_user
+from middleware.rate_limit_middleware import enforce_tryon_rate_limit
 from models.user_model import UserInDB
 from models.tryon_job_model import TryOnJobCreateRequest, TryOnJobResponse
 from services.tryon_service import TryOnService
+from utils.pagination import next_cursor
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/tryon", tags=["Try-On"])
 tryon_service = TryOnService()
 
-@router.post("", response_model=TryOnJobResponse)
+@router.post("", response_model=TryOnJobResponse, dependencies=[Depends(enforce_tryon_rate_limit)])
 async def create_tryon_job(
     request: TryOnJobCreateRequest,
     current_user: UserInDB = Depends(get_current_user)
@@ -88,12 +90,20 @@ async def get_tryon_job(
 async def get_tryon_history(
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_user)
 ):
     """
     Get user's try-on history
+    Pass the previous response's next_cursor as `cursor` to page without skip
     """
-    jobs = await tryon_service.get_user_jobs(current_user.id, skip, limit)
+    try:
+        jobs = await tryon_service.get_user_jobs(current_user.id, skip, limit, page_cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     return {
         "jobs": [
@@ -110,7 +120,8 @@ async def get_tryon_history(
             for job in jobs
         ],
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor(jobs, limit, "created_at")
     }
 
 @router.delete("/{job_id}")
@@ -26,7 +26,10 @@ async def create_webhook(
             user_id=current_user.id,
             url=request.url,
             name=request.name,
-            events=request.events
+            events=request.events,
+            batch_enabled=request.batch_enabled,
+            batch_window_seconds=request.batch_window_seconds,
+            batch_max_events=request.batch_max_events
         )
         return webhook
     except ValueError as e:
@@ -75,7 +78,10 @@ async def update_webhook(
             url=request.url,
             name=request.name,
             events=request.events,
-            is_active=request.is_active
+            is_active=request.is_active,
+            batch_enabled=request.batch_enabled,
+            batch_window_seconds=request.batch_window_seconds,
+            batch_max_events=request.batch_max_events
         )
         if not webhook:
             raise HTTPException(status_code=404, detail="Webhook not found")
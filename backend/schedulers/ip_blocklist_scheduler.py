@@ -0,0 +1,47 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import logging
+from config import settings
+from services.abuse_detection_service import AbuseDetectionService
+
+logger = logging.getLogger(__name__)
+
+class IPBlocklistRefreshScheduler:
+    """Scheduler for reloading the in-memory IP blocklist from the database"""
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    async def refresh(self):
+        """Reload blocked IPs so blocks made on other instances take effect"""
+        try:
+            await AbuseDetectionService.refresh_ip_blocklist()
+        except Exception as e:
+            logger.error(f"Error refreshing IP blocklist: {e}")
+    
+    def start(self):
+        """Start the scheduler"""
+        self.scheduler.add_job(
+            self.refresh,
+            trigger=IntervalTrigger(seconds=settings.IP_BLOCKLIST_REFRESH_SECONDS),
+            id='ip_blocklist_refresh',
+            name='Refresh IP blocklist',
+            replace_existing=True
+        )
+        
+        self.scheduler.start()
+        logger.info("IP blocklist refresh scheduler started")
+    
+    def shutdown(self):
+        """Shutdown the scheduler"""
+        self.scheduler.shutdown()
+        logger.info("IP blocklist refresh scheduler stopped")
+
+# Global scheduler instance
+scheduler_instance = None
+
+def get_ip_blocklist_scheduler():
+    global scheduler_instance
+    if scheduler_instance is None:
+        scheduler_instance = IPBlocklistRefreshScheduler()
+    return scheduler_instance
@@ -0,0 +1,47 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import logging
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class JobRecoveryScheduler:
+    """Scheduler for re-enqueueing try-on jobs orphaned by a crashed instance"""
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    async def recover(self):
+        """Sweep stale queued/processing jobs onto this instance"""
+        try:
+            from services.tryon_service import get_tryon_service
+            await get_tryon_service().recover_stale_jobs()
+        except Exception as e:
+            logger.error(f"Error recovering stale jobs: {e}")
+    
+    def start(self):
+        """Start the scheduler"""
+        self.scheduler.add_job(
+            self.recover,
+            trigger=IntervalTrigger(seconds=settings.JOB_RECOVERY_INTERVAL_SECONDS),
+            id='job_recovery',
+            name='Recover stale try-on jobs',
+            replace_existing=True
+        )
+        
+        self.scheduler.start()
+        logger.info("Job recovery scheduler started")
+    
+    def shutdown(self):
+        """Shutdown the scheduler"""
+        self.scheduler.shutdown()
+        logger.info("Job recovery scheduler stopped")
+
+# Global scheduler instance
+scheduler_instance = None
+
+def get_job_recovery_scheduler():
+    global scheduler_instance
+    if scheduler_instance is None:
+        scheduler_instance = JobRecoveryScheduler()
+    return scheduler_instance
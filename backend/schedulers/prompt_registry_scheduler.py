@@ -0,0 +1,47 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import logging
+from config import settings
+from services.prompt_registry import PromptRegistry
+
+logger = logging.getLogger(__name__)
+
+class PromptRegistryRefreshScheduler:
+    """Scheduler for reloading the in-memory prompt registry from the database"""
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    async def refresh(self):
+        """Reload active prompts so edits made on other instances take effect"""
+        try:
+            await PromptRegistry.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing prompt registry: {e}")
+    
+    def start(self):
+        """Start the scheduler"""
+        self.scheduler.add_job(
+            self.refresh,
+            trigger=IntervalTrigger(seconds=settings.PROMPT_REGISTRY_REFRESH_SECONDS),
+            id='prompt_registry_refresh',
+            name='Refresh prompt registry',
+            replace_existing=True
+        )
+        
+        self.scheduler.start()
+        logger.info("Prompt registry refresh scheduler started")
+    
+    def shutdown(self):
+        """Shutdown the scheduler"""
+        self.scheduler.shutdown()
+        logger.info("Prompt registry refresh scheduler stopped")
+
+# Global scheduler instance
+scheduler_instance = None
+
+def get_prompt_registry_scheduler():
+    global scheduler_instance
+    if scheduler_instance is None:
+        scheduler_instance = PromptRegistryRefreshScheduler()
+    return scheduler_instance
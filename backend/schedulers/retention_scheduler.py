@@ -0,0 +1,50 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+import logging
+from config import settings
+from services.retention_service import RetentionService
+
+logger = logging.getLogger(__name__)
+
+class RetentionScheduler:
+    """Scheduler for archiving documents past their retention"""
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    async def archive(self):
+        """Archive expired documents in every retention-managed collection"""
+        try:
+            results = await RetentionService.run_archival()
+            if results is not None:
+                logger.info(f"Retention archival complete: {results}")
+        except Exception as e:
+            logger.error(f"Error running retention archival: {e}")
+    
+    def start(self):
+        """Start the scheduler"""
+        self.scheduler.add_job(
+            self.archive,
+            trigger=CronTrigger(hour=settings.RETENTION_RUN_HOUR, minute=30, timezone='UTC'),
+            id='retention_archival',
+            name='Archive expired documents',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        self.scheduler.start()
+        logger.info("Retention scheduler started")
+    
+    def shutdown(self):
+        """Shutdown the scheduler"""
+        self.scheduler.shutdown()
+        logger.info("Retention scheduler stopped")
+
+# Global scheduler instance
+scheduler_instance = None
+
+def get_retention_scheduler():
+    global scheduler_instance
+    if scheduler_instance is None:
+        scheduler_instance = RetentionScheduler()
+    return scheduler_instance
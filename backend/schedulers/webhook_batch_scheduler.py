@@ -0,0 +1,48 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import logging
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class WebhookBatchScheduler:
+    """Scheduler for delivering batched webhook events left behind by a crashed instance"""
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    async def recover(self):
+        """Deliver stale events from the webhook batch outbox"""
+        try:
+            from services.webhook_service import WebhookService
+            await WebhookService.recover_batches()
+        except Exception as e:
+            logger.error(f"Error recovering webhook batches: {e}")
+    
+    def start(self):
+        """Start the scheduler"""
+        self.scheduler.add_job(
+            self.recover,
+            trigger=IntervalTrigger(seconds=settings.WEBHOOK_BATCH_RECOVERY_INTERVAL_SECONDS),
+            id='webhook_batch_recovery',
+            name='Recover buffered webhook batches',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        self.scheduler.start()
+        logger.info("Webhook batch scheduler started")
+    
+    def shutdown(self):
+        """Shutdown the scheduler"""
+        self.scheduler.shutdown()
+        logger.info("Webhook batch scheduler stopped")
+
+# Global scheduler instance
+scheduler_instance = None
+
+def get_webhook_batch_scheduler():
+    global scheduler_instance
+    if scheduler_instance is None:
+        scheduler_instance = WebhookBatchScheduler()
+    return scheduler_instance
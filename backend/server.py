@@ -6,6 +6,7 @@ from contextlib import asynccontextmanager
 # Import configuration and database
 from config import settings
 from database import Database
+from middleware.ip_block_middleware import IPBlockMiddleware
 
 # Import routes
 from routes import auth_routes, credit_routes, api_key_routes, tryon_routes, webhook_routes, analytics_routes, pricing_routes, payment_routes, invoice_routes, image_routes, batch_routes
@@ -31,24 +32,97 @@ async def lifespan(app: FastAPI):
     await Database.connect_db()
     logger.info("Database connected")
     
+    # Shared outbound HTTP client (webhook deliveries)
+    from utils.http_client import HTTPClient
+    await HTTPClient.start()
+    
+    # Build model clients ahead of the first try-on job
+    from utils.model_client_pool import model_client_pool
+    try:
+        warmed = model_client_pool.warm_up()
+        logger.info(f"Model clients warmed up: {warmed}")
+    except Exception as e:
+        logger.warning(f"Model client warm-up warning: {str(e)}")
+    
+    # Buffered audit log writer
+    from services.audit_service import AuditService
+    AuditService.start()
+    
     # Create database indexes
     try:
         from utils.database_indexes import create_indexes
         await create_indexes()
+        from services.retention_service import RetentionService
+        await RetentionService.ensure_ttl_indexes()
         logger.info("Database indexes created")
     except Exception as e:
         logger.warning(f"Index creation warning: {str(e)}")
     
+    # Fill admin search fields on users created before they existed
+    try:
+        from utils.user_search import backfill_search_fields
+        await backfill_search_fields()
+    except Exception as e:
+        logger.warning(f"User search backfill warning: {str(e)}")
+    
     # Start daily credit reset scheduler
     from schedulers.daily_reset_scheduler import get_scheduler
     scheduler = get_scheduler()
     scheduler.start()
     logger.info("Scheduler started")
     
+    # Load the IP blocklist and keep it in sync with the database
+    from services.abuse_detection_service import AbuseDetectionService
+    from schedulers.ip_blocklist_scheduler import get_ip_blocklist_scheduler
+    try:
+        blocked_count = await AbuseDetectionService.refresh_ip_blocklist()
+        logger.info(f"IP blocklist loaded ({blocked_count} entries)")
+    except Exception as e:
+        logger.warning(f"IP blocklist load warning: {str(e)}")
+    ip_blocklist_scheduler = get_ip_blocklist_scheduler()
+    ip_blocklist_scheduler.start()
+    
+    # Load active prompts and keep them in sync with the database
+    from services.prompt_registry import PromptRegistry
+    from schedulers.prompt_registry_scheduler import get_prompt_registry_scheduler
+    try:
+        prompt_count = await PromptRegistry.refresh()
+        logger.info(f"Prompt registry loaded ({prompt_count} active prompts)")
+    except Exception as e:
+        logger.warning(f"Prompt registry load warning: {str(e)}")
+    prompt_registry_scheduler = get_prompt_registry_scheduler()
+    prompt_registry_scheduler.start()
+    
+    # Re-run jobs orphaned by a crashed instance, now and on an interval
+    from schedulers.job_recovery_scheduler import get_job_recovery_scheduler
+    job_recovery_scheduler = get_job_recovery_scheduler()
+    await job_recovery_scheduler.recover()
+    job_recovery_scheduler.start()
+    
+    # Deliver batched webhook events a crashed instance left in the outbox
+    from schedulers.webhook_batch_scheduler import get_webhook_batch_scheduler
+    webhook_batch_scheduler = get_webhook_batch_scheduler()
+    await webhook_batch_scheduler.recover()
+    webhook_batch_scheduler.start()
+    
+    # Nightly archival of documents past their retention
+    from schedulers.retention_scheduler import get_retention_scheduler
+    retention_scheduler = get_retention_scheduler()
+    retention_scheduler.start()
+    
     yield
     # Shutdown
     logger.info("Shutting down TrailRoom API...")
     scheduler.shutdown()
+    ip_blocklist_scheduler.shutdown()
+    prompt_registry_scheduler.shutdown()
+    job_recovery_scheduler.shutdown()
+    retention_scheduler.shutdown()
+    webhook_batch_scheduler.shutdown()
+    from services.webhook_service import WebhookService
+    await WebhookService.flush_batches()
+    await AuditService.stop()
+    await HTTPClient.close()
     await Database.close_db()
 
 # Create the main app
@@ -107,4 +181,7 @@ app.add_middleware(
     allow_origins=settings.CORS_ORIGINS.split(','),
     allow_methods=["*"],
     allow_headers=["*"],
-)
\ No newline at end of file
+)
+
+# Reject blocked IPs before anything else (added last so it runs first)
+app.add_middleware(IPBlockMiddleware)
@@ -1,7 +1,11 @@
 from database import Database
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict
 import logging
+import numpy as np
+
+from utils.ip_blocklist import ip_blocklist, normalize_ip_entry
+from utils.rate_limiter import tryon_job_counter
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +14,177 @@ class AbuseDetectionService:
     Service for detecting abuse patterns and suspicious activity
     """
     
+    # Detection thresholds
+    EXCESSIVE_USAGE_THRESHOLD = 50  # Jobs per hour
+    FAILED_PAYMENT_THRESHOLD = 3  # Failed payments per week
+    SCRAPING_MIN_JOBS = 20  # Jobs per day needed to judge interval patterns
+    SCRAPING_MAX_VARIANCE = 100  # Interval variance (seconds^2) below which timing looks automated
+    SCRAPING_MAX_AVG_INTERVAL = 300  # < 5 min average interval
+    
+    # Max ids per $in lookup when joining flagged users
+    USER_LOOKUP_BATCH_SIZE = 1000
+    
+    @staticmethod
+    def _excessive_usage_result(user_id: str, job_count: int, time_window: int) -> dict:
+        return {
+            "user_id": user_id,
+            "job_count": job_count,
+            "time_window_minutes": time_window,
+            "is_suspicious": job_count > AbuseDetectionService.EXCESSIVE_USAGE_THRESHOLD,
+            "threshold": AbuseDetectionService.EXCESSIVE_USAGE_THRESHOLD,
+            "checked_at": datetime.utcnow()
+        }
+    
+    @staticmethod
+    def _failed_payments_result(user_id: str, failed_count: int) -> dict:
+        return {
+            "user_id": user_id,
+            "failed_payment_count": failed_count,
+            "time_window_days": 7,
+            "is_suspicious": failed_count >= AbuseDetectionService.FAILED_PAYMENT_THRESHOLD,
+            "threshold": AbuseDetectionService.FAILED_PAYMENT_THRESHOLD,
+            "checked_at": datetime.utcnow()
+        }
+    
+    @staticmethod
+    def _api_scraping_result(user_id: str, job_count: int, features: Optional[dict]) -> dict:
+        """
+        Judge scraping from interval features
+        Based on: high frequency, consistent patterns, no variation
+        """
+        if job_count < AbuseDetectionService.SCRAPING_MIN_JOBS:  # Not enough data
+            return {
+                "user_id": user_id,
+                "is_suspicious": False,
+                "reason": "Insufficient data",
+                "job_count": job_count
+            }
+        
+        if not features:
+            return {
+                "user_id": user_id,
+                "is_suspicious": False,
+                "job_count": job_count
+            }
+        
+        # Low variance + high frequency = suspicious
+        is_suspicious = (
+            features["variance"] < AbuseDetectionService.SCRAPING_MAX_VARIANCE and
+            features["avg_interval_seconds"] < AbuseDetectionService.SCRAPING_MAX_AVG_INTERVAL
+        )
+        
+        return {
+            "user_id": user_id,
+            "is_suspicious": is_suspicious,
+            "job_count": job_count,
+            **features,
+            "reason": "Consistent automated pattern detected" if is_suspicious else "Normal usage"
+        }
+    
+    @staticmethod
+    def compute_interval_features(
+        timestamps_by_user: Dict[str, List[datetime]],
+        window_hours: float = 24
+    ) -> Dict[str, dict]:
+        """
+        Vectorized per-user interval statistics over job timestamps
+        
+        All users are flattened into columnar (user code, epoch seconds) arrays
+        and reduced with bincount, so every user is scored in one pass.
+        Features per user with at least two jobs:
+        - avg_interval_seconds / variance / std_interval_seconds
+        - cv: coefficient of variation (std / mean)
+        - burstiness: (std - mean) / (std + mean); -1 periodic, ~0 random, -> 1 bursty
+        - periodicity: share of intervals within 10% of the user's mean interval
+        - min_interval_seconds and jobs_per_hour
+        """
+        user_ids = [u for u, ts in timestamps_by_user.items() if len(ts) >= 2]
+        if not user_ids:
+            return {}
+        
+        n_users = len(user_ids)
+        counts = np.fromiter(
+            (len(timestamps_by_user[u]) for u in user_ids), dtype=np.int64, count=n_users
+        )
+        codes = np.repeat(np.arange(n_users), counts)
+        times = np.array(
+            [t for u in user_ids for t in timestamps_by_user[u]], dtype="datetime64[ms]"
+        ).astype(np.int64) / 1000.0
+        
+        # Sort by (user, time) and keep intervals between jobs of the same user
+        order = np.lexsort((times, codes))
+        codes, times = codes[order], times[order]
+        same_user = codes[1:] == codes[:-1]
+        interval_codes = codes[1:][same_user]
+        intervals = np.diff(times)[same_user]
+        
+        n_intervals = np.bincount(interval_codes, minlength=n_users)
+        mean = np.bincount(interval_codes, weights=intervals, minlength=n_users) / n_intervals
+        deviation = intervals - mean[interval_codes]
+        variance = np.bincount(interval_codes, weights=deviation ** 2, minlength=n_users) / n_intervals
+        std = np.sqrt(variance)
+        near_mean = np.abs(deviation) <= 0.1 * mean[interval_codes]
+        periodicity = np.bincount(interval_codes, weights=near_mean, minlength=n_users) / n_intervals
+        min_interval = np.full(n_users, np.inf)
+        np.minimum.at(min_interval, interval_codes, intervals)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.where(mean > 0, std / mean, 0.0)
+            burstiness = np.where(std + mean > 0, (std - mean) / (std + mean), 0.0)
+        
+        return {
+            user_id: {
+                "avg_interval_seconds": round(float(mean[i]), 2),
+                "variance": round(float(variance[i]), 2),
+                "std_interval_seconds": round(float(std[i]), 2),
+                "cv": round(float(cv[i]), 3),
+                "burstiness": round(float(burstiness[i]), 3),
+                "periodicity": round(float(periodicity[i]), 3),
+                "min_interval_seconds": round(float(min_interval[i]), 2),
+                "jobs_per_hour": round(float(counts[i]) / window_hours, 2)
+            }
+            for i, user_id in enumerate(user_ids)
+        }
+    
+    @staticmethod
+    async def detect_bot_patterns(window_hours: int = 24) -> Dict[str, dict]:
+        """
+        Score every user with jobs in the window for bot-like timing
+        Returns {user_id: api_scraping result}
+        """
+        try:
+            db = Database.get_analytics_db()
+            since = datetime.utcnow() - timedelta(hours=window_hours)
+            
+            # Counts only: one small row per user, however many jobs they ran
+            counts = {}
+            async for row in db.tryon_jobs.aggregate([
+                {"$match": {"created_at": {"$gte": since}}},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ], allowDiskUse=True):
+                counts[row["_id"]] = row["count"]
+            
+            # Timestamps are streamed, never grouped into one document, and only
+            # for users with enough jobs to judge
+            candidates = [u for u, count in counts.items() if count >= AbuseDetectionService.SCRAPING_MIN_JOBS]
+            timestamps_by_user = {}
+            batch_size = AbuseDetectionService.USER_LOOKUP_BATCH_SIZE
+            for i in range(0, len(candidates), batch_size):
+                async for job in db.tryon_jobs.find(
+                    {"user_id": {"$in": candidates[i:i + batch_size]}, "created_at": {"$gte": since}},
+                    {"_id": 0, "user_id": 1, "created_at": 1}
+                ):
+                    timestamps_by_user.setdefault(job["user_id"], []).append(job["created_at"])
+            
+            features = AbuseDetectionService.compute_interval_features(timestamps_by_user, window_hours)
+            return {
+                user_id: AbuseDetectionService._api_scraping_result(user_id, count, features.get(user_id))
+                for user_id, count in counts.items()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error detecting bot patterns: {str(e)}")
+            raise
+    
     @staticmethod
     async def detect_excessive_usage(user_id: str, time_window: int = 60) -> dict:
         """
@@ -17,6 +192,11 @@ class AbuseDetectionService:
         time_window: minutes to check
         """
         try:
+            # Prefer the live counters fed by job creation when they cover the window
+            if tryon_job_counter.covers(time_window * 60):
+                job_count = await tryon_job_counter.count(user_id, time_window * 60)
+                return AbuseDetectionService._excessive_usage_result(user_id, job_count, time_window)
+            
             db = Database.get_db()
             start_time = datetime.utcnow() - timedelta(minutes=time_window)
             
@@ -26,17 +206,7 @@ class AbuseDetectionService:
                 "created_at": {"$gte": start_time}
             })
             
-            # Threshold: 50 jobs per hour is suspicious
-            is_suspicious = job_count > 50
-            
-            return {
-                "user_id": user_id,
-                "job_count": job_count,
-                "time_window_minutes": time_window,
-                "is_suspicious": is_suspicious,
-                "threshold": 50,
-                "checked_at": datetime.utcnow()
-            }
+            return AbuseDetectionService._excessive_usage_result(user_id, job_count, time_window)
             
         except Exception as e:
             logger.error(f"Error detecting excessive usage: {str(e)}")
@@ -58,17 +228,7 @@ class AbuseDetectionService:
                 "created_at": {"$gte": week_ago}
             })
             
-            # Threshold: 3 or more failed payments is suspicious
-            is_suspicious = failed_count >= 3
-            
-            return {
-                "user_id": user_id,
-                "failed_payment_count": failed_count,
-                "time_window_days": 7,
-                "is_suspicious": is_suspicious,
-                "threshold": 3,
-                "checked_at": datetime.utcnow()
-            }
+            return AbuseDetectionService._failed_payments_result(user_id, failed_count)
             
         except Exception as e:
             logger.error(f"Error detecting failed payments: {str(e)}")
@@ -83,53 +243,16 @@ class AbuseDetectionService:
         try:
             db = Database.get_db()
             
-            # Get last 24 hours of jobs
+            # Get last 24 hours of job timestamps
             day_ago = datetime.utcnow() - timedelta(days=1)
-            jobs = await db.tryon_jobs.find({
-                "user_id": user_id,
-                "created_at": {"$gte": day_ago}
-            }).to_list(None)
+            jobs = await db.tryon_jobs.find(
+                {"user_id": user_id, "created_at": {"$gte": day_ago}},
+                {"_id": 0, "created_at": 1}
+            ).to_list(None)
             
-            if len(jobs) < 20:  # Not enough data
-                return {
-                    "user_id": user_id,
-                    "is_suspicious": False,
-                    "reason": "Insufficient data",
-                    "job_count": len(jobs)
-                }
-            
-            # Check for consistent time intervals (bot-like behavior)
-            if len(jobs) >= 2:
-                timestamps = [job["created_at"] for job in jobs]
-                timestamps.sort()
-                
-                intervals = []
-                for i in range(1, len(timestamps)):
-                    interval = (timestamps[i] - timestamps[i-1]).total_seconds()
-                    intervals.append(interval)
-                
-                # If intervals are very consistent (low variance), might be automated
-                if len(intervals) > 0:
-                    avg_interval = sum(intervals) / len(intervals)
-                    variance = sum((x - avg_interval) ** 2 for x in intervals) / len(intervals)
-                    
-                    # Low variance + high frequency = suspicious
-                    is_suspicious = variance < 100 and avg_interval < 300  # < 5 min avg
-                    
-                    return {
-                        "user_id": user_id,
-                        "is_suspicious": is_suspicious,
-                        "job_count": len(jobs),
-                        "avg_interval_seconds": round(avg_interval, 2),
-                        "variance": round(variance, 2),
-                        "reason": "Consistent automated pattern detected" if is_suspicious else "Normal usage"
-                    }
-            
-            return {
-                "user_id": user_id,
-                "is_suspicious": False,
-                "job_count": len(jobs)
-            }
+            timestamps = [job["created_at"] for job in jobs]
+            features = AbuseDetectionService.compute_interval_features({user_id: timestamps})
+            return AbuseDetectionService._api_scraping_result(user_id, len(timestamps), features.get(user_id))
             
         except Exception as e:
             logger.error(f"Error detecting API scraping: {str(e)}")
@@ -139,37 +262,80 @@ class AbuseDetectionService:
     async def get_suspicious_users() -> List[dict]:
         """
         Get list of users with suspicious activity
+        
+        Runs one aggregation per signal grouped by user_id over the whole
+        window, then joins the results in memory, instead of querying per user.
         """
         try:
-            db = Database.get_db()
-            suspicious_users = []
+            db = Database.get_analytics_db()
+            now = datetime.utcnow()
             
-            # Get all active users
-            users = await db.users.find({"is_active": True}).to_list(None)
-            
-            for user in users:
-                user_id = user["id"]
-                
-                # Check various abuse patterns
-                excessive_usage = await AbuseDetectionService.detect_excessive_usage(user_id, 60)
-                failed_payments = await AbuseDetectionService.detect_failed_payments(user_id)
-                api_scraping = await AbuseDetectionService.detect_api_scraping(user_id)
-                
-                # If any pattern is suspicious, add to list
+            # Jobs per user in the last hour
+            usage_counts = {}
+            async for row in db.tryon_jobs.aggregate([
+                {"$match": {"created_at": {"$gte": now - timedelta(minutes=60)}}},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ], allowDiskUse=True):
+                usage_counts[row["_id"]] = row["count"]
+            
+            # Failed payments per user in the last 7 days
+            failed_counts = {}
+            async for row in db.payments.aggregate([
+                {"$match": {
+                    "status": "failed",
+                    "created_at": {"$gte": now - timedelta(days=7)}
+                }},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ], allowDiskUse=True):
+                failed_counts[row["_id"]] = row["count"]
+            
+            # Bot-pattern scores for every user with jobs in the last 24 hours
+            scraping_results = await AbuseDetectionService.detect_bot_patterns(24)
+            
+            # Evaluate each signal for every user seen in any window
+            flagged = {}
+            for user_id in set(usage_counts) | set(failed_counts) | set(scraping_results):
+                excessive_usage = AbuseDetectionService._excessive_usage_result(
+                    user_id, usage_counts.get(user_id, 0), 60
+                )
+                failed_payments = AbuseDetectionService._failed_payments_result(
+                    user_id, failed_counts.get(user_id, 0)
+                )
+                api_scraping = scraping_results.get(user_id) or AbuseDetectionService._api_scraping_result(
+                    user_id, 0, None
+                )
                 if excessive_usage["is_suspicious"] or failed_payments["is_suspicious"] or api_scraping["is_suspicious"]:
-                    suspicious_users.append({
-                        "user_id": user_id,
-                        "email": user.get("email"),
-                        "role": user.get("role"),
-                        "excessive_usage": excessive_usage["is_suspicious"],
-                        "failed_payments": failed_payments["is_suspicious"],
-                        "api_scraping": api_scraping["is_suspicious"],
-                        "details": {
-                            "excessive_usage": excessive_usage,
-                            "failed_payments": failed_payments,
-                            "api_scraping": api_scraping
-                        }
-                    })
+                    flagged[user_id] = (excessive_usage, failed_payments, api_scraping)
+            
+            # Join flagged ids against active users in batches
+            users = {}
+            flagged_ids = list(flagged)
+            batch_size = AbuseDetectionService.USER_LOOKUP_BATCH_SIZE
+            for i in range(0, len(flagged_ids), batch_size):
+                async for user in db.users.find(
+                    {"id": {"$in": flagged_ids[i:i + batch_size]}, "is_active": True},
+                    {"_id": 0, "id": 1, "email": 1, "role": 1}
+                ):
+                    users[user["id"]] = user
+            
+            suspicious_users = []
+            for user_id, (excessive_usage, failed_payments, api_scraping) in flagged.items():
+                user = users.get(user_id)
+                if not user:
+                    continue
+                suspicious_users.append({
+                    "user_id": user_id,
+                    "email": user.get("email"),
+                    "role": user.get("role"),
+                    "excessive_usage": excessive_usage["is_suspicious"],
+                    "failed_payments": failed_payments["is_suspicious"],
+                    "api_scraping": api_scraping["is_suspicious"],
+                    "details": {
+                        "excessive_usage": excessive_usage,
+                        "failed_payments": failed_payments,
+                        "api_scraping": api_scraping
+                    }
+                })
             
             return suspicious_users
             
@@ -180,8 +346,10 @@ class AbuseDetectionService:
     @staticmethod
     async def block_ip(ip_address: str, reason: str, admin_id: str) -> dict:
         """
-        Block an IP address
+        Block an IP address or CIDR range (e.g. 203.0.113.0/24)
+        Raises ValueError for an invalid address
         """
+        ip_address = normalize_ip_entry(ip_address)
         try:
             db = Database.get_db()
             
@@ -194,6 +362,7 @@ class AbuseDetectionService:
             }
             
             await db.blocked_ips.insert_one(blocked_ip)
+            await AbuseDetectionService.refresh_ip_blocklist()
             
             return blocked_ip
             
@@ -204,15 +373,18 @@ class AbuseDetectionService:
     @staticmethod
     async def unblock_ip(ip_address: str) -> bool:
         """
-        Unblock an IP address
+        Unblock an IP address or CIDR range
+        Raises ValueError for an invalid address
         """
+        ip_address = normalize_ip_entry(ip_address)
         try:
             db = Database.get_db()
             
-            result = await db.blocked_ips.update_one(
-                {"ip_address": ip_address},
+            result = await db.blocked_ips.update_many(
+                {"ip_address": ip_address, "is_active": True},
                 {"$set": {"is_active": False}}
             )
+            await AbuseDetectionService.refresh_ip_blocklist()
             
             return result.modified_count > 0
             
@@ -234,3 +406,17 @@ class AbuseDetectionService:
         except Exception as e:
             logger.error(f"Error getting blocked IPs: {str(e)}")
             raise
+    
+    @staticmethod
+    async def refresh_ip_blocklist() -> int:
+        """
+        Reload active blocks into the in-memory blocklist used by IPBlockMiddleware
+        """
+        db = Database.get_db()
+        entries = [
+            doc["ip_address"]
+            async for doc in db.blocked_ips.find({"is_active": True}, {"_id": 0, "ip_address": 1})
+        ]
+        ip_blocklist.replace(entries)
+        logger.debug(f"IP blocklist refreshed: {len(entries)} entries")
+        return len(entries)
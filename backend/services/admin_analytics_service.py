@@ -16,7 +16,7 @@ class AdminAnalyticsService:
         Get comprehensive dashboard statistics
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             
             # User statistics
             total_users = await db.users.count_documents({})
@@ -137,7 +137,7 @@ class AdminAnalyticsService:
         Get daily revenue data for chart
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             start_date = datetime.utcnow() - timedelta(days=days)
             
             pipeline = [
@@ -183,7 +183,7 @@ class AdminAnalyticsService:
         Get daily job statistics for chart
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             start_date = datetime.utcnow() - timedelta(days=days)
             
             pipeline = [
@@ -226,13 +226,67 @@ class AdminAnalyticsService:
             logger.error(f"Error getting jobs chart: {str(e)}")
             raise
     
+    @staticmethod
+    async def get_prompt_version_stats(days: int = 30):
+        """
+        Get job outcomes per prompt version, to compare prompt revisions
+        """
+        try:
+            db = Database.get_analytics_db()
+            start_date = datetime.utcnow() - timedelta(days=days)
+            
+            pipeline = [
+                {
+                    "$match": {
+                        "created_at": {"$gte": start_date}
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": {
+                            "mode": "$mode",
+                            "prompt_version": "$prompt_version",
+                            "status": "$status"
+                        },
+                        "count": {"$sum": 1}
+                    }
+                }
+            ]
+            
+            results = await db.tryon_jobs.aggregate(pipeline).to_list(None)
+            
+            # Organize by mode and version
+            by_version = {}
+            for r in results:
+                key = (r["_id"]["mode"], r["_id"].get("prompt_version"))
+                if key not in by_version:
+                    by_version[key] = {
+                        "mode": key[0],
+                        "prompt_version": key[1],
+                        "completed": 0, "failed": 0, "processing": 0, "queued": 0
+                    }
+                by_version[key][r["_id"]["status"]] = r["count"]
+            
+            for row in by_version.values():
+                finished = row["completed"] + row["failed"]
+                row["success_rate"] = round(row["completed"] / finished * 100, 2) if finished else None
+            
+            return sorted(
+                by_version.values(),
+                key=lambda row: (row["mode"], row["prompt_version"] if row["prompt_version"] is not None else -1)
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting prompt version stats: {str(e)}")
+            raise
+    
     @staticmethod
     async def get_user_growth_chart(days: int = 30):
         """
         Get user growth data for chart
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             start_date = datetime.utcnow() - timedelta(days=days)
             
             pipeline = [
@@ -31,7 +31,7 @@ class AnalyticsService:
             metadata=metadata
         )
 
-        db = await Database.get_database()
+        db = Database.get_db()
         await db.usage_events.insert_one(event.model_dump())
         logger.debug(f"Tracked request: {method} {endpoint} for user {user_id}")
 
@@ -51,7 +51,7 @@ class AnalyticsService:
         period_start = datetime.utcnow() - timedelta(days=days)
         period_end = datetime.utcnow()
 
-        db = await Database.get_database()
+        db = Database.get_analytics_db()
 
         # Get all events in period
         events = await db.usage_events.find({
@@ -121,7 +121,7 @@ class AnalyticsService:
         days = period_map.get(period, 30)
         period_start = datetime.utcnow() - timedelta(days=days)
 
-        db = await Database.get_database()
+        db = Database.get_analytics_db()
 
         # Get credit transactions
         transactions = await db.credit_transactions.find({
@@ -169,7 +169,7 @@ class AnalyticsService:
         days = period_map.get(period, 7)
         period_start = datetime.utcnow() - timedelta(days=days)
 
-        db = await Database.get_database()
+        db = Database.get_analytics_db()
 
         # Get all events in period
         events = await db.usage_events.find({
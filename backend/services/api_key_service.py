@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Optional, List
 from database import get_database
 from models.api_key_model import APIKey, APIKeyResponse
+from utils.datetime_codec import API_KEY_DATETIME_FIELDS, decode_datetimes
 import logging
 
 logger = logging.getLogger(__name__)
@@ -38,28 +39,30 @@ class APIKeyService:
         )
         
         # Save to database
-        api_key_doc = api_key_obj.model_dump()
-        api_key_doc['created_at'] = api_key_doc['created_at'].isoformat()
-        if api_key_doc.get('last_used'):
-            api_key_doc['last_used'] = api_key_doc['last_used'].isoformat()
-        if api_key_doc.get('expires_at'):
-            api_key_doc['expires_at'] = api_key_doc['expires_at'].isoformat()
-        
-        await db.api_keys.insert_one(api_key_doc)
+        await db.api_keys.insert_one(api_key_obj.model_dump())
         logger.info(f"Created API key for user {user_id}")
         
         return api_key, api_key_obj
     
+    @staticmethod
+    async def _lookup_key(key_hash: str) -> Optional[dict]:
+        """
+        Active key by hash -> {id, user_id}. Not cached, so a revoked key
+        stops working immediately on every worker.
+        """
+        db = get_database()
+        return await db.api_keys.find_one(
+            {"key_hash": key_hash, "is_active": True},
+            {"_id": 0, "id": 1, "user_id": 1}
+        )
+    
     @staticmethod
     async def validate_api_key(api_key: str) -> Optional[str]:
         """Validate API key and return user_id"""
         db = get_database()
         key_hash = APIKeyService.hash_key(api_key)
         
-        api_key_doc = await db.api_keys.find_one(
-            {"key_hash": key_hash, "is_active": True},
-            {"_id": 0}
-        )
+        api_key_doc = await APIKeyService._lookup_key(key_hash)
         
         if not api_key_doc:
             return None
@@ -68,7 +71,7 @@ class APIKeyService:
         await db.api_keys.update_one(
             {"id": api_key_doc["id"]},
             {
-                "$set": {"last_used": datetime.utcnow().isoformat()},
+                "$set": {"last_used": datetime.utcnow()},
                 "$inc": {"usage_count": 1}
             }
         )
@@ -87,10 +90,7 @@ class APIKeyService:
         # Convert to response models
         response_keys = []
         for key_doc in api_keys:
-            if isinstance(key_doc.get('created_at'), str):
-                key_doc['created_at'] = datetime.fromisoformat(key_doc['created_at'])
-            if isinstance(key_doc.get('last_used'), str):
-                key_doc['last_used'] = datetime.fromisoformat(key_doc['last_used'])
+            decode_datetimes(key_doc, API_KEY_DATETIME_FIELDS)
             
             response_keys.append(APIKeyResponse(
                 id=key_doc["id"],
@@ -1,8 +1,14 @@
 from database import Database
 from models.audit_log_model import AuditLogCreate, AuditLogInDB
+from config import settings
+from datetime import datetime
 from typing import Optional, List
+import asyncio
 import logging
 
+from utils.audit_index import build_search_query, index_fields, month_range, naive_utc
+from utils.pagination import apply_cursor, keyset_sort
+
 logger = logging.getLogger(__name__)
 
 class AuditService:
@@ -10,6 +16,71 @@ class AuditService:
     Service for managing audit logs
     """
     
+    # Money-moving actions are always written before log_action returns
+    MUST_PERSIST_ACTIONS = {"payment.refund", "user.credits.adjust", "job.refund"}
+    
+    # Buffered writer state; while stopped, log_action writes directly
+    _queue: Optional[asyncio.Queue] = None
+    _writer_task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def start(cls):
+        """Start the background writer (call from the running event loop)"""
+        if cls._writer_task is not None:
+            return
+        cls._queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_MAX_SIZE)
+        cls._writer_task = asyncio.create_task(cls._writer(cls._queue))
+        logger.info("Audit log writer started")
+    
+    @classmethod
+    async def stop(cls):
+        """Flush everything queued, then stop the writer"""
+        if cls._writer_task is None:
+            return
+        queue, task = cls._queue, cls._writer_task
+        cls._queue = None  # New entries go straight to the database from here on
+        await queue.put(None)
+        await task
+        cls._writer_task = None
+        logger.info("Audit log writer stopped")
+    
+    @staticmethod
+    async def _write_batch(batch: List[dict]):
+        for attempt in range(1, settings.AUDIT_WRITE_RETRIES + 1):
+            try:
+                await Database.get_db().audit_logs.insert_many(batch, ordered=False)
+                return
+            except Exception as e:
+                logger.warning(f"Audit batch write failed (attempt {attempt}): {str(e)}")
+                if attempt < settings.AUDIT_WRITE_RETRIES:
+                    await asyncio.sleep(0.5 * attempt)
+        logger.error(f"Dropped {len(batch)} audit logs: {[doc['id'] for doc in batch]}")
+    
+    @classmethod
+    async def _writer(cls, queue: asyncio.Queue):
+        """Collect up to AUDIT_BATCH_SIZE entries or AUDIT_FLUSH_INTERVAL seconds, then insert_many"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            doc = await queue.get()
+            if doc is None:
+                break
+            batch = [doc]
+            deadline = loop.time() + settings.AUDIT_FLUSH_INTERVAL
+            while len(batch) < settings.AUDIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if doc is None:
+                    stopping = True
+                    break
+                batch.append(doc)
+            await cls._write_batch(batch)
+    
     @staticmethod
     async def log_action(
         action: str,
@@ -19,14 +90,17 @@ class AuditService:
         target_id: Optional[str] = None,
         details: dict = {},
         ip_address: Optional[str] = None,
-        user_agent: Optional[str] = None
+        user_agent: Optional[str] = None,
+        must_persist: bool = False
     ):
         """
         Log an admin action
+        Entries are queued for a batched write unless must_persist is set (or
+        the action is in MUST_PERSIST_ACTIONS), in which case the insert
+        completes before returning. A full queue also falls back to a direct
+        insert rather than dropping the entry.
         """
         try:
-            db = Database.get_db()
-            
             audit_log = AuditLogInDB(
                 action=action,
                 admin_id=admin_id,
@@ -38,7 +112,18 @@ class AuditService:
                 user_agent=user_agent
             )
             
-            await db.audit_logs.insert_one(audit_log.model_dump())
+            log_doc = audit_log.model_dump()
+            log_doc.update(index_fields(action, admin_email, target_id))
+            
+            queue = AuditService._queue
+            if queue is not None and not must_persist and action not in AuditService.MUST_PERSIST_ACTIONS:
+                try:
+                    queue.put_nowait(log_doc)
+                    return audit_log
+                except asyncio.QueueFull:
+                    logger.warning("Audit log queue full; writing directly")
+            
+            await Database.get_db().audit_logs.insert_one(log_doc)
             logger.info(f"Audit log created: {action} by {admin_email}")
             
             return audit_log
@@ -52,14 +137,20 @@ class AuditService:
         target_type: Optional[str] = None,
         target_id: Optional[str] = None,
         admin_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        month: Optional[str] = None,
         limit: int = 100,
-        skip: int = 0
+        skip: int = 0,
+        cursor: Optional[str] = None
     ) -> List[dict]:
         """
         Get audit logs with filters
+        `month` (YYYY-MM) and start/end both become bounds on the timestamp.
+        A cursor (see utils.pagination) takes precedence over skip
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             
             query = {}
             if target_type:
@@ -69,7 +160,23 @@ class AuditService:
             if admin_id:
                 query["admin_id"] = admin_id
             
-            logs = await db.audit_logs.find(query).sort("timestamp", -1).skip(skip).limit(limit).to_list(None)
+            # Time bounds lead into the (filter, timestamp, id) indexes
+            start, end = naive_utc(start), naive_utc(end)
+            if month:
+                month_start, month_end = month_range(month)
+                start = max(start, month_start) if start else month_start
+                end = min(end, month_end) if end else month_end
+            if start or end:
+                query["timestamp"] = {}
+                if start:
+                    query["timestamp"]["$gte"] = start
+                if end:
+                    query["timestamp"]["$lt"] = end
+            
+            logs = await db.audit_logs.find(
+                apply_cursor(query, "timestamp", cursor),
+                {"search_tokens": 0}
+            ).sort(keyset_sort("timestamp")).skip(0 if cursor else skip).limit(limit).to_list(None)
             
             return logs
             
@@ -81,23 +188,19 @@ class AuditService:
     async def search_logs(search_term: str, limit: int = 100) -> List[dict]:
         """
         Search audit logs
+        Prefix match on action, admin_email and target_id tokens (see utils.audit_index)
         """
         try:
-            db = Database.get_db()
+            db = Database.get_analytics_db()
             
-            # Search in action, admin_email, and target_id
-            query = {
-                "$or": [
-                    {"action": {"$regex": search_term, "$options": "i"}},
-                    {"admin_email": {"$regex": search_term, "$options": "i"}},
-                    {"target_id": {"$regex": search_term, "$options": "i"}}
-                ]
-            }
+            query = build_search_query(search_term)
             
-            logs = await db.audit_logs.find(query).sort("timestamp", -1).limit(limit).to_list(None)
+            logs = await db.audit_logs.find(query, {"search_tokens": 0}).sort("timestamp", -1).limit(limit).to_list(None)
             
             return logs
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error searching audit logs: {str(e)}")
             raise
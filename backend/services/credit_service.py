@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from database import get_database
 from models.credit_transaction_model import CreditTransaction
 from config import settings
+from utils.datetime_codec import CREDIT_TRANSACTION_DATETIME_FIELDS, decode_datetimes, parse_datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +27,7 @@ class CreditService:
         # Update user credits
         await db.users.update_one(
             {"id": user_id},
-            {"$set": {"credits": new_balance, "updated_at": datetime.utcnow().isoformat()}}
+            {"$set": {"credits": new_balance, "updated_at": datetime.utcnow()}}
         )
         
         # Create transaction record
@@ -37,48 +40,67 @@ class CreditService:
             reference_id=reference_id
         )
         
-        transaction_doc = transaction.model_dump()
-        transaction_doc['created_at'] = transaction_doc['created_at'].isoformat()
-        await db.credit_transactions.insert_one(transaction_doc)
+        await db.credit_transactions.insert_one(transaction.model_dump())
         
         logger.info(f"Added {credits} credits to user {user_id}. New balance: {new_balance}")
         return new_balance
     
     @staticmethod
     async def deduct_credits(user_id: str, credits: int, description: str, reference_id: Optional[str] = None) -> int:
-        """Deduct credits from user account"""
+        """
+        Deduct credits from user account. With a reference_id (e.g. a job id)
+        the charge happens at most once: a repeat returns the recorded balance.
+        """
         db = get_database()
         
-        # Get current user credits
-        user = await db.users.find_one({"id": user_id}, {"credits": 1})
+        if reference_id is not None:
+            charged = await db.credit_transactions.find_one(
+                {"reference_id": reference_id, "type": "usage"},
+                {"_id": 0, "balance_after": 1}
+            )
+            if charged:
+                logger.info(f"Credits for {reference_id} already deducted from user {user_id}")
+                return charged["balance_after"]
+        
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "credits": 1})
         if not user:
             raise ValueError("User not found")
-        
-        current_credits = user.get("credits", 0)
-        if current_credits < credits:
+        if user.get("credits", 0) < credits:
             raise ValueError("Insufficient credits")
         
-        new_balance = current_credits - credits
-        
-        # Update user credits
-        await db.users.update_one(
-            {"id": user_id},
-            {"$set": {"credits": new_balance, "updated_at": datetime.utcnow().isoformat()}}
-        )
-        
-        # Create transaction record
+        # Ledger entry first: the unique reference_id index makes it the claim,
+        # so a concurrent run of the same job never reaches the decrement
         transaction = CreditTransaction(
             user_id=user_id,
             type="usage",
             credits=-credits,
-            balance_after=new_balance,
+            balance_after=user.get("credits", 0) - credits,
             description=description,
             reference_id=reference_id
         )
+        try:
+            await db.credit_transactions.insert_one(transaction.model_dump())
+        except DuplicateKeyError:
+            logger.warning(f"Duplicate deduction for {reference_id} skipped for user {user_id}")
+            return await CreditService.get_user_credits(user_id)
+        
+        # Check and update in one write so concurrent deductions can't overdraw
+        updated = await db.users.find_one_and_update(
+            {"id": user_id, "credits": {"$gte": credits}},
+            {"$inc": {"credits": -credits}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"credits": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            await db.credit_transactions.delete_one({"id": transaction.id})
+            raise ValueError("Insufficient credits")
         
-        transaction_doc = transaction.model_dump()
-        transaction_doc['created_at'] = transaction_doc['created_at'].isoformat()
-        await db.credit_transactions.insert_one(transaction_doc)
+        new_balance = updated["credits"]
+        if new_balance != transaction.balance_after:
+            # Another deduction landed between the read and the decrement
+            await db.credit_transactions.update_one(
+                {"id": transaction.id}, {"$set": {"balance_after": new_balance}}
+            )
         
         logger.info(f"Deducted {credits} credits from user {user_id}. New balance: {new_balance}")
         return new_balance
@@ -106,7 +128,7 @@ class CreditService:
         last_reset = user.get('last_free_credit_reset')
         if last_reset:
             if isinstance(last_reset, str):
-                last_reset = datetime.fromisoformat(last_reset)
+                last_reset = parse_datetime(last_reset)
             
             # If reset was today, skip
             if last_reset.date() == datetime.utcnow().date():
@@ -122,8 +144,8 @@ class CreditService:
             {
                 "$set": {
                     "credits": new_balance,
-                    "last_free_credit_reset": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
+                    "last_free_credit_reset": datetime.utcnow(),
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
@@ -137,9 +159,7 @@ class CreditService:
             description="Daily free credits"
         )
         
-        transaction_doc = transaction.model_dump()
-        transaction_doc['created_at'] = transaction_doc['created_at'].isoformat()
-        await db.credit_transactions.insert_one(transaction_doc)
+        await db.credit_transactions.insert_one(transaction.model_dump())
         
         logger.info(f"Reset daily free credits for user {user_id}")
         return True
@@ -153,9 +173,8 @@ class CreditService:
             {"_id": 0}
         ).sort("created_at", -1).limit(limit).to_list(limit)
         
-        # Convert ISO strings back to datetime
+        # Documents not yet migrated still hold ISO strings
         for trans in transactions:
-            if isinstance(trans.get('created_at'), str):
-                trans['created_at'] = datetime.fromisoformat(trans['created_at'])
+            decode_datetimes(trans, CREDIT_TRANSACTION_DATETIME_FIELDS)
         
         return transactions
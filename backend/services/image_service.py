@@ -3,6 +3,7 @@ import io
 from PIL import Image
 from typing import Tuple, Optional
 import logging
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,11 @@ class ImageService:
             logger.error(f"Invalid base64 image: {str(e)}")
             return False
     
+    @staticmethod
+    def validate_image_size(base64_str: str, max_bytes: Optional[int] = None) -> bool:
+        """Check the encoded image fits the per-image cap (TRYON_MAX_IMAGE_BYTES)"""
+        return len(base64_str) <= (max_bytes or settings.TRYON_MAX_IMAGE_BYTES)
+    
     @staticmethod
     def clean_base64_string(base64_str: str) -> str:
         """Remove data URL prefix from base64 string"""
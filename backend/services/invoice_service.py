@@ -3,6 +3,7 @@ from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from ..models.invoice_model import InvoiceModel, InvoiceLineItem, InvoiceResponse
+from ..utils.pagination import apply_cursor, keyset_sort
 
 class InvoiceService:
     """
@@ -110,13 +111,14 @@ class InvoiceService:
         """
         return await self.invoices_collection.find_one({"id": invoice_id})
     
-    async def get_invoices_by_user(self, user_id: str, limit: int = 50, skip: int = 0) -> List[Dict]:
+    async def get_invoices_by_user(self, user_id: str, limit: int = 50, skip: int = 0,
+                                   page_cursor: Optional[str] = None) -> List[Dict]:
         """
         Get all invoices for a user
         """
         cursor = self.invoices_collection.find(
-            {"user_id": user_id}
-        ).sort("invoice_date", -1).skip(skip).limit(limit)
+            apply_cursor({"user_id": user_id}, "invoice_date", page_cursor)
+        ).sort(keyset_sort("invoice_date")).skip(0 if page_cursor else skip).limit(limit)
         
         invoices = await cursor.to_list(length=limit)
         return invoices
@@ -0,0 +1,233 @@
+"""
+Recovery of try-on jobs orphaned in `queued` / `processing`
+
+Jobs run as in-process tasks, so a crashed instance leaves its jobs behind.
+The full inputs of every job are kept in `tryon_job_inputs` (the job itself
+only stores truncated images) until it completes. A sweep, run at startup
+and every JOB_RECOVERY_INTERVAL_SECONDS, picks up to JOB_RECOVERY_BATCH_SIZE
+jobs whose `updated_at` is older than JOB_STALE_AFTER_SECONDS and re-runs
+them. Each job is claimed with a conditional update on the `updated_at` it
+was read with, so concurrent sweeps on several instances run it once. A job
+is failed instead once it has been recovered JOB_MAX_RECOVERIES times or
+its inputs are gone.
+
+Each run of a job owns it through a `run_id` set when it moves the job to
+`processing`. While running it refreshes `updated_at` every
+JOB_HEARTBEAT_SECONDS, so a live job never looks stale, and its final write
+only lands while it still owns the job. A run whose job was taken over is
+cancelled at its next heartbeat.
+
+Credits stay correct across re-runs because usage is charged with the job
+id as reference_id, once (see CreditService.deduct_credits).
+"""
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from config import settings
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Statuses a job can be orphaned in
+RECOVERABLE_STATUSES = ["queued", "processing"]
+
+# Starts a job from its stored inputs, e.g. TryOnService.enqueue_job
+JobRunner = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+# Largest inputs document we write; Mongo rejects documents over 16MB
+MAX_INPUT_DOCUMENT_BYTES = 15 * 1024 * 1024
+
+
+class JobRunLostError(Exception):
+    """The job was taken over by another run while this one was still going"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        super().__init__(f"Job {job_id} was taken over by another run")
+
+
+class JobRecoveryService:
+    """Stores job inputs and re-enqueues stale or failed jobs"""
+
+    @staticmethod
+    async def save_inputs(job_id: str, user_id: str, mode: str, prompt_text: str,
+                          person_image: str, clothing_image: str,
+                          bottom_image: Optional[str] = None):
+        """Keep everything needed to run the job again"""
+        size = len(prompt_text) + len(person_image) + len(clothing_image) + len(bottom_image or "")
+        if size > MAX_INPUT_DOCUMENT_BYTES:
+            raise ValueError("Images are too large")
+        db = Database.get_db()
+        await db.tryon_job_inputs.insert_one({
+            "job_id": job_id,
+            "user_id": user_id,
+            "mode": mode,
+            "prompt_text": prompt_text,
+            "person_image": person_image,
+            "clothing_image": clothing_image,
+            "bottom_image": bottom_image,
+            "created_at": datetime.utcnow()
+        })
+
+    @staticmethod
+    async def get_inputs(job_id: str) -> Optional[Dict[str, Any]]:
+        db = Database.get_db()
+        return await db.tryon_job_inputs.find_one({"job_id": job_id}, {"_id": 0})
+
+    @staticmethod
+    async def discard_inputs(job_id: str):
+        db = Database.get_db()
+        await db.tryon_job_inputs.delete_one({"job_id": job_id})
+
+    @staticmethod
+    async def start_run(job_id: str) -> Optional[str]:
+        """Move a queued job to processing under a new run id; None if it isn't queued"""
+        db = Database.get_db()
+        run_id = str(uuid.uuid4())
+        result = await db.tryon_jobs.update_one(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "processing", "run_id": run_id, "updated_at": datetime.utcnow()}}
+        )
+        return run_id if result.matched_count else None
+
+    @staticmethod
+    async def finish_run(job_id: str, run_id: str, fields: Dict[str, Any]) -> bool:
+        """Final write of a run; ignored if the job has since been taken over"""
+        db = Database.get_db()
+        result = await db.tryon_jobs.update_one(
+            {"id": job_id, "run_id": run_id, "status": "processing"},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        )
+        if not result.matched_count:
+            logger.warning(f"Job {job_id}: run {run_id} no longer owns the job; result dropped")
+        return bool(result.matched_count)
+
+    @staticmethod
+    @asynccontextmanager
+    async def heartbeat(job_id: str, run_id: str, interval: Optional[float] = None):
+        """
+        Refresh the job's updated_at while the body runs. If the run loses the
+        job, the body is cancelled and JobRunLostError raised instead.
+        """
+        db = Database.get_db()
+        interval = interval or settings.JOB_HEARTBEAT_SECONDS
+        owner = asyncio.current_task()
+        lost = asyncio.Event()
+
+        async def beat():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    result = await db.tryon_jobs.update_one(
+                        {"id": job_id, "run_id": run_id, "status": "processing"},
+                        {"$set": {"updated_at": datetime.utcnow()}}
+                    )
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+                    continue
+                if not result.matched_count:
+                    lost.set()
+                    owner.cancel()
+                    return
+
+        beater = asyncio.create_task(beat())
+        try:
+            yield
+        except asyncio.CancelledError:
+            if not lost.is_set():
+                raise
+            owner.uncancel()
+            raise JobRunLostError(job_id) from None
+        finally:
+            beater.cancel()
+            await asyncio.gather(beater, return_exceptions=True)
+
+    @staticmethod
+    async def recover_stale_jobs(run_job: JobRunner, limit: Optional[int] = None) -> Dict[str, int]:
+        """One sweep; returns how many jobs were re-enqueued and failed"""
+        db = Database.get_db()
+        limit = limit or settings.JOB_RECOVERY_BATCH_SIZE
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER_SECONDS)
+        stale = await db.tryon_jobs.find(
+            {"status": {"$in": RECOVERABLE_STATUSES}, "updated_at": {"$lt": cutoff}},
+            {"_id": 0, "id": 1, "user_id": 1, "mode": 1, "status": 1, "updated_at": 1}
+        ).sort("updated_at", 1).limit(limit).to_list(length=limit)
+
+        result = {"found": len(stale), "requeued": 0, "failed": 0}
+        for job in stale:
+            claimed = await JobRecoveryService._claim(job)
+            if claimed is None:
+                continue  # Another instance got there first
+            if claimed.get("recovery_count", 0) > settings.JOB_MAX_RECOVERIES:
+                await JobRecoveryService._fail(
+                    claimed["id"], f"Job abandoned after {settings.JOB_MAX_RECOVERIES} recovery attempts"
+                )
+                result["failed"] += 1
+                continue
+            if await JobRecoveryService._requeue(claimed, run_job):
+                result["requeued"] += 1
+            else:
+                result["failed"] += 1
+
+        if stale:
+            logger.info(f"Job recovery sweep: {result}")
+        return result
+
+    @staticmethod
+    async def retry_failed_job(job_id: str, run_job: JobRunner) -> Optional[Dict[str, Any]]:
+        """
+        Re-run a failed job from its stored inputs. Returns the job, or None
+        if it is no longer failed; raises ValueError if its inputs are gone.
+        """
+        db = Database.get_db()
+        inputs = await JobRecoveryService.get_inputs(job_id)
+        if not inputs:
+            raise ValueError("Job inputs are no longer available")
+        job = await db.tryon_jobs.find_one_and_update(
+            {"id": job_id, "status": "failed"},
+            {"$set": {"status": "queued", "error_message": None, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "id": 1, "user_id": 1, "mode": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            run_job(job, inputs)
+        return job
+
+    @staticmethod
+    async def _claim(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Take over a stale job unless it changed since it was read"""
+        db = Database.get_db()
+        return await db.tryon_jobs.find_one_and_update(
+            {"id": job["id"], "status": job["status"], "updated_at": job["updated_at"]},
+            {
+                "$set": {"status": "queued", "updated_at": datetime.utcnow(), "recovered_at": datetime.utcnow()},
+                "$inc": {"recovery_count": 1}
+            },
+            projection={"_id": 0, "id": 1, "user_id": 1, "mode": 1, "recovery_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    async def _requeue(job: Dict[str, Any], run_job: JobRunner) -> bool:
+        inputs = await JobRecoveryService.get_inputs(job["id"])
+        if not inputs:
+            await JobRecoveryService._fail(job["id"], "Job inputs are no longer available")
+            return False
+        logger.warning(f"Re-enqueueing orphaned job {job['id']} (recovery {job.get('recovery_count', 0)})")
+        run_job(job, inputs)
+        return True
+
+    @staticmethod
+    async def _fail(job_id: str, message: str):
+        db = Database.get_db()
+        await db.tryon_jobs.update_one(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "failed", "error_message": message, "updated_at": datetime.utcnow()}}
+        )
+        logger.error(f"Job {job_id} not recovered: {message}")
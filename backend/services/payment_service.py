@@ -9,6 +9,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..services.pricing_service import PricingService
 from ..services.credit_service import CreditService
 from ..models.payment_model import PaymentModel, PaymentResponse
+from ..utils.pagination import apply_cursor, keyset_sort
 
 class PaymentService:
     """
@@ -257,13 +258,14 @@ class PaymentService:
         except Exception:
             return False
     
-    async def get_payment_history(self, user_id: str, limit: int = 50, skip: int = 0) -> List[Dict]:
+    async def get_payment_history(self, user_id: str, limit: int = 50, skip: int = 0,
+                                  page_cursor: Optional[str] = None) -> List[Dict]:
         """
         Get payment history for a user
         """
         cursor = self.payments_collection.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).skip(skip).limit(limit)
+            apply_cursor({"user_id": user_id}, "created_at", page_cursor)
+        ).sort(keyset_sort("created_at")).skip(0 if page_cursor else skip).limit(limit)
         
         payments = await cursor.to_list(length=limit)
         return payments
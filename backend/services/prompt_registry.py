@@ -0,0 +1,79 @@
+"""
+In-memory registry of the active try-on prompt per mode
+
+Loaded at startup, reloaded after every prompt write on this instance and
+on an interval (PROMPT_REGISTRY_REFRESH_SECONDS) so writes made on other
+instances take effect too. Resolving a prompt never touches the database.
+Modes without an active prompt fall back to the built-in defaults, which
+are recorded as version 0.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Try-on job mode -> prompt mode
+JOB_PROMPT_MODES = {
+    "top": "top_only",
+    "full": "full_outfit",
+}
+
+DEFAULT_PROMPTS = {
+    "top_only": (
+        "You are a virtual try-on AI. Generate a realistic image showing the person "
+        "wearing the clothing item provided. The person's body, face, and pose should remain "
+        "the same, but they should be wearing the new top/clothing item naturally. "
+        "Ensure proper fit, lighting, shadows, and realistic fabric draping. "
+        "The background should remain similar to the original person image."
+    ),
+    "full_outfit": (
+        "You are a virtual try-on AI. Generate a realistic image showing the person "
+        "wearing both the top clothing item and bottom clothing item provided. "
+        "The person's body, face, and pose should remain the same, but they should be "
+        "wearing the complete outfit naturally. Ensure proper fit, lighting, shadows, "
+        "and realistic fabric draping for both pieces. The background should remain "
+        "similar to the original person image."
+    ),
+}
+
+
+def default_prompt(prompt_mode: str) -> Dict[str, Any]:
+    return {
+        "id": None,
+        "name": f"{prompt_mode}_default",
+        "mode": prompt_mode,
+        "prompt_text": DEFAULT_PROMPTS[prompt_mode],
+        "version": 0,
+    }
+
+
+class PromptRegistry:
+    """Active prompts keyed by prompt mode; swapped in one assignment on refresh"""
+
+    _active: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    async def refresh() -> int:
+        """Reload active prompts; returns how many modes have a stored prompt"""
+        db = Database.get_db()
+        active: Dict[str, Dict[str, Any]] = {}
+        # Ascending version, so if a mode has several active prompts the newest wins
+        async for prompt in db.prompts.find({"is_active": True}, {"_id": 0}).sort("version", 1):
+            active[prompt["mode"]] = prompt
+        PromptRegistry._active = active
+        return len(active)
+
+    @staticmethod
+    def get_active(prompt_mode: str) -> Optional[Dict[str, Any]]:
+        """Stored active prompt for a prompt mode, if any"""
+        return PromptRegistry._active.get(prompt_mode)
+
+    @staticmethod
+    def resolve(job_mode: str) -> Dict[str, Any]:
+        """Prompt to use for a try-on job mode ("top" / "full")"""
+        prompt_mode = JOB_PROMPT_MODES.get(job_mode)
+        if prompt_mode is None:
+            raise ValueError(f"Unknown try-on mode: {job_mode}")
+        return PromptRegistry._active.get(prompt_mode) or default_prompt(prompt_mode)
@@ -0,0 +1,359 @@
+"""
+Retention and archival for high-churn collections
+
+Documents older than their collection's retention are written to compressed
+monthly JSONL archives under RETENTION_ARCHIVE_DIR and then deleted (or, for
+try-on jobs, stripped of their result payload). TTL indexes sit behind the
+archiver as a backstop, RETENTION_TTL_GRACE_DAYS later.
+
+Every instance schedules archival, but a run only proceeds while it holds
+the `retention_archival` lease in `scheduler_leases`. The lease is taken
+with a conditional upsert, so one instance wins, and it expires after
+RETENTION_LEASE_SECONDS so a crashed holder doesn't block later runs.
+
+Archives are zstd-compressed when `zstandard` is installed, gzip otherwise.
+Documents are serialized with bson.json_util so types survive a restore.
+
+    python -m services.retention_service archive
+    python -m services.retention_service restore <archive file> [--into <collection>]
+"""
+import asyncio
+import gzip
+import io
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from config import settings
+from database import Database
+
+try:
+    import zstandard
+except ImportError:  # gzip archives only
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZSTD_LEVEL = 10
+INDEX_NOT_FOUND = 27
+INDEX_OPTIONS_CONFLICT = (85, 86)
+ARCHIVAL_LEASE = "retention_archival"
+
+
+@dataclass
+class RetentionPolicy:
+    collection: str
+    time_field: str
+    retention_days: int  # 0 disables archival and the TTL index
+    strip_fields: Tuple[str, ...] = ()  # Archive and unset these fields instead of deleting the document
+
+    @property
+    def ttl_index_name(self) -> str:
+        return f"{self.collection}_ttl"
+
+
+def retention_policies() -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy("usage_events", "timestamp", settings.USAGE_EVENTS_RETENTION_DAYS),
+        RetentionPolicy("webhook_deliveries", "created_at", settings.WEBHOOK_DELIVERIES_RETENTION_DAYS),
+        RetentionPolicy("audit_logs", "timestamp", settings.AUDIT_LOG_RETENTION_DAYS),
+        RetentionPolicy("tryon_jobs", "created_at", settings.TRYON_RESULT_RETENTION_DAYS,
+                        strip_fields=("result_image_base64",)),
+    ]
+
+
+def archive_extension() -> str:
+    return ".jsonl.zst" if zstandard else ".jsonl.gz"
+
+
+class ArchiveWriter:
+    """
+    Compressed JSONL file written under a .part name and renamed on close,
+    so a crash never leaves a truncated archive that looks complete
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._tmp_path = path + ".part"
+        self._raw = open(self._tmp_path, "wb")
+        if zstandard:
+            self._stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self.count = 0
+
+    def write(self, doc: Dict[str, Any]):
+        self._stream.write(json_util.dumps(doc).encode() + b"\n")
+        self.count += 1
+
+    def close(self):
+        self._stream.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        try:
+            self._raw.close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+
+def iter_archive(path: str) -> Iterator[Dict[str, Any]]:
+    """Documents in an archive file, in write order"""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst archives")
+        with open(path, "rb") as raw:
+            reader = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8")
+            for line in reader:
+                if line.strip():
+                    yield json_util.loads(line)
+    else:
+        with gzip.open(path, "rt", encoding="utf-8") as reader:
+            for line in reader:
+                if line.strip():
+                    yield json_util.loads(line)
+
+
+def archive_path(collection: str, month: str, run_stamp: str) -> str:
+    """<dir>/<collection>/<YYYY-MM>/<collection>-<YYYY-MM>-<run>.jsonl.zst"""
+    return os.path.join(
+        settings.RETENTION_ARCHIVE_DIR, collection, month,
+        f"{collection}-{month}-{run_stamp}{archive_extension()}"
+    )
+
+
+def _write_batch(writers: Dict[str, ArchiveWriter], policy: RetentionPolicy, run_stamp: str, docs: List[Dict[str, Any]]):
+    for doc in docs:
+        ts = doc.get(policy.time_field)
+        month = ts.strftime("%Y-%m") if isinstance(ts, datetime) else "undated"
+        writer = writers.get(month)
+        if writer is None:
+            writer = writers[month] = ArchiveWriter(archive_path(policy.collection, month, run_stamp))
+        writer.write(doc)
+
+
+def _close_writers(writers: Dict[str, ArchiveWriter]):
+    for writer in writers.values():
+        writer.close()
+
+
+def _abort_writers(writers: Dict[str, ArchiveWriter]):
+    for writer in writers.values():
+        writer.abort()
+
+
+class RetentionService:
+    """Archive and expire documents past their collection's retention"""
+
+    @staticmethod
+    async def ensure_ttl_indexes():
+        """Create, retune or drop each policy's TTL backstop index"""
+        db = Database.get_db()
+        for policy in retention_policies():
+            if policy.strip_fields:
+                continue  # Documents are kept; only a field expires
+            collection = db[policy.collection]
+
+            if policy.retention_days <= 0:
+                try:
+                    await collection.drop_index(policy.ttl_index_name)
+                except OperationFailure as e:
+                    if e.code != INDEX_NOT_FOUND:
+                        raise
+                continue
+
+            seconds = (policy.retention_days + settings.RETENTION_TTL_GRACE_DAYS) * 86400
+            try:
+                await collection.create_index(
+                    [(policy.time_field, ASCENDING)],
+                    name=policy.ttl_index_name,
+                    expireAfterSeconds=seconds
+                )
+            except OperationFailure as e:
+                if e.code not in INDEX_OPTIONS_CONFLICT:
+                    raise
+                # Retention changed: retune the existing index in place
+                await db.command("collMod", policy.collection, index={
+                    "name": policy.ttl_index_name,
+                    "expireAfterSeconds": seconds
+                })
+
+    @staticmethod
+    async def archive_policy(policy: RetentionPolicy, now: Optional[datetime] = None) -> int:
+        """
+        Archive up to RETENTION_MAX_DOCS_PER_RUN expired documents, oldest
+        first. Documents are only deleted (or stripped) once every archive
+        file from the run is closed and synced.
+        """
+        if policy.retention_days <= 0:
+            return 0
+
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=policy.retention_days)
+        query: Dict[str, Any] = {policy.time_field: {"$lt": cutoff}}
+        projection = None
+        if policy.strip_fields:
+            query["$or"] = [{field: {"$exists": True, "$ne": None}} for field in policy.strip_fields]
+            projection = {"_id": 1, "id": 1, "user_id": 1, policy.time_field: 1}
+            projection.update({field: 1 for field in policy.strip_fields})
+
+        db = Database.get_db()
+        collection = db[policy.collection]
+        batch_size = settings.RETENTION_BATCH_SIZE
+        run_stamp = now.strftime("%Y%m%dT%H%M%S")
+        writers: Dict[str, ArchiveWriter] = {}
+        archived_ids: List[Any] = []
+
+        cursor = collection.find(query, projection).sort(policy.time_field, ASCENDING) \
+            .limit(settings.RETENTION_MAX_DOCS_PER_RUN).batch_size(batch_size)
+        try:
+            batch: List[Dict[str, Any]] = []
+            async for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    await asyncio.to_thread(_write_batch, writers, policy, run_stamp, batch)
+                    archived_ids.extend(d["_id"] for d in batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(_write_batch, writers, policy, run_stamp, batch)
+                archived_ids.extend(d["_id"] for d in batch)
+            await asyncio.to_thread(_close_writers, writers)
+        except Exception:
+            await asyncio.to_thread(_abort_writers, writers)
+            raise
+
+        for i in range(0, len(archived_ids), batch_size):
+            chunk = {"_id": {"$in": archived_ids[i:i + batch_size]}}
+            if policy.strip_fields:
+                await collection.update_many(chunk, {
+                    "$unset": {field: "" for field in policy.strip_fields},
+                    "$set": {"archived_at": now}
+                })
+            else:
+                await collection.delete_many(chunk)
+
+        if archived_ids:
+            logger.info(f"Archived {len(archived_ids)} {policy.collection} documents older than {cutoff.date()}")
+        return len(archived_ids)
+
+    @staticmethod
+    async def acquire_lease(name: str, owner: str, seconds: Optional[int] = None) -> bool:
+        """Take or renew a lease; False while another owner holds an unexpired one"""
+        db = Database.get_db()
+        now = datetime.utcnow()
+        seconds = seconds or settings.RETENTION_LEASE_SECONDS
+        try:
+            await db.scheduler_leases.find_one_and_update(
+                {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # Held by someone else: the filter missed and the upsert collided on _id
+        return True
+
+    @staticmethod
+    async def release_lease(name: str, owner: str):
+        db = Database.get_db()
+        await db.scheduler_leases.delete_one({"_id": name, "owner": owner})
+
+    @staticmethod
+    async def run_archival() -> Optional[Dict[str, int]]:
+        """
+        Archive every collection with a retention policy; returns None if
+        another instance holds the archival lease
+        """
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if not await RetentionService.acquire_lease(ARCHIVAL_LEASE, owner):
+            logger.info("Retention archival skipped: another instance holds the lease")
+            return None
+
+        results = {}
+        try:
+            for policy in retention_policies():
+                # Renew before each collection; stop if the lease was lost meanwhile
+                if not await RetentionService.acquire_lease(ARCHIVAL_LEASE, owner):
+                    logger.warning("Retention archival stopped: lease lost")
+                    break
+                try:
+                    results[policy.collection] = await RetentionService.archive_policy(policy)
+                except Exception as e:
+                    logger.error(f"Archival failed for {policy.collection}: {str(e)}")
+        finally:
+            await RetentionService.release_lease(ARCHIVAL_LEASE, owner)
+        return results
+
+    @staticmethod
+    async def restore_archive(path: str, into: Optional[str] = None) -> int:
+        """
+        Load an archive file back into MongoDB (idempotent by _id)
+
+        Deleted documents go to `<collection>_restored` by default, since the
+        source collection's TTL index would expire them again; stripped fields
+        are set back on their original documents.
+        """
+        collection_name = os.path.basename(path).split("-", 1)[0]
+        policy = next((p for p in retention_policies() if p.collection == collection_name), None)
+        if policy is None:
+            raise ValueError(f"No retention policy for archive {path}")
+
+        if into is None:
+            into = policy.collection if policy.strip_fields else f"{policy.collection}_restored"
+        collection = Database.get_db()[into]
+
+        restored = 0
+        ops: List[Any] = []
+        for doc in iter_archive(path):
+            if policy.strip_fields:
+                fields = {field: doc[field] for field in policy.strip_fields if field in doc}
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields, "$unset": {"archived_at": ""}}))
+            else:
+                ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if len(ops) >= settings.RETENTION_BATCH_SIZE:
+                await collection.bulk_write(ops, ordered=False)
+                restored += len(ops)
+                ops = []
+        if ops:
+            await collection.bulk_write(ops, ordered=False)
+            restored += len(ops)
+
+        logger.info(f"Restored {restored} documents from {path} into {into}")
+        return restored
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive expired documents or restore an archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("archive", help="Run archival for every retention policy")
+    restore_parser = commands.add_parser("restore", help="Restore one archive file")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--into", help="Target collection")
+    args = parser.parse_args()
+
+    async def main():
+        await Database.connect_db()
+        try:
+            if args.command == "archive":
+                print(await RetentionService.run_archival())
+            else:
+                print(await RetentionService.restore_archive(args.path, args.into))
+        finally:
+            await Database.close_db()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
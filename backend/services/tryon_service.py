@@ -2,19 +2,66 @@ import os
 import base64
 import asyncio
 import logging
+import uuid
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from dotenv import load_dotenv
 from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 
+from config import settings
 from database import Database
 from models.tryon_job_model import TryOnJobModel
 from services.credit_service import CreditService
 from services.image_service import ImageService
+from services.job_recovery_service import JobRecoveryService, JobRunLostError
+from services.prompt_registry import PromptRegistry
+from utils.adaptive_limiter import AdaptiveLimiter, is_overload_error
+from utils.circuit_breaker import get_breaker
+from utils.model_client_pool import client_key, model_client_pool
+from utils.pagination import apply_cursor, keyset_sort
+from utils.rate_limiter import tryon_job_counter
+from utils.resilient_call import ResilientCaller
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+GEMINI_PROVIDER = "gemini"
+GEMINI_MODEL = "gemini-2.5-flash-image-preview"
+GEMINI_PARAMS = {"modalities": ["image", "text"]}
+GEMINI_CLIENT_KEY = client_key(GEMINI_PROVIDER, GEMINI_MODEL, GEMINI_PARAMS)
+SYSTEM_MESSAGE = "You are an expert virtual try-on AI assistant."
+
+# Shared by all try-on workers in this process; tracks Gemini's real capacity
+gemini_limiter = AdaptiveLimiter(GEMINI_CLIENT_KEY)
+
+# Fails jobs fast while Gemini is overloaded instead of queueing them on the limiter
+gemini_breaker = get_breaker(
+    f"model:{GEMINI_CLIENT_KEY}",
+    failure_rate_threshold=settings.GEMINI_BREAKER_FAILURE_RATE,
+    min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+    window_seconds=settings.GEMINI_BREAKER_WINDOW_SECONDS,
+    recovery_timeout=settings.GEMINI_BREAKER_RECOVERY_TIMEOUT,
+    half_open_max_calls=settings.GEMINI_BREAKER_HALF_OPEN_PROBES,
+    is_failure=is_overload_error
+)
+
+# Deadline, retries and optional hedging around each Gemini call
+gemini_caller = ResilientCaller(GEMINI_CLIENT_KEY)
+
+def _reset_chat(chat: LlmChat) -> bool:
+    """
+    Each job is a single exchange: restore the history captured when the
+    client was built. Returns False, so the pool discards the client, when
+    the history isn't the list we know how to restore.
+    """
+    messages = getattr(chat, "messages", None)
+    baseline = getattr(chat, "_tryon_baseline", None)
+    if not isinstance(messages, list) or baseline is None:
+        return False
+    messages[:] = baseline
+    chat.session_id = f"tryon-{uuid.uuid4()}"
+    return True
+
 class TryOnService:
     """Service for virtual try-on generation using Gemini"""
     
@@ -24,10 +71,37 @@ class TryOnService:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         self.credit_service = CreditService()
         self.image_service = ImageService()
+        model_client_pool.register(GEMINI_CLIENT_KEY, self._build_chat, reset=_reset_chat)
+    
+    def _build_chat(self) -> LlmChat:
+        """Gemini client for the shared pool (one session per pooled client)"""
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"tryon-{uuid.uuid4()}",
+            system_message=SYSTEM_MESSAGE
+        )
+        chat.with_model(GEMINI_PROVIDER, GEMINI_MODEL).with_params(**GEMINI_PARAMS)
+        messages = getattr(chat, "messages", None)
+        if isinstance(messages, list):
+            chat._tryon_baseline = list(messages)  # What _reset_chat restores between jobs
+        return chat
+    
+    async def _generate(self, msg: UserMessage, timeout: float) -> Tuple[str, list]:
+        """One Gemini attempt: breaker, adaptive limit, pooled client, then the call"""
+        async with gemini_breaker.protect():
+            async with gemini_limiter.slot():
+                async with model_client_pool.checkout(GEMINI_CLIENT_KEY) as chat:
+                    return await asyncio.wait_for(chat.send_message_multimodal_response(msg), timeout)
     
     async def create_tryon_job(self, user_id: str, mode: str, person_image: str, 
                                clothing_image: str, bottom_image: Optional[str] = None) -> TryOnJobModel:
         """Create a new try-on job"""
+        # Cap sizes before decoding; the full inputs are stored for recovery
+        max_mb = settings.TRYON_MAX_IMAGE_BYTES / (1024 * 1024)
+        for label, image in (("Person", person_image), ("Clothing", clothing_image), ("Bottom", bottom_image)):
+            if image and not self.image_service.validate_image_size(image):
+                raise ValueError(f"{label} image is too large (max {max_mb:.0f}MB)")
+        
         # Validate images
         if not self.image_service.validate_base64_image(person_image):
             raise ValueError("Invalid person image format")
@@ -50,115 +124,122 @@ class TryOnService:
         clothing_image_clean = self.image_service.clean_base64_string(clothing_image)
         bottom_image_clean = self.image_service.clean_base64_string(bottom_image) if bottom_image else None
         
+        # Resolve the prompt now so the job records the version it runs with
+        prompt = PromptRegistry.resolve(mode)
+        
         # Create job
         job = TryOnJobModel(
             user_id=user_id,
             mode=mode,
             status="queued",
+            prompt_id=prompt["id"],
+            prompt_version=prompt["version"],
             person_image_base64=person_image_clean[:50] + "...",  # Store truncated for reference
             clothing_image_base64=clothing_image_clean[:50] + "...",
             bottom_image_base64=bottom_image_clean[:50] + "..." if bottom_image_clean else None
         )
         
-        # Save to database
+        # Save job and inputs together; never leave a job that can't be re-run
         db = Database.get_db()
-        await db.tryon_jobs.insert_one(job.model_dump())
+        try:
+            await asyncio.gather(
+                JobRecoveryService.save_inputs(job.id, user_id, mode, prompt["prompt_text"],
+                                               person_image_clean, clothing_image_clean, bottom_image_clean),
+                db.tryon_jobs.insert_one(job.model_dump())
+            )
+        except Exception:
+            await db.tryon_jobs.delete_one({"id": job.id})
+            await JobRecoveryService.discard_inputs(job.id)
+            raise
+        await tryon_job_counter.record(user_id)
         
         # Process job asynchronously
-        asyncio.create_task(self._process_job(job.id, user_id, mode, person_image_clean, 
-                                              clothing_image_clean, bottom_image_clean))
+        asyncio.create_task(self._process_job(job.id, user_id, mode, prompt["prompt_text"],
+                                              person_image_clean, clothing_image_clean, bottom_image_clean))
         
         return job
     
-    async def _process_job(self, job_id: str, user_id: str, mode: str, 
+    def enqueue_job(self, job: Dict[str, Any], inputs: Dict[str, Any]):
+        """Run a recovered or retried job from its stored inputs"""
+        asyncio.create_task(self._process_job(
+            job["id"], job["user_id"], job["mode"], inputs["prompt_text"],
+            inputs["person_image"], inputs["clothing_image"], inputs.get("bottom_image")
+        ))
+    
+    async def recover_stale_jobs(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Re-enqueue jobs orphaned in queued/processing by a crashed instance"""
+        return await JobRecoveryService.recover_stale_jobs(self.enqueue_job, limit)
+    
+    async def retry_failed_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Re-run a failed job; None if it is no longer failed"""
+        return await JobRecoveryService.retry_failed_job(job_id, self.enqueue_job)
+    
+    async def _process_job(self, job_id: str, user_id: str, mode: str, prompt: str,
                           person_image: str, clothing_image: str, bottom_image: Optional[str] = None):
         """Process the try-on job using Gemini"""
+        attempts = []  # One record per Gemini attempt, stored on the job
+        
+        # Update status to processing; only one run gets a queued job
+        run_id = await JobRecoveryService.start_run(job_id)
+        if run_id is None:
+            logger.info(f"Job {job_id} is no longer queued; skipping")
+            return
+        
         try:
-            # Update status to processing
-            db = Database.get_db()
-            await db.tryon_jobs.update_one(
-                {"id": job_id},
-                {"$set": {"status": "processing", "updated_at": datetime.utcnow()}}
-            )
-            
-            # Generate prompt based on mode
-            if mode == "top":
-                prompt = (
-                    "You are a virtual try-on AI. Generate a realistic image showing the person "
-                    "wearing the clothing item provided. The person's body, face, and pose should remain "
-                    "the same, but they should be wearing the new top/clothing item naturally. "
-                    "Ensure proper fit, lighting, shadows, and realistic fabric draping. "
-                    "The background should remain similar to the original person image."
-                )
-            else:  # full mode
-                prompt = (
-                    "You are a virtual try-on AI. Generate a realistic image showing the person "
-                    "wearing both the top clothing item and bottom clothing item provided. "
-                    "The person's body, face, and pose should remain the same, but they should be "
-                    "wearing the complete outfit naturally. Ensure proper fit, lighting, shadows, "
-                    "and realistic fabric draping for both pieces. The background should remain "
-                    "similar to the original person image."
+            # Keep the job fresh for the recovery sweep while it runs
+            async with JobRecoveryService.heartbeat(job_id, run_id):
+                # Prepare message with images
+                file_contents = [
+                    ImageContent(person_image),
+                    ImageContent(clothing_image)
+                ]
+                if bottom_image:
+                    file_contents.append(ImageContent(bottom_image))
+                
+                msg = UserMessage(text=prompt, file_contents=file_contents)
+                
+                # Generate image, retrying transient Gemini errors within the deadline
+                logger.info(f"Generating try-on image for job {job_id}")
+                text_response, images = await gemini_caller.call(
+                    lambda timeout: self._generate(msg, timeout),
+                    attempts
                 )
-            
-            # Initialize Gemini chat
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=job_id,
-                system_message="You are an expert virtual try-on AI assistant."
-            )
-            chat.with_model("gemini", "gemini-2.5-flash-image-preview").with_params(modalities=["image", "text"])
-            
-            # Prepare message with images
-            file_contents = [
-                ImageContent(person_image),
-                ImageContent(clothing_image)
-            ]
-            if bottom_image:
-                file_contents.append(ImageContent(bottom_image))
-            
-            msg = UserMessage(text=prompt, file_contents=file_contents)
-            
-            # Generate image
-            logger.info(f"Generating try-on image for job {job_id}")
-            text_response, images = await chat.send_message_multimodal_response(msg)
-            
-            if images and len(images) > 0:
+                
+                if not images:
+                    raise Exception("No image generated")
                 result_image = images[0]['data']  # Get first generated image
                 logger.info(f"Successfully generated image for job {job_id}")
                 
-                # Deduct credits - full mode costs 2x
+                # Deduct credits - full mode costs 2x; charged once per job id
                 credits_to_deduct = 2 if mode == "full" else 1
                 await self.credit_service.deduct_credits(
                     user_id=user_id,
-                    amount=credits_to_deduct,
-                    description=f"Try-on generation ({mode} mode)"
+                    credits=credits_to_deduct,
+                    description=f"Try-on generation ({mode} mode)",
+                    reference_id=job_id
                 )
-                
-                # Update job with result
-                await db.tryon_jobs.update_one(
-                    {"id": job_id},
-                    {"$set": {
-                        "status": "completed",
-                        "result_image_base64": result_image,
-                        "completed_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    }}
-                )
-            else:
-                raise Exception("No image generated")
-                
+            
+            # Update job with result, unless another run has taken it over
+            if await JobRecoveryService.finish_run(job_id, run_id, {
+                "status": "completed",
+                "result_image_base64": result_image,
+                "inference_attempts": attempts,
+                "completed_at": datetime.utcnow()
+            }):
+                await JobRecoveryService.discard_inputs(job_id)
+        
+        except JobRunLostError:
+            logger.warning(f"Job {job_id} was recovered elsewhere; stopped run {run_id}")
+        
         except Exception as e:
             logger.error(f"Error processing job {job_id}: {str(e)}")
             
-            # Update job with error
-            await db.tryon_jobs.update_one(
-                {"id": job_id},
-                {"$set": {
-                    "status": "failed",
-                    "error_message": str(e),
-                    "updated_at": datetime.utcnow()
-                }}
-            )
+            # Update job with error; inputs are kept so it can be retried
+            await JobRecoveryService.finish_run(job_id, run_id, {
+                "status": "failed",
+                "error_message": str(e),
+                "inference_attempts": attempts
+            })
     
     async def get_job(self, job_id: str, user_id: str) -> Optional[dict]:
         """Get job by ID"""
@@ -169,12 +250,13 @@ class TryOnService:
         })
         return job
     
-    async def get_user_jobs(self, user_id: str, skip: int = 0, limit: int = 20) -> list:
-        """Get all jobs for a user"""
+    async def get_user_jobs(self, user_id: str, skip: int = 0, limit: int = 20,
+                            page_cursor: Optional[str] = None) -> list:
+        """Get all jobs for a user; page_cursor (keyset) takes precedence over skip"""
         db = Database.get_db()
         cursor = db.tryon_jobs.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).skip(skip).limit(limit)
+            apply_cursor({"user_id": user_id}, "created_at", page_cursor)
+        ).sort(keyset_sort("created_at")).skip(0 if page_cursor else skip).limit(limit)
         
         jobs = await cursor.to_list(length=limit)
         return jobs
@@ -186,4 +268,15 @@ class TryOnService:
             "id": job_id,
             "user_id": user_id
         })
+        if result.deleted_count > 0:
+            await JobRecoveryService.discard_inputs(job_id)
         return result.deleted_count > 0
+
+# Shared instance for background work (job recovery, admin retries)
+_service: Optional[TryOnService] = None
+
+def get_tryon_service() -> TryOnService:
+    global _service
+    if _service is None:
+        _service = TryOnService()
+    return _service
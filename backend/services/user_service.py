@@ -4,6 +4,8 @@ from database import get_database
 from models.user_model import UserCreate, UserInDB, UserResponse
 from auth.password_utils import hash_password, verify_password
 from config import settings
+from utils.datetime_codec import USER_DATETIME_FIELDS, decode_datetimes
+from utils.user_search import search_fields
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,12 +35,7 @@ class UserService:
         
         # Save to database
         user_doc = user.model_dump()
-        user_doc['created_at'] = user_doc['created_at'].isoformat()
-        user_doc['updated_at'] = user_doc['updated_at'].isoformat()
-        if user_doc.get('last_free_credit_reset'):
-            user_doc['last_free_credit_reset'] = user_doc['last_free_credit_reset'].isoformat()
-        if user_doc.get('last_login'):
-            user_doc['last_login'] = user_doc['last_login'].isoformat()
+        user_doc.update(search_fields(user.email, user.first_name, user.last_name))
         
         await db.users.insert_one(user_doc)
         logger.info(f"Created user: {user.email}")
@@ -53,15 +50,8 @@ class UserService:
         if not user_doc:
             return None
         
-        # Convert ISO strings back to datetime
-        if isinstance(user_doc.get('created_at'), str):
-            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-        if isinstance(user_doc.get('updated_at'), str):
-            user_doc['updated_at'] = datetime.fromisoformat(user_doc['updated_at'])
-        if isinstance(user_doc.get('last_free_credit_reset'), str):
-            user_doc['last_free_credit_reset'] = datetime.fromisoformat(user_doc['last_free_credit_reset'])
-        if isinstance(user_doc.get('last_login'), str):
-            user_doc['last_login'] = datetime.fromisoformat(user_doc['last_login'])
+        # Documents not yet migrated still hold ISO strings
+        decode_datetimes(user_doc, USER_DATETIME_FIELDS)
         
         return UserInDB(**user_doc)
     
@@ -74,15 +64,8 @@ class UserService:
         if not user_doc:
             return None
         
-        # Convert ISO strings back to datetime
-        if isinstance(user_doc.get('created_at'), str):
-            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-        if isinstance(user_doc.get('updated_at'), str):
-            user_doc['updated_at'] = datetime.fromisoformat(user_doc['updated_at'])
-        if isinstance(user_doc.get('last_free_credit_reset'), str):
-            user_doc['last_free_credit_reset'] = datetime.fromisoformat(user_doc['last_free_credit_reset'])
-        if isinstance(user_doc.get('last_login'), str):
-            user_doc['last_login'] = datetime.fromisoformat(user_doc['last_login'])
+        # Documents not yet migrated still hold ISO strings
+        decode_datetimes(user_doc, USER_DATETIME_FIELDS)
         
         return UserInDB(**user_doc)
     
@@ -103,7 +86,7 @@ class UserService:
         db = get_database()
         await db.users.update_one(
             {"id": user.id},
-            {"$set": {"last_login": datetime.utcnow().isoformat()}}
+            {"$set": {"last_login": datetime.utcnow()}}
         )
         
         return user
@@ -114,6 +97,6 @@ class UserService:
         db = get_database()
         result = await db.users.update_one(
             {"id": user_id},
-            {"$set": {"credits": credits, "updated_at": datetime.utcnow().isoformat()}}
+            {"$set": {"credits": credits, "updated_at": datetime.utcnow()}}
         )
         return result.modified_count > 0
@@ -1,12 +1,19 @@
+import asyncio
 import hmac
 import hashlib
 import httpx
 import secrets
 import json
-from typing import Dict, Any, List, Optional
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from config import settings
 from database import Database
 from models.webhook_model import WebhookModel, WebhookDeliveryModel
+from utils.cache import cached
+from utils.circuit_breaker import CircuitBreaker, get_breaker
+from utils.http_client import HTTPClient
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +30,17 @@ class WebhookService:
         "payment.completed"
     ]
 
+    # Fan-out state shared by all trigger_webhook calls in this process
+    _fanout_semaphore: Optional[asyncio.Semaphore] = None
+    _host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    # Buffered events for webhooks in batching mode, keyed by webhook id. Each
+    # event is also in webhook_batch_outbox until its batch delivery is
+    # recorded, so a crash doesn't lose it (see recover_batches)
+    _batch_buffers: Dict[str, List[Dict[str, Any]]] = {}
+    _batch_webhooks: Dict[str, WebhookModel] = {}
+    _batch_timers: Dict[str, asyncio.Task] = {}
+
     @staticmethod
     def generate_secret() -> str:
         """Generate a secure webhook secret"""
@@ -37,12 +55,73 @@ class WebhookService:
             hashlib.sha256
         ).hexdigest()
 
+    @staticmethod
+    def _get_fanout_semaphore() -> asyncio.Semaphore:
+        """Global cap on in-flight deliveries across all events"""
+        if WebhookService._fanout_semaphore is None:
+            WebhookService._fanout_semaphore = asyncio.Semaphore(
+                settings.WEBHOOK_MAX_CONCURRENT_DELIVERIES
+            )
+        return WebhookService._fanout_semaphore
+
+    @staticmethod
+    def _get_host_semaphore(url: str) -> asyncio.Semaphore:
+        """Per-destination-host cap so one customer can't hog the pool"""
+        host = urlsplit(url).netloc.lower()
+        semaphore = WebhookService._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST)
+            WebhookService._host_semaphores[host] = semaphore
+        return semaphore
+
+    @staticmethod
+    def _get_breaker(url: str) -> CircuitBreaker:
+        """Per-destination-host circuit breaker; transport errors and 5xx count as failures"""
+        host = urlsplit(url).netloc.lower()
+        return get_breaker(
+            f"webhook_host:{host}",
+            failure_rate_threshold=settings.WEBHOOK_BREAKER_FAILURE_RATE,
+            min_calls=settings.WEBHOOK_BREAKER_MIN_CALLS,
+            window_seconds=settings.WEBHOOK_BREAKER_WINDOW_SECONDS,
+            recovery_timeout=settings.WEBHOOK_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.WEBHOOK_BREAKER_HALF_OPEN_PROBES,
+            expected_exception=httpx.HTTPError
+        )
+
+    @staticmethod
+    @cached(
+        "webhook_subscriptions",
+        ttl=settings.WEBHOOK_SUBSCRIPTION_CACHE_TTL,
+        max_size=settings.WEBHOOK_SUBSCRIPTION_CACHE_MAX_USERS
+    )
+    async def _load_active_webhooks(user_id: str) -> List[Dict[str, Any]]:
+        """All of a user's active webhooks; empty lists are cached too"""
+        db = Database.get_db()
+        return await db.webhooks.find({
+            "user_id": user_id,
+            "is_active": True
+        }, {"_id": 0}).to_list(100)
+
+    @staticmethod
+    async def invalidate_subscriptions(user_id: str) -> None:
+        """Drop cached subscriptions for a user after their webhooks change"""
+        await WebhookService._load_active_webhooks.invalidate(user_id)
+
+    @staticmethod
+    async def get_subscribed_webhooks(user_id: str, event_type: str) -> List[Dict[str, Any]]:
+        """Get active webhooks for (user_id, event_type), served from cache when fresh"""
+        webhooks = await WebhookService._load_active_webhooks(user_id)
+        return [webhook for webhook in webhooks if event_type in webhook.get("events", [])]
+
     @staticmethod
     async def create_webhook(
         user_id: str,
         url: str,
         name: str,
-        events: List[str]
+        events: List[str],
+        batch_enabled: bool = False,
+        batch_window_seconds: int = 5,
+        batch_max_events: int = 50
     ) -> WebhookModel:
         """Create a new webhook"""
         # Validate events
@@ -55,25 +134,29 @@ class WebhookService:
             url=url,
             name=name,
             events=events,
-            secret=WebhookService.generate_secret()
+            secret=WebhookService.generate_secret(),
+            batch_enabled=batch_enabled,
+            batch_window_seconds=batch_window_seconds,
+            batch_max_events=batch_max_events
         )
 
-        db = await Database.get_database()
+        db = Database.get_db()
         await db.webhooks.insert_one(webhook.model_dump())
+        await WebhookService.invalidate_subscriptions(user_id)
         logger.info(f"Webhook created: {webhook.id} for user {user_id}")
         return webhook
 
     @staticmethod
     async def get_webhooks(user_id: str) -> List[WebhookModel]:
         """Get all webhooks for a user"""
-        db = await Database.get_database()
+        db = Database.get_db()
         webhooks = await db.webhooks.find({"user_id": user_id}).to_list(100)
         return [WebhookModel(**w) for w in webhooks]
 
     @staticmethod
     async def get_webhook(webhook_id: str, user_id: str) -> Optional[WebhookModel]:
         """Get a specific webhook"""
-        db = await Database.get_database()
+        db = Database.get_db()
         webhook = await db.webhooks.find_one({"id": webhook_id, "user_id": user_id})
         return WebhookModel(**webhook) if webhook else None
 
@@ -84,10 +167,13 @@ class WebhookService:
         url: Optional[str] = None,
         name: Optional[str] = None,
         events: Optional[List[str]] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        batch_enabled: Optional[bool] = None,
+        batch_window_seconds: Optional[int] = None,
+        batch_max_events: Optional[int] = None
     ) -> Optional[WebhookModel]:
         """Update a webhook"""
-        db = await Database.get_database()
+        db = Database.get_db()
         webhook = await WebhookService.get_webhook(webhook_id, user_id)
         if not webhook:
             return None
@@ -105,20 +191,30 @@ class WebhookService:
             update_data["events"] = events
         if is_active is not None:
             update_data["is_active"] = is_active
+        if batch_enabled is not None:
+            update_data["batch_enabled"] = batch_enabled
+        if batch_window_seconds is not None:
+            update_data["batch_window_seconds"] = batch_window_seconds
+        if batch_max_events is not None:
+            update_data["batch_max_events"] = batch_max_events
 
         await db.webhooks.update_one(
             {"id": webhook_id, "user_id": user_id},
             {"$set": update_data}
         )
+        await WebhookService.invalidate_subscriptions(user_id)
         logger.info(f"Webhook updated: {webhook_id}")
         return await WebhookService.get_webhook(webhook_id, user_id)
 
     @staticmethod
     async def delete_webhook(webhook_id: str, user_id: str) -> bool:
         """Delete a webhook"""
-        db = await Database.get_database()
+        db = Database.get_db()
         result = await db.webhooks.delete_one({"id": webhook_id, "user_id": user_id})
         if result.deleted_count > 0:
+            await WebhookService.invalidate_subscriptions(user_id)
+            WebhookService._take_batch(webhook_id)
+            await db.webhook_batch_outbox.delete_many({"webhook_id": webhook_id})
             logger.info(f"Webhook deleted: {webhook_id}")
             return True
         return False
@@ -131,31 +227,225 @@ class WebhookService:
     ) -> None:
         """Trigger webhooks for a specific event"""
         # Get all active webhooks for this user that listen to this event
-        db = await Database.get_database()
-        webhooks = await db.webhooks.find({
-            "user_id": user_id,
-            "is_active": True,
-            "events": event_type
-        }).to_list(100)
+        webhooks = await WebhookService.get_subscribed_webhooks(user_id, event_type)
+        if not webhooks:
+            return
 
         logger.info(f"Triggering {len(webhooks)} webhooks for event {event_type}")
+        db = Database.get_db()
 
+        targets = []
+        batching = []
         for webhook_data in webhooks:
             webhook = WebhookModel(**webhook_data)
-            # Create delivery record
+            if webhook.batch_enabled:
+                batching.append(webhook)
+                continue
             delivery = WebhookDeliveryModel(
                 webhook_id=webhook.id,
                 event_type=event_type,
                 payload=payload,
                 status="pending"
             )
-            await db.webhook_deliveries.insert_one(delivery.model_dump())
+            targets.append((webhook, delivery))
+
+        if targets:
+            # Create all delivery records in one round trip
+            await db.webhook_deliveries.insert_many(
+                [delivery.model_dump() for _, delivery in targets]
+            )
+        full_batches = await WebhookService._buffer_batch_events(batching, event_type, payload) if batching else []
+
+        # Deliver concurrently so a slow endpoint doesn't hold up the others
+        results = await asyncio.gather(
+            *(WebhookService._deliver_bounded(webhook, delivery) for webhook, delivery in targets),
+            *(WebhookService._deliver_batch(webhook, events) for webhook, events in full_batches),
+            return_exceptions=True
+        )
+        webhook_ids = [w.id for w, _ in targets] + [w.id for w, _ in full_batches]
+        for webhook_id, result in zip(webhook_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to deliver webhook {webhook_id}: {str(result)}")
+
+    @staticmethod
+    async def _buffer_batch_events(
+        webhooks: List[WebhookModel],
+        event_type: str,
+        payload: Dict[str, Any]
+    ) -> List[Tuple[WebhookModel, List[Dict[str, Any]]]]:
+        """Persist an event for each batching webhook, then buffer it; returns the batches now full"""
+        now = datetime.utcnow()
+        events = [{
+            "id": str(uuid.uuid4()),
+            "webhook_id": webhook.id,
+            "event": event_type,
+            "payload": payload,
+            "timestamp": now.isoformat(),
+            "created_at": now
+        } for webhook in webhooks]
+        db = Database.get_db()
+        # Copies, so the buffered events don't pick up the inserted _id
+        await db.webhook_batch_outbox.insert_many([dict(event) for event in events])
+
+        full_batches = []
+        for webhook, event in zip(webhooks, events):
+            batch = WebhookService._buffer_batch_event(webhook, event)
+            if batch:
+                full_batches.append((webhook, batch))
+        return full_batches
+
+    @staticmethod
+    def _buffer_batch_event(
+        webhook: WebhookModel,
+        event: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Buffer an event for a batching webhook; returns the batch once it is full"""
+        buffer = WebhookService._batch_buffers.setdefault(webhook.id, [])
+        buffer.append(event)
+        WebhookService._batch_webhooks[webhook.id] = webhook
+
+        if len(buffer) >= webhook.batch_max_events:
+            return WebhookService._take_batch(webhook.id)
+
+        # First event of a new batch starts the window
+        if webhook.id not in WebhookService._batch_timers:
+            WebhookService._batch_timers[webhook.id] = asyncio.create_task(
+                WebhookService._flush_after(webhook.id, webhook.batch_window_seconds)
+            )
+        return None
+
+    @staticmethod
+    def _take_batch(webhook_id: str) -> List[Dict[str, Any]]:
+        """Remove and return buffered events for a webhook, cancelling its timer"""
+        timer = WebhookService._batch_timers.pop(webhook_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        WebhookService._batch_webhooks.pop(webhook_id, None)
+        return WebhookService._batch_buffers.pop(webhook_id, [])
 
-            # Attempt delivery (don't await to avoid blocking)
+    @staticmethod
+    async def _flush_after(webhook_id: str, delay: int) -> None:
+        """Flush a webhook's batch once its window has elapsed"""
+        await asyncio.sleep(delay)
+        webhook = WebhookService._batch_webhooks.get(webhook_id)
+        events = WebhookService._take_batch(webhook_id)
+        if webhook and events:
             try:
-                await WebhookService.deliver_webhook(webhook, delivery)
+                await WebhookService._deliver_batch(webhook, events)
             except Exception as e:
-                logger.error(f"Failed to deliver webhook {webhook.id}: {str(e)}")
+                logger.error(f"Failed to deliver webhook batch {webhook_id}: {str(e)}")
+
+    @staticmethod
+    async def _deliver_batch(webhook: WebhookModel, events: List[Dict[str, Any]]) -> None:
+        """Deliver buffered events as one signed envelope"""
+        delivery = WebhookDeliveryModel(
+            webhook_id=webhook.id,
+            event_type="batch",
+            payload={
+                "event": "batch",
+                "count": len(events),
+                "events": [
+                    {"event": e["event"], "payload": e["payload"], "timestamp": e["timestamp"]}
+                    for e in events
+                ]
+            },
+            status="pending"
+        )
+        db = Database.get_db()
+        await db.webhook_deliveries.insert_one(delivery.model_dump())
+        # The delivery record carries the events from here on
+        await db.webhook_batch_outbox.delete_many({"id": {"$in": [e["id"] for e in events]}})
+        await WebhookService._deliver_bounded(webhook, delivery)
+
+    @staticmethod
+    async def flush_batches() -> None:
+        """Deliver every buffered batch immediately (used on shutdown)"""
+        pending = []
+        for webhook_id in list(WebhookService._batch_buffers):
+            webhook = WebhookService._batch_webhooks.get(webhook_id)
+            events = WebhookService._take_batch(webhook_id)
+            if webhook and events:
+                pending.append(WebhookService._deliver_batch(webhook, events))
+        if pending:
+            logger.info(f"Flushing {len(pending)} buffered webhook batches")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def recover_batches(limit: Optional[int] = None) -> int:
+        """
+        Deliver outbox events whose batch was never recorded, e.g. because
+        their instance crashed. Events are claimed first so concurrent sweeps
+        deliver each once; a claim that wasn't completed lapses after
+        WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS. Returns the events recovered.
+        """
+        db = Database.get_db()
+        limit = limit or settings.WEBHOOK_BATCH_RECOVERY_BATCH_SIZE
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS)
+        stale = {
+            "created_at": {"$lt": cutoff},
+            "$or": [{"claimed_at": None}, {"claimed_at": {"$lt": cutoff}}]
+        }
+        candidates = await db.webhook_batch_outbox.find(stale, {"_id": 0, "id": 1}) \
+            .sort("created_at", 1).limit(limit).to_list(limit)
+        if not candidates:
+            return 0
+
+        claim = str(uuid.uuid4())
+        await db.webhook_batch_outbox.update_many(
+            {**stale, "id": {"$in": [c["id"] for c in candidates]}},
+            {"$set": {"claim": claim, "claimed_at": now}}
+        )
+        events = await db.webhook_batch_outbox.find({"claim": claim}, {"_id": 0}) \
+            .sort("created_at", 1).to_list(None)
+
+        by_webhook: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_webhook.setdefault(event["webhook_id"], []).append(event)
+        webhooks = await db.webhooks.find(
+            {"id": {"$in": list(by_webhook)}, "is_active": True}, {"_id": 0}
+        ).to_list(None)
+        webhooks = {w["id"]: WebhookModel(**w) for w in webhooks}
+
+        gone = [webhook_id for webhook_id in by_webhook if webhook_id not in webhooks]
+        if gone:
+            await db.webhook_batch_outbox.delete_many({"webhook_id": {"$in": gone}, "claim": claim})
+
+        pending = []
+        for webhook_id, webhook in webhooks.items():
+            queued = by_webhook[webhook_id]
+            for i in range(0, len(queued), webhook.batch_max_events):
+                pending.append(WebhookService._deliver_batch(webhook, queued[i:i + webhook.batch_max_events]))
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to deliver recovered webhook batch: {str(result)}")
+
+        recovered = sum(len(by_webhook[webhook_id]) for webhook_id in webhooks)
+        if recovered:
+            logger.warning(f"Recovered {recovered} buffered webhook events from the outbox")
+        return recovered
+
+    @staticmethod
+    async def _deliver_bounded(
+        webhook: WebhookModel,
+        delivery: WebhookDeliveryModel
+    ) -> None:
+        """Deliver within the per-host and global concurrency limits"""
+        # Take the host slot first so waiting on a saturated host doesn't
+        # hold one of the global slots
+        async with WebhookService._get_host_semaphore(webhook.url):
+            async with WebhookService._get_fanout_semaphore():
+                await WebhookService.deliver_webhook(webhook, delivery)
+
+    @staticmethod
+    async def _post(url: str, content: str, headers: Dict[str, str]) -> httpx.Response:
+        """POST a webhook body, raising on 5xx so the breaker counts it"""
+        client = HTTPClient.get_client()
+        response = await client.post(url, content=content, headers=headers)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
 
     @staticmethod
     async def deliver_webhook(
@@ -163,24 +453,30 @@ class WebhookService:
         delivery: WebhookDeliveryModel
     ) -> None:
         """Deliver a webhook with retry logic"""
-        db = await Database.get_database()
+        db = Database.get_db()
 
         try:
             # Prepare payload
             payload_str = json.dumps(delivery.payload)
             signature = WebhookService.generate_signature(payload_str, webhook.secret)
 
-            # Send webhook
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
+            # Send webhook over the shared pooled client. The signed string is
+            # sent verbatim so the signature matches the bytes on the wire.
+            breaker = WebhookService._get_breaker(webhook.url)
+            try:
+                response = await breaker.call_async(
+                    WebhookService._post,
                     webhook.url,
-                    json=delivery.payload,
-                    headers={
+                    payload_str,
+                    {
+                        "Content-Type": "application/json",
                         "X-Webhook-Signature": signature,
-                        "X-Event-Type": delivery.event_type,
-                        "User-Agent": "TrailRoom-Webhook/1.0"
+                        "X-Event-Type": delivery.event_type
                     }
                 )
+            except httpx.HTTPStatusError as e:
+                # Counted against the breaker, recorded as a normal failed response
+                response = e.response
 
             # Update delivery status
             delivery.attempts += 1
@@ -241,7 +537,7 @@ class WebhookService:
         if not webhook:
             return []
 
-        db = await Database.get_database()
+        db = Database.get_db()
         deliveries = await db.webhook_deliveries.find(
             {"webhook_id": webhook_id}
         ).sort("created_at", -1).limit(limit).to_list(limit)
@@ -269,7 +565,7 @@ class WebhookService:
             status="pending"
         )
 
-        db = await Database.get_database()
+        db = Database.get_db()
         await db.webhook_deliveries.insert_one(delivery.model_dump())
 
         # Attempt delivery
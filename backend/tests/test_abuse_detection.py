@@ -0,0 +1,208 @@
+"""Unit tests for abuse detection scoring."""
+import pytest
+import sys
+from pathlib import Path
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import Database
+from services.abuse_detection_service import AbuseDetectionService
+from utils.rate_limiter import tryon_job_counter
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$gte" in condition and not value >= condition["$gte"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for doc in self.docs:
+            yield dict(doc)
+    
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs]
+
+class FakeCollection:
+    """Evaluates the $match / $group stages the abuse scan uses"""
+    
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.aggregations = 0
+        self.finds = 0
+        self.queries = []
+    
+    def find(self, query, projection=None):
+        self.finds += 1
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if _matches(doc, query)])
+    
+    async def count_documents(self, query):
+        return len([doc for doc in self.docs if _matches(doc, query)])
+    
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.aggregations += 1
+        rows = list(self.docs)
+        for stage in pipeline:
+            if "$match" in stage:
+                rows = [row for row in rows if _matches(row, stage["$match"])]
+            elif "$group" in stage:
+                assert stage["$group"]["count"] == {"$sum": 1}, "only counts are grouped"
+                groups = {}
+                for row in rows:
+                    key = row[stage["$group"]["_id"].lstrip("$")]
+                    groups[key] = groups.get(key, 0) + 1
+                rows = [{"_id": key, "count": count} for key, count in groups.items()]
+        return FakeCursor(rows)
+
+class TestIntervalFeatures:
+    """Test vectorized bot-pattern features."""
+    
+    def test_regular_intervals_flagged(self):
+        """Test evenly spaced jobs look automated."""
+        start = datetime(2024, 1, 1)
+        timestamps = [start + timedelta(seconds=30 * i) for i in range(25)]
+        
+        features = AbuseDetectionService.compute_interval_features({"bot": timestamps})
+        result = AbuseDetectionService._api_scraping_result("bot", 25, features["bot"])
+        
+        assert features["bot"]["avg_interval_seconds"] == 30
+        assert features["bot"]["variance"] == 0
+        assert features["bot"]["periodicity"] == 1
+        assert features["bot"]["burstiness"] == -1
+        assert result["is_suspicious"] is True
+    
+    def test_users_scored_independently(self):
+        """Test intervals never span two users and input order doesn't matter."""
+        start = datetime(2024, 1, 1)
+        human = [start + timedelta(seconds=s) for s in (0, 5, 900, 910, 4000, 9000)]
+        bot = [start + timedelta(seconds=60 * i) for i in range(6)]
+        
+        features = AbuseDetectionService.compute_interval_features({
+            "human": list(reversed(human)),
+            "bot": bot
+        })
+        
+        assert features["bot"]["avg_interval_seconds"] == 60
+        assert features["bot"]["variance"] == 0
+        assert features["human"]["avg_interval_seconds"] == 1800
+        assert features["human"]["min_interval_seconds"] == 5
+        assert features["human"]["burstiness"] > 0
+    
+    def test_matches_per_user_statistics(self):
+        """Test vectorized stats match a plain per-user computation."""
+        start = datetime(2024, 1, 1)
+        offsets = [0, 7, 19, 20, 45, 46, 90]
+        timestamps = [start + timedelta(seconds=s) for s in offsets]
+        intervals = [b - a for a, b in zip(offsets, offsets[1:])]
+        mean = sum(intervals) / len(intervals)
+        variance = sum((x - mean) ** 2 for x in intervals) / len(intervals)
+        
+        features = AbuseDetectionService.compute_interval_features({"user": timestamps})
+        
+        assert features["user"]["avg_interval_seconds"] == pytest.approx(round(mean, 2))
+        assert features["user"]["variance"] == pytest.approx(round(variance, 2))
+    
+    def test_insufficient_data(self):
+        """Test users below the minimum job count are not judged."""
+        features = AbuseDetectionService.compute_interval_features({"user": [datetime(2024, 1, 1)]})
+        result = AbuseDetectionService._api_scraping_result("user", 1, features.get("user"))
+        
+        assert features == {}
+        assert result["is_suspicious"] is False
+        assert result["reason"] == "Insufficient data"
+
+@pytest.fixture
+def activity(monkeypatch):
+    now = datetime.utcnow()
+    jobs = []
+    # 60 jobs in the last half hour, 30s apart: excessive and scripted
+    jobs += [{"user_id": "heavy", "created_at": now - timedelta(seconds=30 * i)} for i in range(60)]
+    # 25 jobs two minutes apart, a few hours ago: scripted only
+    jobs += [{"user_id": "bot", "created_at": now - timedelta(hours=3, seconds=120 * i)} for i in range(25)]
+    # A handful of irregular jobs
+    jobs += [{"user_id": "human", "created_at": now - timedelta(minutes=m)} for m in (5, 40, 300, 301, 900)]
+    # Flagged, but not an active user
+    jobs += [{"user_id": "inactive", "created_at": now - timedelta(seconds=20 * i)} for i in range(60)]
+    jobs += [{"user_id": "deleted", "created_at": now - timedelta(seconds=20 * i)} for i in range(60)]
+    payments = [{"user_id": "payer", "status": "failed", "created_at": now - timedelta(days=d)} for d in (1, 2, 3)]
+    payments += [{"user_id": "human", "status": "failed", "created_at": now - timedelta(days=d)} for d in (1, 2, 10)]
+    payments += [{"user_id": "human", "status": "completed", "created_at": now - timedelta(days=1)}]
+    users = [
+        {"id": user_id, "email": f"{user_id}@example.com", "role": "user", "is_active": True}
+        for user_id in ("heavy", "bot", "human", "payer")
+    ]
+    users.append({"id": "inactive", "email": "inactive@example.com", "role": "user", "is_active": False})
+    
+    db = SimpleNamespace(tryon_jobs=FakeCollection(jobs), payments=FakeCollection(payments),
+                         users=FakeCollection(users))
+    monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+    monkeypatch.setattr(Database, "get_analytics_db", classmethod(lambda cls: db))
+    monkeypatch.setattr(tryon_job_counter, "covers", lambda seconds: False)
+    return db
+
+class TestBulkScan:
+    """Test the set-based scan flags the same users as the per-user detectors."""
+    
+    @pytest.mark.asyncio
+    async def test_flags_active_suspicious_users(self, activity):
+        """Test each signal is attributed to the right user and only active users are returned."""
+        results = {row["user_id"]: row for row in await AbuseDetectionService.get_suspicious_users()}
+        
+        assert sorted(results) == ["bot", "heavy", "payer"]
+        flags = {
+            user_id: (row["excessive_usage"], row["failed_payments"], row["api_scraping"])
+            for user_id, row in results.items()
+        }
+        assert flags == {
+            "heavy": (True, False, True),
+            "bot": (False, False, True),
+            "payer": (False, True, False),
+        }
+        assert results["heavy"]["email"] == "heavy@example.com"
+        assert results["heavy"]["details"]["excessive_usage"]["job_count"] == 60
+    
+    @pytest.mark.asyncio
+    async def test_matches_per_user_detectors(self, activity):
+        """Test bulk details equal what the single-user detectors report."""
+        results = await AbuseDetectionService.get_suspicious_users()
+        
+        for row in results:
+            user_id = row["user_id"]
+            expected = {
+                "excessive_usage": await AbuseDetectionService.detect_excessive_usage(user_id),
+                "failed_payments": await AbuseDetectionService.detect_failed_payments(user_id),
+                "api_scraping": await AbuseDetectionService.detect_api_scraping(user_id),
+            }
+            for signal, detail in expected.items():
+                detail.pop("checked_at", None)
+                actual = dict(row["details"][signal])
+                actual.pop("checked_at", None)
+                assert actual == detail, (user_id, signal)
+    
+    @pytest.mark.asyncio
+    async def test_query_count_independent_of_users(self, activity):
+        """Test the scan runs a fixed number of queries rather than some per user."""
+        await AbuseDetectionService.get_suspicious_users()
+        
+        assert activity.tryon_jobs.aggregations == 2
+        assert activity.payments.aggregations == 1
+        assert activity.users.finds == 1
+        # Timestamps are only read for users with enough jobs to judge
+        assert activity.tryon_jobs.finds == 1
+        assert sorted(activity.tryon_jobs.queries[0]["user_id"]["$in"]) == ["bot", "deleted", "heavy", "inactive"]
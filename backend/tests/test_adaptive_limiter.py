@@ -0,0 +1,149 @@
+"""Unit tests for the adaptive concurrency limiter."""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.adaptive_limiter import AdaptiveLimiter, is_overload_error
+
+def _limiter(**kwargs):
+    options = dict(
+        initial_limit=4, min_limit=1, max_limit=8,
+        backoff_ratio=0.5, latency_backoff_ratio=0.9,
+        latency_tolerance=2.0, cooldown=1.0
+    )
+    options.update(kwargs)
+    return AdaptiveLimiter("test", **options)
+
+class TestOverloadClassification:
+    """Test which errors count as provider overload."""
+
+    def test_status_codes(self):
+        """Test 429 and 5xx statuses are overload, 4xx are not."""
+        assert is_overload_error(SimpleNamespace(status_code=429))
+        assert is_overload_error(SimpleNamespace(response=SimpleNamespace(status_code=503)))
+        assert not is_overload_error(SimpleNamespace(status_code=400))
+
+    def test_messages_and_timeouts(self):
+        """Test rate-limit messages and timeouts are overload."""
+        assert is_overload_error(RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded"))
+        assert is_overload_error(asyncio.TimeoutError())
+        assert not is_overload_error(ValueError("Invalid image"))
+        assert is_overload_error(RuntimeError("Error code: 503 - model is overloaded"))
+        assert is_overload_error(RuntimeError("HTTP 502 Bad Gateway"))
+
+    def test_numbers_in_messages_are_not_statuses(self):
+        """Test digits that merely look like status codes don't count as overload."""
+        for message in (
+            "Invalid job id job-429",
+            "Image is 504 px wide, need at least 512",
+            "Connection refused on port 502",
+            "Upload of 5003 bytes failed validation",
+            "Prompt exceeds 500 characters",
+        ):
+            assert not is_overload_error(RuntimeError(message)), message
+
+    def test_overload_exception_types(self):
+        """Test provider rate-limit and availability errors are recognised by type."""
+        class RateLimitError(Exception):
+            pass
+
+        class ServiceUnavailableError(Exception):
+            pass
+
+        assert is_overload_error(RateLimitError("slow down"))
+        assert is_overload_error(ServiceUnavailableError("try later"))
+
+class TestAIMD:
+    """Test additive increase and multiplicative decrease."""
+
+    def test_increases_only_when_saturated(self):
+        """Test the limit grows about one per limit's worth of saturated successes."""
+        limiter = _limiter()
+
+        for _ in range(4):
+            limiter.record_success(1.0, saturated=False)
+        assert limiter.stats()["limit"] == 4
+
+        for _ in range(4):
+            limiter.record_success(1.0, saturated=True)
+        assert limiter.stats()["limit"] == 4
+        limiter.record_success(1.0, saturated=True)
+        assert limiter.stats()["limit"] == 5
+        assert limiter.increases == 1
+
+    def test_overload_halves_once_per_cooldown(self):
+        """Test a burst of 429s cuts the limit once."""
+        limiter = _limiter()
+
+        limiter.record_overload(now=100.0)
+        limiter.record_overload(now=100.5)
+        assert limiter.stats()["limit"] == 2
+
+        limiter.record_overload(now=102.0)
+        assert limiter.stats()["limit"] == 1
+        limiter.record_overload(now=104.0)
+        assert limiter.stats()["limit"] == 1
+
+    def test_latency_spike_backs_off(self):
+        """Test calls far slower than baseline reduce the limit."""
+        limiter = _limiter(initial_limit=8)
+        limiter.record_success(1.0, saturated=False, now=0.0)
+
+        limiter.record_success(5.0, saturated=True, now=10.0)
+
+        assert limiter.slow_calls == 1
+        assert limiter.stats()["limit"] == 7
+        assert limiter.baseline_latency == pytest.approx(1.04)  # A spike barely moves the baseline
+
+    def test_latency_step_change_recovers(self):
+        """Test a lasting latency shift is learned instead of pinning the limit at its minimum."""
+        limiter = _limiter(initial_limit=8)
+        limiter.record_success(1.0, saturated=False, now=0.0)
+
+        for second in range(1, 201):
+            limiter.record_success(5.0, saturated=True, now=float(second))
+
+        assert limiter.baseline_latency > 5.0 / 2.0
+        assert limiter.slow_calls < 60
+        assert limiter.stats()["limit"] == 8
+
+class TestSlot:
+    """Test the context manager."""
+
+    @pytest.mark.asyncio
+    async def test_waits_at_limit(self):
+        """Test callers beyond the limit wait for a slot."""
+        limiter = _limiter(initial_limit=1, max_limit=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 1 and limiter.waiting == 1
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert limiter.in_flight == 0
+        assert limiter.successes == 2
+
+    @pytest.mark.asyncio
+    async def test_overload_error_recorded_and_raised(self):
+        """Test provider errors are re-raised after adjusting the limit."""
+        limiter = _limiter()
+
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("503 Service Unavailable")
+
+        assert limiter.overloads == 1
+        assert limiter.stats()["limit"] == 2
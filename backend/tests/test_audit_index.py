@@ -0,0 +1,47 @@
+"""Unit tests for audit-log index fields."""
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.audit_index import build_search_query, index_fields, month_range, naive_utc, search_tokens
+from utils.database_indexes import REDUNDANT_INDEXES, build_index_manifest
+
+class TestAuditIndex:
+    """Test tokens, buckets and search queries."""
+
+    def test_search_tokens(self):
+        """Test action prefixes, email parts and target id are tokenized."""
+        tokens = search_tokens("user.credit.add", "Ops@TrailRoom.io", "USR-1")
+
+        for token in ["user", "user.credit", "user.credit.add", "credit", "add",
+                      "ops@trailroom.io", "ops", "trailroom.io", "usr-1"]:
+            assert token in tokens
+
+    def test_month_range(self):
+        """Test month buckets span to the first of the next month."""
+        assert month_range("2024-12") == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+        assert month_range("2024-02")[1] == datetime(2024, 3, 1)
+        with pytest.raises(ValueError):
+            month_range("2024-13")
+
+    def test_naive_utc(self):
+        """Test aware bounds are converted to naive UTC."""
+        aware = datetime(2024, 5, 1, 12, tzinfo=timezone(timedelta(hours=2)))
+        assert naive_utc(aware) == datetime(2024, 5, 1, 10)
+
+    def test_search_query(self):
+        """Test search is an anchored, escaped prefix match."""
+        assert build_search_query(" User.Cr ") == {"search_tokens": {"$regex": "^user\\.cr"}}
+        with pytest.raises(ValueError):
+            build_search_query("u")
+
+    def test_only_queried_fields_stored(self):
+        """Test entries carry only search tokens, and the old month index is dropped."""
+        assert list(index_fields("user.ban", "ops@trailroom.io", None)) == ["search_tokens"]
+        indexed = [index.document["key"] for index in build_index_manifest()["audit_logs"]]
+        assert all("month" not in key for key in indexed)
+        assert "month_1" in REDUNDANT_INDEXES["audit_logs"]
@@ -0,0 +1,75 @@
+"""Unit tests for the buffered audit log writer."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import Database
+from services.audit_service import AuditService
+
+class FakeAuditCollection:
+    """Records how audit entries were written."""
+
+    def __init__(self):
+        self.inserted_one = []
+        self.batches = []
+
+    async def insert_one(self, doc):
+        self.inserted_one.append(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        self.batches.append(list(docs))
+
+class FakeDB:
+    def __init__(self):
+        self.audit_logs = FakeAuditCollection()
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+    return db
+
+async def _log(action, **kwargs):
+    return await AuditService.log_action(
+        action=action,
+        admin_id="admin-1",
+        admin_email="ops@example.com",
+        target_type="user",
+        target_id="user-1",
+        **kwargs
+    )
+
+class TestAuditWriter:
+    """Test queued, batched and must-persist writes."""
+
+    @pytest.mark.asyncio
+    async def test_queued_entries_flush_in_batches(self, fake_db):
+        """Test queued entries are written with insert_many on stop."""
+        AuditService.start()
+        for _ in range(5):
+            await _log("user.suspend")
+        await AuditService.stop()
+
+        assert fake_db.audit_logs.inserted_one == []
+        assert sum(len(b) for b in fake_db.audit_logs.batches) == 5
+
+    @pytest.mark.asyncio
+    async def test_must_persist_writes_directly(self, fake_db):
+        """Test finance actions and must_persist bypass the queue."""
+        AuditService.start()
+        await _log("payment.refund")
+        await _log("prompt.update", must_persist=True)
+        assert [d["action"] for d in fake_db.audit_logs.inserted_one] == ["payment.refund", "prompt.update"]
+        await AuditService.stop()
+
+        assert fake_db.audit_logs.batches == []
+
+    @pytest.mark.asyncio
+    async def test_direct_write_when_stopped(self, fake_db):
+        """Test entries are inserted immediately when no writer runs."""
+        await _log("user.suspend")
+
+        assert len(fake_db.audit_logs.inserted_one) == 1
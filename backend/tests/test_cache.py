@@ -0,0 +1,168 @@
+"""Unit tests for the read-through cache."""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.cache import Cache, CacheBackend, MemoryBackend, cache_stats, cached
+
+class TestMemoryBackend:
+    """Test TTL and LRU eviction."""
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_miss(self):
+        """Test entries past their TTL are not returned."""
+        backend = MemoryBackend(max_size=10)
+        await backend.set("a", 1, ttl=-1)
+
+        assert await backend.get("a") == (False, None)
+        assert backend.size() == 0
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_evicted(self):
+        """Test the oldest untouched entry goes first."""
+        backend = MemoryBackend(max_size=2)
+        await backend.set("a", 1, ttl=60)
+        await backend.set("b", 2, ttl=60)
+        await backend.get("a")
+        await backend.set("c", 3, ttl=60)
+
+        assert await backend.get("a") == (True, 1)
+        assert await backend.get("b") == (False, None)
+        assert backend.evictions == 1
+
+class TestCache:
+    """Test read-through loads, coalescing and invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_hit_after_load(self):
+        """Test a loaded value is served from cache."""
+        cache = Cache("test_hit", ttl=60, backend=MemoryBackend(10))
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return "value"
+
+        assert await cache.get_or_load("k", loader) == "value"
+        assert await cache.get_or_load("k", loader) == "value"
+        assert len(calls) == 1
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        """Test single-flight: concurrent misses run the loader once."""
+        cache = Cache("test_single_flight", ttl=60, backend=MemoryBackend(10))
+        release = asyncio.Event()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await release.wait()
+            return "value"
+
+        waiters = [asyncio.create_task(cache.get_or_load("k", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*waiters) == ["value"] * 5
+        assert len(calls) == 1
+        assert cache.coalesced == 4
+
+    @pytest.mark.asyncio
+    async def test_load_errors_reach_every_waiter(self):
+        """Test a failed load is not cached and propagates."""
+        cache = Cache("test_errors", ttl=60, backend=MemoryBackend(10))
+
+        async def loader():
+            raise RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("k", loader)
+        assert cache.load_errors == 1
+        assert await cache.backend.get("k") == (False, None)
+
+    @pytest.mark.asyncio
+    async def test_none_not_cached_by_default(self):
+        """Test missing records are looked up again."""
+        cache = Cache("test_none", ttl=60, backend=MemoryBackend(10))
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        await cache.get_or_load("k", loader)
+        await cache.get_or_load("k", loader)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidation_discards_in_flight_load(self):
+        """Test a load that started before invalidate does not store its result."""
+        cache = Cache("test_invalidate", ttl=60, backend=MemoryBackend(10))
+        release = asyncio.Event()
+
+        async def slow_loader():
+            await release.wait()
+            return "stale"
+
+        pending = asyncio.create_task(cache.get_or_load("k", slow_loader))
+        await asyncio.sleep(0)
+        await cache.invalidate("k")
+        release.set()
+
+        assert await pending == "stale"
+        assert await cache.backend.get("k") == (False, None)
+
+    @pytest.mark.asyncio
+    async def test_invalidation_is_per_key(self):
+        """Test invalidating one key leaves other entries and loads alone."""
+        cache = Cache("test_invalidate_per_key", ttl=60, backend=MemoryBackend(10))
+        release = asyncio.Event()
+
+        async def value():
+            return "a"
+
+        async def slow_loader():
+            await release.wait()
+            return "b"
+
+        await cache.get_or_load("a", value)
+        pending = asyncio.create_task(cache.get_or_load("b", slow_loader))
+        await asyncio.sleep(0)
+        await cache.invalidate("c")
+        release.set()
+
+        assert await pending == "b"
+        assert await cache.backend.get("a") == (True, "a")
+        assert await cache.backend.get("b") == (True, "b")
+
+    def test_backend_interface_is_abstract(self):
+        """Test backends must implement every operation."""
+        with pytest.raises(TypeError):
+            CacheBackend()
+
+class TestCachedDecorator:
+    """Test the opt-in decorator."""
+
+    @pytest.mark.asyncio
+    async def test_keys_by_arguments_and_invalidates(self):
+        """Test results are cached per argument tuple."""
+        calls = []
+
+        @cached("test_decorator", ttl=60)
+        async def load(mode, version):
+            calls.append((mode, version))
+            return f"{mode}-{version}"
+
+        assert await load("top", 1) == "top-1"
+        assert await load("top", 1) == "top-1"
+        assert await load("full", 1) == "full-1"
+        await load.invalidate("top", 1)
+        assert await load("top", 1) == "top-1"
+
+        assert calls == [("top", 1), ("full", 1), ("top", 1)]
+        assert cache_stats()["test_decorator"]["hits"] == 1
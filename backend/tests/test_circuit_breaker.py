@@ -0,0 +1,178 @@
+"""Unit tests for the sliding-window circuit breaker."""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError, CircuitState, get_breaker
+
+class Clock:
+    """Controllable stand-in for time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+def _breaker(**kwargs):
+    options = dict(failure_rate_threshold=0.5, min_calls=4, window_seconds=10,
+                   recovery_timeout=30, half_open_max_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker(name="test", **options)
+
+def _fail():
+    raise RuntimeError("upstream 503")
+
+def _bad_input():
+    raise ValueError("bad input")
+
+def _ok():
+    return "ok"
+
+class TestClosedState:
+    """Test opening on the windowed failure rate."""
+
+    def test_needs_min_calls(self, clock):
+        """Test a few failures below min_calls keep the circuit closed."""
+        breaker = _breaker()
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                breaker.call(_fail)
+
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_opens_at_failure_rate(self, clock):
+        """Test the circuit opens once the failure rate reaches the threshold."""
+        breaker = _breaker()
+        breaker.call(_ok)
+        breaker.call(_ok)
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.OPEN
+        with pytest.raises(CircuitBreakerOpenError):
+            breaker.call(_ok)
+        assert breaker.rejected == 1
+
+    def test_success_does_not_reset_window(self, clock):
+        """Test one success no longer wipes recent failures."""
+        breaker = _breaker()
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                breaker.call(_fail)
+        breaker.call(_ok)
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.OPEN
+
+    def test_old_failures_leave_window(self, clock):
+        """Test failures older than the window are not counted."""
+        breaker = _breaker()
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                breaker.call(_fail)
+        clock.now += 11
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.window_counts() == (1, 1)
+
+    def test_non_failures_ignored(self, clock):
+        """Test errors rejected by is_failure count as successes."""
+        breaker = _breaker(is_failure=lambda e: "503" in str(e))
+        for _ in range(4):
+            with pytest.raises(ValueError):
+                breaker.call(_bad_input)
+
+        assert breaker.state == CircuitState.CLOSED
+
+class TestHalfOpen:
+    """Test probe limits and recovery."""
+
+    def _open(self, breaker):
+        for _ in range(4):
+            with pytest.raises(RuntimeError):
+                breaker.call(_fail)
+        assert breaker.state == CircuitState.OPEN
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_probes(self, clock):
+        """Test only half_open_max_calls probes run at once."""
+        breaker = _breaker()
+        self._open(breaker)
+        clock.now += 30
+        release = asyncio.Event()
+
+        async def probe():
+            async with breaker.protect():
+                await release.wait()
+
+        probes = [asyncio.create_task(probe()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitBreakerOpenError):
+            async with breaker.protect():
+                pass
+
+        release.set()
+        await asyncio.gather(*probes)
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.transitions == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+    def test_probe_failure_reopens(self, clock):
+        """Test a failed probe re-opens the circuit for another recovery period."""
+        breaker = _breaker()
+        self._open(breaker)
+        clock.now += 30
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.OPEN
+        with pytest.raises(CircuitBreakerOpenError):
+            breaker.call(_ok)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_frees_slot(self, clock):
+        """Test a cancelled probe neither closes nor re-opens the circuit."""
+        breaker = _breaker(half_open_max_calls=1)
+        self._open(breaker)
+        clock.now += 30
+
+        async def probe():
+            async with breaker.protect():
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(probe())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker.call(_ok) == "ok"
+        assert breaker.state == CircuitState.CLOSED
+
+class TestRegistry:
+    """Test per-key breakers."""
+
+    def test_same_key_same_breaker(self):
+        """Test breakers are shared per key."""
+        first = get_breaker("webhook_host:test.example", min_calls=3)
+
+        assert get_breaker("webhook_host:test.example") is first
+        assert get_breaker("webhook_host:other.example") is not first
+        assert "webhook_host:test.example" in circuit_breaker.breaker_stats()
@@ -0,0 +1,58 @@
+"""Unit tests for listing count strategies."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import counting
+from utils.counting import count_total
+
+class FakeCollection:
+    """Collection stand-in that records which count ran."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    async def estimated_document_count(self):
+        self.calls.append("estimated")
+        return 1000
+
+    async def count_documents(self, query):
+        self.calls.append("exact")
+        return 42
+
+class TestCountTotal:
+    """Test strategy selection and caching."""
+
+    def setup_method(self):
+        counting._count_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_unfiltered_uses_estimate(self):
+        """Test unfiltered totals come from collection metadata."""
+        coll = FakeCollection("tryon_jobs")
+
+        assert await count_total(coll, {}) == (1000, True)
+        assert coll.calls == ["estimated"]
+
+    @pytest.mark.asyncio
+    async def test_filtered_counts_are_cached(self):
+        """Test repeated filtered totals reuse the cached count."""
+        coll = FakeCollection("tryon_jobs")
+
+        assert await count_total(coll, {"status": "failed"}) == (42, False)
+        assert await count_total(coll, {"status": "failed"}) == (42, True)
+        assert coll.calls == ["exact"]
+
+    @pytest.mark.asyncio
+    async def test_exact_flag_bypasses_shortcuts(self):
+        """Test exact totals always run count_documents."""
+        coll = FakeCollection("tryon_jobs")
+
+        assert await count_total(coll, {}, exact=True) == (42, False)
+        await count_total(coll, {"status": "failed"})
+        assert await count_total(coll, {"status": "failed"}, exact=True) == (42, False)
+        assert coll.calls == ["exact", "exact", "exact"]
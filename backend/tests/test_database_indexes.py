@@ -0,0 +1,103 @@
+"""Unit tests for the index manifest and explain checks."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pymongo.errors import OperationFailure
+
+from config import settings
+from database import Database
+from utils.database_indexes import REDUNDANT_INDEXES, build_index_manifest, create_indexes
+from utils.verify_indexes import plan_indexes, plan_stages
+
+class TestIndexManifest:
+    """Test manifest consistency."""
+
+    def test_redundant_indexes_not_recreated(self):
+        """Test dropped indexes are not also in the manifest."""
+        manifest = build_index_manifest()
+
+        for collection, names in REDUNDANT_INDEXES.items():
+            created = {index.document["name"] for index in manifest[collection]}
+            assert not created & set(names)
+
+    def test_plan_walk(self):
+        """Test stages and index names are collected from nested plans."""
+        plan = {
+            "stage": "PROJECTION_SIMPLE",
+            "inputStage": {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1_created_at_-1_id_-1"}
+            }
+        }
+
+        assert set(plan_stages({"queryPlan": plan})) == {"PROJECTION_SIMPLE", "FETCH", "IXSCAN"}
+        assert plan_indexes(plan) == ["user_id_1_created_at_-1_id_-1"]
+
+class FakeCollection:
+    def __init__(self, name, db, fail=(), conflict=()):
+        self.name = name
+        self.database = db
+        self.created = db.created
+        self.fail = fail
+        self.conflict = conflict
+
+    async def create_indexes(self, indexes):
+        names = [index.document["name"] for index in indexes]
+        if set(names) & set(self.fail):
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+        if set(names) & set(self.conflict):
+            raise OperationFailure("Index already exists with different options", code=85)
+        self.created.extend(f"{self.name}.{name}" for name in names)
+
+    async def drop_index(self, name):
+        self.created.append(f"dropped {self.name}.{name}")
+
+class FakeDB:
+    def __init__(self, fail, conflict=None):
+        self.created = []
+        self.commands = []
+        self.fail = fail
+        self.conflict = conflict or {}
+
+    def __getitem__(self, name):
+        return FakeCollection(name, self, self.fail.get(name, ()), self.conflict.get(name, ()))
+
+    async def command(self, name, collection, **kwargs):
+        self.commands.append((name, collection, kwargs))
+
+class TestCreateIndexes:
+    """Test one failing index doesn't block the manifest."""
+
+    @pytest.mark.asyncio
+    async def test_failed_index_isolated(self, monkeypatch):
+        """Test a unique index over duplicates fails alone."""
+        unique = "reference_id_1_type_1"
+        db = FakeDB({"credit_transactions": [unique]})
+        monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+
+        failed = await create_indexes()
+
+        assert failed == {"credit_transactions": [unique]}
+        assert "credit_transactions.id_1" in db.created
+        assert "webhooks.id_1" in db.created
+        assert "dropped tryon_jobs.status_1" in db.created
+        assert not any(entry.startswith("dropped credit_transactions") for entry in db.created)
+
+    @pytest.mark.asyncio
+    async def test_changed_ttl_is_retuned(self, monkeypatch):
+        """Test a TTL index whose expiry changed is updated with collMod, not left stale."""
+        db = FakeDB({}, conflict={"tryon_job_inputs": ["created_at_1"]})
+        monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+        monkeypatch.setattr(settings, "TRYON_JOB_INPUT_TTL_HOURS", 6)
+
+        failed = await create_indexes()
+
+        assert failed == {}
+        assert db.commands == [(
+            "collMod", "tryon_job_inputs", {"index": {"name": "created_at_1", "expireAfterSeconds": 6 * 3600}}
+        )]
+        assert "tryon_job_inputs.job_id_1" in db.created
@@ -0,0 +1,26 @@
+"""Unit tests for datetime storage helpers."""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.datetime_codec import USER_DATETIME_FIELDS, decode_datetimes, parse_datetime
+
+class TestDatetimeCodec:
+    """Test legacy string timestamps are decoded."""
+
+    def test_parse_aware_to_naive_utc(self):
+        """Test offset timestamps become naive UTC."""
+        assert parse_datetime("2024-05-01T12:00:00+05:30") == datetime(2024, 5, 1, 6, 30)
+        assert parse_datetime("2024-05-01T12:00:00.123456") == datetime(2024, 5, 1, 12, 0, 0, 123456)
+
+    def test_decode_leaves_datetimes(self):
+        """Test only string fields are parsed."""
+        now = datetime(2024, 5, 1)
+        doc = {"created_at": "2024-04-01T00:00:00", "updated_at": now, "last_login": None}
+
+        decode_datetimes(doc, USER_DATETIME_FIELDS)
+
+        assert doc == {"created_at": datetime(2024, 4, 1), "updated_at": now, "last_login": None}
@@ -0,0 +1,75 @@
+"""Unit tests for the shared outbound HTTP client."""
+import httpx
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from utils.http_client import HTTPClient
+
+@pytest.fixture
+def http_client(monkeypatch):
+    monkeypatch.setattr(HTTPClient, "client", None)
+    return HTTPClient
+
+class TestLifecycle:
+    """Test one client is shared until shutdown."""
+
+    @pytest.mark.asyncio
+    async def test_start_shares_one_client(self, http_client):
+        """Test start() creates the client once and get_client() reuses it."""
+        await http_client.start()
+        client = http_client.get_client()
+
+        await http_client.start()
+
+        assert http_client.get_client() is client
+        assert not client.is_closed
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_close_releases_client(self, http_client):
+        """Test close() closes the pool and a later call builds a fresh client."""
+        await http_client.start()
+        client = http_client.get_client()
+
+        await http_client.close()
+        await http_client.close()
+
+        assert client.is_closed
+        assert http_client.client is None
+        replacement = http_client.get_client()
+        assert replacement is not client
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_lazy_client_outside_lifespan(self, http_client):
+        """Test get_client() works without start(), e.g. from scripts."""
+        client = http_client.get_client()
+
+        assert http_client.get_client() is client
+        assert client.headers["User-Agent"] == "TrailRoom-Webhook/1.0"
+        assert client.timeout.connect == settings.WEBHOOK_HTTP_CONNECT_TIMEOUT
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_http2_needs_h2(self, http_client, monkeypatch):
+        """Test HTTP/2 is only requested when the h2 package is installed."""
+        requested = []
+        real_client = httpx.AsyncClient
+
+        def spy(**kwargs):
+            requested.append(kwargs["http2"])
+            return real_client(**{**kwargs, "http2": False})
+
+        monkeypatch.setattr(settings, "WEBHOOK_HTTP2_ENABLED", True)
+        monkeypatch.setattr(httpx, "AsyncClient", spy)
+        for available in (False, True):
+            monkeypatch.setattr(HTTPClient, "_http2_available", staticmethod(lambda: available))
+            http_client.get_client()
+            await http_client.close()
+
+        assert requested == [False, True]
@@ -0,0 +1,60 @@
+"""Unit tests for the in-memory IP blocklist."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.ip_blocklist import IPBlocklist, normalize_ip_entry
+
+class TestIPBlocklist:
+    """Test exact and CIDR matching."""
+    
+    def test_exact_address(self):
+        """Test single addresses are matched exactly."""
+        blocklist = IPBlocklist(["203.0.113.7"])
+        
+        assert blocklist.is_blocked("203.0.113.7")
+        assert not blocklist.is_blocked("203.0.113.8")
+    
+    def test_ipv4_range(self):
+        """Test CIDR ranges block every address inside them."""
+        blocklist = IPBlocklist(["10.0.0.0/8", "192.168.1.0/24"])
+        
+        assert blocklist.is_blocked("10.255.3.4")
+        assert blocklist.is_blocked("192.168.1.200")
+        assert not blocklist.is_blocked("192.168.2.1")
+        assert not blocklist.is_blocked("11.0.0.1")
+    
+    def test_ipv6_range(self):
+        """Test IPv6 ranges and IPv4-mapped addresses."""
+        blocklist = IPBlocklist(["2001:db8::/32", "198.51.100.0/24"])
+        
+        assert blocklist.is_blocked("2001:db8:1::42")
+        assert not blocklist.is_blocked("2001:db9::1")
+        assert blocklist.is_blocked("::ffff:198.51.100.9")
+    
+    def test_replace(self):
+        """Test replacing the list drops old entries."""
+        blocklist = IPBlocklist(["10.0.0.0/8"])
+        blocklist.replace(["172.16.0.1"])
+        
+        assert not blocklist.is_blocked("10.1.1.1")
+        assert blocklist.is_blocked("172.16.0.1")
+        assert len(blocklist) == 1
+    
+    def test_invalid_entries_and_addresses(self):
+        """Test invalid input is ignored rather than raising."""
+        blocklist = IPBlocklist(["not-an-ip", "10.0.0.0/8"])
+        
+        assert blocklist.is_blocked("10.0.0.1")
+        assert not blocklist.is_blocked("garbage")
+    
+    def test_normalize_ip_entry(self):
+        """Test entries are stored in canonical form."""
+        assert normalize_ip_entry(" 10.1.2.3 ") == "10.1.2.3"
+        assert normalize_ip_entry("10.1.2.3/8") == "10.0.0.0/8"
+        assert normalize_ip_entry("2001:DB8::1/128") == "2001:db8::1"
+        with pytest.raises(ValueError):
+            normalize_ip_entry("10.0.0.300")
@@ -0,0 +1,327 @@
+"""Unit tests for recovery of orphaned try-on jobs."""
+import asyncio
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from pymongo.errors import DuplicateKeyError
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from database import Database
+from services.credit_service import CreditService
+from services.image_service import ImageService
+from services.job_recovery_service import MAX_INPUT_DOCUMENT_BYTES, JobRecoveryService, JobRunLostError
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+            if "$gte" in condition and not value >= condition["$gte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs[:length]]
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+
+    def find(self, query, projection=None):
+        return FakeCursor([doc for doc in self.docs if _matches(doc, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for field, amount in update.get("$inc", {}).items():
+                    doc[field] = doc.get(field, 0) + amount
+                return dict(doc)
+        return None
+
+    async def update_one(self, query, update):
+        matched = await self.find_one_and_update(query, update)
+        return SimpleNamespace(matched_count=1 if matched else 0)
+
+    async def insert_one(self, doc):
+        reference_id = doc.get("reference_id")
+        if reference_id is not None and any(d.get("reference_id") == reference_id for d in self.docs):
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.docs.append(doc)
+
+    async def delete_one(self, query):
+        self.docs = [doc for doc in self.docs if not _matches(doc, query)]
+
+class FakeDB:
+    def __init__(self, jobs=None, inputs=None, users=None):
+        self.tryon_jobs = FakeCollection(jobs)
+        self.tryon_job_inputs = FakeCollection(inputs)
+        self.users = FakeCollection(users)
+        self.credit_transactions = FakeCollection()
+
+@pytest.fixture
+def install_db(monkeypatch):
+    def install(**collections):
+        db = FakeDB(**collections)
+        monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+        return db
+
+    return install
+
+def _job(job_id, status, age_seconds, **extra):
+    job = {
+        "id": job_id,
+        "user_id": "user-1",
+        "mode": "top",
+        "status": status,
+        "updated_at": datetime.utcnow() - timedelta(seconds=age_seconds)
+    }
+    job.update(extra)
+    return job
+
+def _inputs(job_id):
+    return {"job_id": job_id, "prompt_text": "prompt", "person_image": "p", "clothing_image": "c",
+            "bottom_image": None}
+
+class Runner:
+    """Records jobs handed to the execution engine."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def __call__(self, job, inputs):
+        self.jobs.append((job["id"], inputs["prompt_text"]))
+
+class TestRecoverySweep:
+    """Test finding and re-enqueueing stale jobs."""
+
+    @pytest.mark.asyncio
+    async def test_requeues_only_stale_jobs(self, install_db):
+        """Test stale queued/processing jobs are re-run and others left alone."""
+        stale = settings.JOB_STALE_AFTER_SECONDS + 60
+        db = install_db(
+            jobs=[
+                _job("stuck-processing", "processing", stale),
+                _job("stuck-queued", "queued", stale),
+                _job("running", "processing", 5),
+                _job("done", "completed", stale)
+            ],
+            inputs=[_inputs("stuck-processing"), _inputs("stuck-queued")]
+        )
+        runner = Runner()
+
+        result = await JobRecoveryService.recover_stale_jobs(runner)
+
+        assert result == {"found": 2, "requeued": 2, "failed": 0}
+        assert sorted(job_id for job_id, _ in runner.jobs) == ["stuck-processing", "stuck-queued"]
+        recovered = await db.tryon_jobs.find_one({"id": "stuck-processing"})
+        assert recovered["status"] == "queued"
+        assert recovered["recovery_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_respects_batch_size(self, install_db):
+        """Test one sweep re-enqueues at most `limit` jobs, oldest first."""
+        stale = settings.JOB_STALE_AFTER_SECONDS + 60
+        install_db(
+            jobs=[_job(f"job-{i}", "queued", stale + i) for i in range(5)],
+            inputs=[_inputs(f"job-{i}") for i in range(5)]
+        )
+        runner = Runner()
+
+        result = await JobRecoveryService.recover_stale_jobs(runner, limit=2)
+
+        assert result["requeued"] == 2
+        assert [job_id for job_id, _ in runner.jobs] == ["job-4", "job-3"]
+
+    @pytest.mark.asyncio
+    async def test_claim_is_exclusive(self, install_db):
+        """Test two instances reading the same stale job claim it once."""
+        install_db(jobs=[_job("stuck", "processing", settings.JOB_STALE_AFTER_SECONDS + 60)])
+        snapshot = await Database.get_db().tryon_jobs.find_one({"id": "stuck"})
+
+        first = await JobRecoveryService._claim(snapshot)
+        second = await JobRecoveryService._claim(snapshot)
+
+        assert first is not None
+        assert second is None
+
+    @pytest.mark.asyncio
+    async def test_fails_unrecoverable_jobs(self, install_db):
+        """Test jobs without inputs or past the recovery limit are failed."""
+        stale = settings.JOB_STALE_AFTER_SECONDS + 60
+        db = install_db(
+            jobs=[
+                _job("no-inputs", "processing", stale),
+                _job("poison", "processing", stale, recovery_count=settings.JOB_MAX_RECOVERIES)
+            ],
+            inputs=[_inputs("poison")]
+        )
+        runner = Runner()
+
+        result = await JobRecoveryService.recover_stale_jobs(runner)
+
+        assert result == {"found": 2, "requeued": 0, "failed": 2}
+        assert runner.jobs == []
+        for job_id in ("no-inputs", "poison"):
+            job = await db.tryon_jobs.find_one({"id": job_id})
+            assert job["status"] == "failed"
+
+class TestRetry:
+    """Test admin retries of failed jobs."""
+
+    @pytest.mark.asyncio
+    async def test_retry_requeues_failed_job(self, install_db):
+        """Test a failed job is re-run from its inputs and only while failed."""
+        db = install_db(jobs=[_job("failed", "failed", 0, error_message="boom")], inputs=[_inputs("failed")])
+        runner = Runner()
+
+        assert await JobRecoveryService.retry_failed_job("failed", runner) is not None
+        assert runner.jobs == [("failed", "prompt")]
+        assert (await db.tryon_jobs.find_one({"id": "failed"}))["error_message"] is None
+        assert await JobRecoveryService.retry_failed_job("failed", runner) is None
+
+    @pytest.mark.asyncio
+    async def test_retry_without_inputs(self, install_db):
+        """Test retrying a job whose inputs expired is rejected."""
+        install_db(jobs=[_job("failed", "failed", 0)])
+
+        with pytest.raises(ValueError):
+            await JobRecoveryService.retry_failed_job("failed", Runner())
+
+class TestCreditIdempotency:
+    """Test a re-run job is only charged once."""
+
+    @pytest.mark.asyncio
+    async def test_deduct_once_per_reference(self, install_db):
+        """Test repeating a deduction with the same reference_id charges once."""
+        db = install_db(users=[{"id": "user-1", "credits": 5}])
+
+        first = await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+        second = await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+
+        assert first == second == 3
+        assert (await db.users.find_one({"id": "user-1"}))["credits"] == 3
+        assert len(db.credit_transactions.docs) == 1
+
+    @pytest.mark.asyncio
+    async def test_insufficient_credits(self, install_db):
+        """Test the balance guard rejects an overdraft without charging."""
+        db = install_db(users=[{"id": "user-1", "credits": 1}])
+
+        with pytest.raises(ValueError, match="Insufficient credits"):
+            await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+        assert (await db.users.find_one({"id": "user-1"}))["credits"] == 1
+        assert db.credit_transactions.docs == []
+
+    @pytest.mark.asyncio
+    async def test_concurrent_run_loses_ledger_claim(self, install_db, monkeypatch):
+        """Test a run that loses the ledger insert race is not charged."""
+        db = install_db(users=[{"id": "user-1", "credits": 5}])
+        await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+
+        async def missed_precheck(query, projection=None):
+            return None
+
+        # Both runs passed the pre-check before either wrote the ledger
+        monkeypatch.setattr(db.credit_transactions, "find_one", missed_precheck)
+        balance = await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+
+        assert balance == 3
+        assert (await db.users.find_one({"id": "user-1"}))["credits"] == 3
+        assert len(db.credit_transactions.docs) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_decrement_removes_ledger_entry(self, install_db, monkeypatch):
+        """Test the ledger claim is withdrawn when the balance is spent concurrently."""
+        db = install_db(users=[{"id": "user-1", "credits": 5}])
+
+        async def balance_spent(query, update, projection=None, return_document=None):
+            return None
+
+        monkeypatch.setattr(db.users, "find_one_and_update", balance_spent)
+        with pytest.raises(ValueError, match="Insufficient credits"):
+            await CreditService.deduct_credits("user-1", 2, "Try-on", reference_id="job-1")
+        assert db.credit_transactions.docs == []
+
+class TestRunOwnership:
+    """Test a taken-over run can't overwrite the newer run."""
+
+    @pytest.mark.asyncio
+    async def test_stale_run_result_dropped(self, install_db):
+        """Test only the run that owns the job can finish it."""
+        db = install_db(jobs=[_job("job", "queued", 0)])
+        old_run = await JobRecoveryService.start_run("job")
+        await JobRecoveryService._claim(await db.tryon_jobs.find_one({"id": "job"}))
+        new_run = await JobRecoveryService.start_run("job")
+
+        assert not await JobRecoveryService.finish_run("job", old_run, {"status": "failed"})
+        assert await JobRecoveryService.finish_run("job", new_run, {"status": "completed"})
+        assert (await db.tryon_jobs.find_one({"id": "job"}))["status"] == "completed"
+        assert await JobRecoveryService.start_run("job") is None
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_refreshes_updated_at(self, install_db):
+        """Test a long run keeps the job out of the stale window."""
+        db = install_db(jobs=[_job("job", "queued", 0)])
+        run_id = await JobRecoveryService.start_run("job")
+        db.tryon_jobs.docs[0]["updated_at"] = datetime.utcnow() - timedelta(hours=1)
+
+        async with JobRecoveryService.heartbeat("job", run_id, interval=0.01):
+            await asyncio.sleep(0.05)
+
+        job = await db.tryon_jobs.find_one({"id": "job"})
+        assert datetime.utcnow() - job["updated_at"] < timedelta(seconds=5)
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_stops_taken_over_run(self, install_db):
+        """Test losing the job cancels the run's work."""
+        db = install_db(jobs=[_job("job", "queued", 0)])
+        run_id = await JobRecoveryService.start_run("job")
+        db.tryon_jobs.docs[0]["run_id"] = "other-run"
+
+        with pytest.raises(JobRunLostError):
+            async with JobRecoveryService.heartbeat("job", run_id, interval=0.01):
+                await asyncio.sleep(10)
+
+class TestInputSize:
+    """Test oversized inputs are rejected before anything is written."""
+
+    def test_image_size_cap(self):
+        """Test images over the per-image cap fail validation."""
+        assert ImageService.validate_image_size("a" * 10, max_bytes=10)
+        assert not ImageService.validate_image_size("a" * 11, max_bytes=10)
+
+    @pytest.mark.asyncio
+    async def test_oversize_inputs_not_stored(self, install_db):
+        """Test inputs that would exceed Mongo's document limit raise ValueError."""
+        db = install_db()
+        image = "a" * (MAX_INPUT_DOCUMENT_BYTES // 2)
+
+        with pytest.raises(ValueError):
+            await JobRecoveryService.save_inputs("job", "user-1", "full", "prompt", image, image, image)
+        assert db.tryon_job_inputs.docs == []
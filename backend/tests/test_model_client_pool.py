@@ -0,0 +1,116 @@
+"""Unit tests for the shared model client pool."""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.model_client_pool import ClientPool, ModelClientPool, client_key
+
+class FakeChat:
+    def __init__(self, n):
+        self.n = n
+        self.messages = []
+
+def _factory():
+    counter = {"n": 0}
+
+    def build():
+        counter["n"] += 1
+        return FakeChat(counter["n"])
+
+    return build
+
+class TestClientKey:
+    """Test key construction."""
+
+    def test_params_sorted_and_joined(self):
+        """Test keys are stable regardless of param order."""
+        key = client_key("gemini", "flash", {"modalities": ["image", "text"], "a": 1})
+
+        assert key == "gemini/flash?a=1&modalities=image,text"
+        assert client_key("gemini", "flash") == "gemini/flash"
+
+class TestClientPool:
+    """Test reuse, limits and metrics."""
+
+    @pytest.mark.asyncio
+    async def test_client_reused_and_reset(self):
+        """Test a returned client is reset and handed out again."""
+        def reset(chat):
+            chat.messages.clear()
+            return True
+
+        pool = ClientPool("k", _factory(), reset=reset, max_size=2, max_uses=0)
+
+        async with pool.checkout() as chat:
+            chat.messages.append("job 1")
+        async with pool.checkout() as again:
+            assert again is chat
+            assert again.messages == []
+
+        assert pool.created == 1
+        assert pool.stats()["calls"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unconfirmed_reset_discards_client(self):
+        """Test a client whose reset can't confirm it is clean is never handed out again."""
+        def reset(chat):
+            return getattr(chat, "history", None) is not None  # Not the attribute this client has
+
+        pool = ClientPool("k", _factory(), reset=reset, max_size=2, max_uses=0)
+
+        async with pool.checkout() as chat:
+            chat.messages.append("tenant A's images")
+        async with pool.checkout() as again:
+            assert again is not chat
+            assert again.messages == []
+
+        assert pool.created == 2
+        assert pool.stats()["reset_failures"] == 2
+        assert pool.stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_call_discards_client(self):
+        """Test a client that raised is not reused."""
+        pool = ClientPool("k", _factory(), max_size=2, max_uses=0)
+
+        with pytest.raises(RuntimeError):
+            async with pool.checkout():
+                raise RuntimeError("upstream error")
+        async with pool.checkout() as chat:
+            assert chat.n == 2
+
+        assert pool.errors == 1
+
+    @pytest.mark.asyncio
+    async def test_waits_when_exhausted(self):
+        """Test checkouts beyond max_size wait for a client to return."""
+        pool = ClientPool("k", _factory(), max_size=1, max_uses=0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.checkout():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(pool.checkout().__aenter__())
+        await asyncio.sleep(0)
+        assert pool.in_flight == 1 and not waiter.done()
+
+        release.set()
+        await holder
+        chat = await waiter
+        assert chat.n == 1
+        assert pool.waits == 1
+
+    def test_warm_up_respects_max_size(self):
+        """Test warm-up builds idle clients up to the pool size."""
+        registry = ModelClientPool()
+        registry.register("k", _factory(), max_size=3)
+
+        assert registry.warm_up(5) == {"k": 3}
+        assert registry.stats()["k"]["idle"] == 3
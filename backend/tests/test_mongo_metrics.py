@@ -0,0 +1,34 @@
+"""Unit tests for MongoDB pool metrics."""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.mongo_metrics import PoolMetrics
+
+class TestPoolMetrics:
+    """Test checkout counters and gauges."""
+
+    def test_checkout_lifecycle(self):
+        """Test checkouts, check-ins and failures are tracked."""
+        metrics = PoolMetrics()
+        event = SimpleNamespace(address=("localhost", 27017), reason="timeout")
+
+        metrics.connection_created(event)
+        metrics.connection_check_out_started(event)
+        metrics.connection_checked_out(event)
+        metrics.connection_check_out_started(event)
+        metrics.connection_check_out_failed(event)
+        snapshot = metrics.snapshot()
+
+        assert snapshot["checkouts"] == 1
+        assert snapshot["checked_out"] == 1
+        assert snapshot["connections_open"] == 1
+        assert snapshot["checkout_failures"] == {"timeout": 1}
+
+        metrics.connection_checked_in(event)
+        metrics.connection_closed(event)
+        assert metrics.snapshot()["checked_out"] == 0
+        assert metrics.snapshot()["connections_open"] == 0
@@ -0,0 +1,99 @@
+"""Unit tests for the in-memory prompt registry."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import Database
+from services.prompt_registry import DEFAULT_PROMPTS, PromptRegistry
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakePromptCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def find(self, query, projection=None):
+        self.queries += 1
+        return FakeCursor([doc for doc in self.docs if doc["is_active"] == query["is_active"]])
+
+class FakeDB:
+    def __init__(self, docs):
+        self.prompts = FakePromptCollection(docs)
+
+def _prompt(mode, version, is_active=True):
+    return {
+        "id": f"{mode}-v{version}",
+        "mode": mode,
+        "prompt_text": f"{mode} prompt v{version}",
+        "version": version,
+        "is_active": is_active
+    }
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setattr(PromptRegistry, "_active", {})
+
+    def install(docs):
+        db = FakeDB(docs)
+        monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+        return db
+
+    return install
+
+class TestPromptRegistry:
+    """Test loading and resolving prompts."""
+
+    def test_defaults_without_stored_prompts(self, fake_db):
+        """Test job modes fall back to built-in prompts as version 0."""
+        prompt = PromptRegistry.resolve("full")
+
+        assert prompt["prompt_text"] == DEFAULT_PROMPTS["full_outfit"]
+        assert prompt["id"] is None
+        assert prompt["version"] == 0
+
+    @pytest.mark.asyncio
+    async def test_newest_active_version_wins(self, fake_db):
+        """Test the highest active version per mode is used."""
+        fake_db([
+            _prompt("top_only", 3),
+            _prompt("top_only", 1),
+            _prompt("top_only", 4, is_active=False),
+            _prompt("full_outfit", 2),
+        ])
+
+        assert await PromptRegistry.refresh() == 2
+        assert PromptRegistry.resolve("top")["id"] == "top_only-v3"
+        assert PromptRegistry.resolve("full")["version"] == 2
+
+    @pytest.mark.asyncio
+    async def test_resolve_does_not_query(self, fake_db):
+        """Test resolving after a refresh never touches the database."""
+        db = fake_db([_prompt("top_only", 1)])
+        await PromptRegistry.refresh()
+
+        for _ in range(10):
+            PromptRegistry.resolve("top")
+
+        assert db.prompts.queries == 1
+
+    def test_unknown_mode_rejected(self, fake_db):
+        """Test an unknown job mode raises ValueError."""
+        with pytest.raises(ValueError):
+            PromptRegistry.resolve("shoes")
@@ -0,0 +1,156 @@
+"""Unit tests for sliding-window rate limiter."""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from database import Database
+from utils.rate_limiter import (
+    InMemoryRateLimitStore, MongoRateLimitStore, RateLimitStore, SlidingWindowLimiter, build_rate_limit_store
+)
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+class FakeEvents:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def delete_one(self, query):
+        self.docs = [doc for doc in self.docs if doc["_id"] != query["_id"]]
+
+    def find(self, query, projection=None):
+        return FakeCursor([
+            doc for doc in self.docs
+            if doc["key"] == query["key"] and doc["ts"] > query["ts"]["$gt"]
+        ])
+
+@pytest.fixture
+def events(monkeypatch):
+    collection = FakeEvents()
+    db = {"rate_limit_events": collection}
+    monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+    return collection
+
+class TestSlidingWindowLimiter:
+    """Test limit enforcement and usage counters."""
+
+    @pytest.mark.asyncio
+    async def test_allows_up_to_limit(self):
+        """Test hits are allowed until the limit is reached."""
+        limiter = SlidingWindowLimiter(limit=3, window_seconds=60, store=InMemoryRateLimitStore())
+
+        results = [await limiter.hit("user-1") for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert results[2].remaining == 0
+        assert results[3].retry_after > 0
+
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self):
+        """Test one user's usage does not affect another."""
+        limiter = SlidingWindowLimiter(limit=1, window_seconds=60, store=InMemoryRateLimitStore())
+
+        assert (await limiter.hit("user-1")).allowed
+        assert not (await limiter.hit("user-1")).allowed
+        assert (await limiter.hit("user-2")).allowed
+
+    @pytest.mark.asyncio
+    async def test_usage_leaves_window(self):
+        """Test old usage slides out of the window."""
+        store = InMemoryRateLimitStore()
+
+        assert (await store.acquire("user-1", 1, 1, 10, now=100.0)).allowed
+        blocked = await store.acquire("user-1", 1, 1, 10, now=105.0)
+        assert not blocked.allowed
+        assert blocked.retry_after == pytest.approx(5.0)
+        assert (await store.acquire("user-1", 1, 1, 10, now=110.5)).allowed
+
+    @pytest.mark.asyncio
+    async def test_record_and_count(self):
+        """Test recorded usage is counted without enforcing the limit."""
+        limiter = SlidingWindowLimiter(limit=2, window_seconds=3600, store=InMemoryRateLimitStore())
+
+        for _ in range(5):
+            await limiter.record("user-1")
+
+        assert await limiter.count("user-1") == 5
+        assert await limiter.count("user-2") == 0
+
+    def test_covers_window(self, monkeypatch):
+        """Test counters only cover windows they have been running for."""
+        monkeypatch.setattr(settings, "RATE_LIMIT_SINGLE_PROCESS", True)
+        limiter = SlidingWindowLimiter(limit=10, window_seconds=3600, store=InMemoryRateLimitStore())
+
+        assert not limiter.covers(7200)
+        assert not limiter.covers(3600)
+        limiter.started_at -= 3600
+        assert limiter.covers(3600)
+
+    def test_in_memory_store_needs_opt_in(self, monkeypatch):
+        """Test per-process counts are not trusted unless single-process is set."""
+        monkeypatch.setattr(settings, "RATE_LIMIT_SINGLE_PROCESS", False)
+        limiter = SlidingWindowLimiter(limit=10, window_seconds=3600, store=InMemoryRateLimitStore())
+        limiter.started_at -= 3600
+
+        assert not limiter.covers(3600)
+
+class TestSharedStore:
+    """Test the opt-in Mongo-backed store."""
+
+    def test_in_memory_store_is_default(self, monkeypatch):
+        """Test the hot path stays off the database unless the shared store is chosen."""
+        assert isinstance(build_rate_limit_store(), InMemoryRateLimitStore)
+        monkeypatch.setattr(settings, "RATE_LIMIT_STORE", "mongo")
+        assert isinstance(build_rate_limit_store(), MongoRateLimitStore)
+        monkeypatch.setattr(settings, "RATE_LIMIT_STORE", "redis")
+        with pytest.raises(ValueError):
+            build_rate_limit_store()
+
+    @pytest.mark.asyncio
+    async def test_default_limiter_refuses_without_database(self, monkeypatch):
+        """Test an over-limit caller is refused by the default store with no database access."""
+        def no_database(cls):
+            raise AssertionError("rate limiting must not touch the database")
+
+        monkeypatch.setattr(Database, "get_db", classmethod(no_database))
+        limiter = SlidingWindowLimiter(limit=1, window_seconds=60)
+
+        assert (await limiter.hit("user-1")).allowed
+        assert not (await limiter.hit("user-1")).allowed
+        assert await limiter.count("user-1") == 1
+
+    def test_store_interface_is_abstract(self):
+        """Test stores must implement every operation."""
+        with pytest.raises(TypeError):
+            RateLimitStore()
+
+    @pytest.mark.asyncio
+    async def test_limit_shared_between_limiters(self, events):
+        """Test two workers' limiters enforce one limit together."""
+        worker_a = SlidingWindowLimiter(limit=2, window_seconds=60, store=MongoRateLimitStore())
+        worker_b = SlidingWindowLimiter(limit=2, window_seconds=60, store=MongoRateLimitStore())
+
+        assert (await worker_a.hit("user-1")).allowed
+        assert (await worker_b.hit("user-1")).allowed
+        blocked = await worker_a.hit("user-1")
+
+        assert not blocked.allowed
+        assert blocked.count == 2
+        assert 0 < blocked.retry_after <= 60
+        assert len(events.docs) == 2  # The refused hit was withdrawn
+        assert await worker_b.count("user-1") == 2
@@ -0,0 +1,105 @@
+"""Unit tests for model call deadlines, retries and hedging."""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.circuit_breaker import CircuitBreakerOpenError
+from utils.resilient_call import DeadlineExceededError, ResilientCaller
+
+def _caller(**kwargs):
+    options = dict(deadline=5, attempt_timeout=1, max_attempts=3,
+                   base_delay=0, max_delay=0, hedge=False, hedge_min_samples=3)
+    options.update(kwargs)
+    return ResilientCaller("test", **options)
+
+class TestRetries:
+    """Test retry and deadline behaviour."""
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors(self):
+        """Test a 429 is retried and each attempt is recorded."""
+        caller = _caller()
+        calls = []
+
+        async def fn(timeout):
+            calls.append(timeout)
+            if len(calls) < 3:
+                raise RuntimeError("429 Too Many Requests")
+            return "image"
+
+        attempts = []
+        assert await caller.call(fn, attempts) == "image"
+        assert [a["outcome"] for a in attempts] == ["error", "error", "success"]
+        assert caller.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_fails_fast(self):
+        """Test input errors and open circuits are not retried."""
+        caller = _caller()
+
+        async def bad_input(timeout):
+            raise ValueError("Invalid image")
+
+        async def circuit_open(timeout):
+            raise CircuitBreakerOpenError("model", 30)
+
+        attempts = []
+        with pytest.raises(ValueError):
+            await caller.call(bad_input, attempts)
+        with pytest.raises(CircuitBreakerOpenError):
+            await caller.call(circuit_open, attempts)
+        assert len(attempts) == 2
+
+    @pytest.mark.asyncio
+    async def test_hung_call_times_out(self):
+        """Test a hung attempt is cut off and the call ends by its deadline."""
+        caller = _caller(deadline=0.3, attempt_timeout=0.1, max_attempts=5)
+
+        async def hang(timeout):
+            await asyncio.sleep(60)
+
+        attempts = []
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(caller.call(hang, attempts), 10)
+        assert [a["outcome"] for a in attempts] == ["timeout"]
+        assert caller.timeouts == 1
+
+class TestHedging:
+    """Test hedged requests."""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_over_slow_primary(self):
+        """Test an attempt past p95 is raced by a hedge and the loser cancelled."""
+        caller = _caller(hedge=True)
+        caller._latencies.extend([0.01] * 3)
+        started = []
+
+        async def fn(timeout):
+            started.append(1)
+            if len(started) == 1:
+                await asyncio.sleep(0.5)  # Slow primary
+                return "slow"
+            return "fast"
+
+        attempts = []
+        assert await caller.call(fn, attempts) == "fast"
+        assert [(a["hedge"], a["outcome"]) for a in attempts] == [(False, "cancelled"), (True, "success")]
+        assert caller.hedge_wins == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_samples(self):
+        """Test hedging waits for enough latency samples."""
+        caller = _caller(hedge=True)
+
+        async def fn(timeout):
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        attempts = []
+        assert await caller.call(fn, attempts) == "ok"
+        assert len(attempts) == 1
+        assert caller.hedges == 0
@@ -0,0 +1,115 @@
+"""Unit tests for retention archives."""
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from config import settings
+from database import Database
+from services.retention_service import (
+    ARCHIVAL_LEASE, ArchiveWriter, RetentionPolicy, RetentionService, _close_writers, _write_batch,
+    iter_archive, retention_policies
+)
+
+class FakeLeases:
+    """Mimics a conditional upsert on _id: a missed filter collides with the held lease"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one_and_update(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is not None:
+            owner, expiry = query["$or"]
+            if doc["owner"] != owner["owner"] and not doc["expires_at"] < expiry["expires_at"]["$lt"]:
+                raise DuplicateKeyError("E11000 duplicate key")
+        self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+        return doc
+
+    async def delete_one(self, query):
+        if self.docs.get(query["_id"], {}).get("owner") == query["owner"]:
+            del self.docs[query["_id"]]
+
+@pytest.fixture
+def leases(monkeypatch):
+    collection = FakeLeases()
+    db = SimpleNamespace(scheduler_leases=collection)
+    monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+    return collection
+
+class TestArchives:
+    """Test archive files round-trip and are split by month."""
+
+    def test_round_trip_preserves_types(self, tmp_path):
+        """Test ObjectIds and datetimes survive an archive round trip."""
+        path = str(tmp_path / "usage_events" / "2024-05" / "usage_events-2024-05-run.jsonl.gz")
+        doc = {"_id": ObjectId(), "user_id": "u1", "timestamp": datetime(2024, 5, 1, 12, 0, 0, 123000)}
+
+        writer = ArchiveWriter(path)
+        writer.write(doc)
+        writer.close()
+
+        assert list(iter_archive(path)) == [doc]
+        assert not Path(path + ".part").exists()
+
+    def test_batches_split_by_month(self, tmp_path, monkeypatch):
+        """Test documents are written to one file per month."""
+        monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", str(tmp_path))
+        policy = RetentionPolicy("usage_events", "timestamp", 90)
+        docs = [
+            {"_id": ObjectId(), "timestamp": datetime(2024, 4, 30)},
+            {"_id": ObjectId(), "timestamp": datetime(2024, 5, 1)},
+            {"_id": ObjectId(), "timestamp": datetime(2024, 5, 2)},
+        ]
+
+        writers = {}
+        _write_batch(writers, policy, "run1", docs)
+        _close_writers(writers)
+
+        assert sorted(writers) == ["2024-04", "2024-05"]
+        assert writers["2024-05"].count == 2
+        assert [d["_id"] for d in iter_archive(writers["2024-05"].path)] == [docs[1]["_id"], docs[2]["_id"]]
+
+class TestArchivalLease:
+    """Test only one instance archives at a time."""
+
+    @pytest.mark.asyncio
+    async def test_lease_is_exclusive_until_expiry(self, leases):
+        """Test a held lease blocks other owners, is renewable, and lapses."""
+        assert await RetentionService.acquire_lease(ARCHIVAL_LEASE, "a")
+        assert not await RetentionService.acquire_lease(ARCHIVAL_LEASE, "b")
+        assert await RetentionService.acquire_lease(ARCHIVAL_LEASE, "a")
+
+        leases.docs[ARCHIVAL_LEASE]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        assert await RetentionService.acquire_lease(ARCHIVAL_LEASE, "b")
+
+    @pytest.mark.asyncio
+    async def test_run_skipped_while_lease_held(self, leases, monkeypatch):
+        """Test archival does nothing while another instance holds the lease."""
+        archived = []
+
+        async def archive_policy(policy, now=None):
+            archived.append(policy.collection)
+            return 0
+
+        monkeypatch.setattr(RetentionService, "archive_policy", staticmethod(archive_policy))
+        await RetentionService.acquire_lease(ARCHIVAL_LEASE, "other-instance")
+
+        assert await RetentionService.run_archival() is None
+        assert archived == []
+
+        await RetentionService.release_lease(ARCHIVAL_LEASE, "other-instance")
+        assert await RetentionService.run_archival() is not None
+        assert archived
+        assert leases.docs == {}
+
+    def test_tryon_result_stripping_off_by_default(self):
+        """Test try-on results are kept unless retention is configured."""
+        policy = next(p for p in retention_policies() if p.collection == "tryon_jobs")
+        assert policy.retention_days == 0
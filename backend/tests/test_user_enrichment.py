@@ -0,0 +1,62 @@
+"""Unit tests for batched user enrichment in admin listings."""
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import Database
+from utils import user_enrichment
+from utils.user_enrichment import attach_user_emails, get_user_emails
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return self._iterate([doc for doc in self.docs if doc["id"] in query["id"]["$in"]])
+
+    async def _iterate(self, docs):
+        for doc in docs:
+            yield dict(doc)
+
+@pytest.fixture
+def users(monkeypatch):
+    monkeypatch.setattr(user_enrichment, "_email_cache", user_enrichment.OrderedDict())
+    collection = FakeUsers([
+        {"id": "u1", "email": "ann@example.com", "first_name": "Ann", "last_name": "Lee"},
+        {"id": "u2", "email": "bob@example.com", "first_name": "Bob", "last_name": None},
+    ])
+    db = SimpleNamespace(users=collection)
+    monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+    return collection
+
+class TestEnrichment:
+    """Test batched lookups and caching."""
+
+    @pytest.mark.asyncio
+    async def test_one_query_per_batch(self, users):
+        """Test a listing resolves all emails with one $in query, then from cache."""
+        rows = [{"user_id": "u1"}, {"user_id": "u2"}, {"user_id": "u1"}, {"user_id": "gone"}]
+
+        await attach_user_emails(rows)
+        await get_user_emails(["u1", "u2"])
+
+        assert [row.get("user_email") for row in rows] == [
+            "ann@example.com", "bob@example.com", "ann@example.com", None
+        ]
+        assert len(users.queries) == 1
+
+    @pytest.mark.asyncio
+    async def test_reads_primary(self, users, monkeypatch):
+        """Test lookups read the primary, so a just-created user is found."""
+        def secondary(cls):
+            raise AssertionError("enrichment must not read secondaries")
+
+        monkeypatch.setattr(Database, "get_analytics_db", classmethod(secondary))
+
+        assert await get_user_emails(["u1"]) == {"u1": "ann@example.com"}
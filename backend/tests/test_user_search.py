@@ -0,0 +1,64 @@
+"""Unit tests for indexed user search helpers."""
+import pytest
+import re
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.user_search as user_search
+from utils.user_search import build_search_query, search_fields, search_query
+
+class TestUserSearch:
+    """Test derived fields and query shapes."""
+
+    def test_search_fields(self):
+        """Test lowercase copies and trigrams are derived."""
+        fields = search_fields("Ann.Lee@Example.com", "Ann", None)
+
+        assert fields["email_lower"] == "ann.lee@example.com"
+        assert fields["first_name_lower"] == "ann"
+        assert fields["last_name_lower"] == ""
+        assert "lee" in fields["search_ngrams"]
+        assert "ann" in fields["search_ngrams"]
+
+    def test_short_terms_are_prefix_anchored(self):
+        """Test short terms use anchored regexes on lowercase fields."""
+        query = build_search_query("An")
+
+        assert {"email_lower": {"$regex": "^an"}} in query["$or"]
+        assert "search_ngrams" not in query
+
+    def test_long_terms_use_trigrams(self):
+        """Test longer terms require all trigrams and escape regex input."""
+        query = build_search_query("Lee@Ex.")
+
+        assert query["search_ngrams"]["$all"] == sorted({"lee", "ee@", "e@e", "@ex", "ex."})
+        pattern = query["$or"][0]["email_lower"]["$regex"]
+        assert re.search(pattern, "ann.lee@ex.com")
+        assert not re.search(pattern, "ann.lee@exa")
+
+class TestBackfillFallback:
+    """Test users without search fields are still found."""
+
+    @pytest.mark.asyncio
+    async def test_regex_scan_until_backfilled(self, monkeypatch):
+        """Test the regex query is used while any user lacks search fields."""
+        missing = [{"_id": 1}]
+
+        async def find_one(query, projection=None):
+            assert query == {"search_ngrams": {"$exists": False}}
+            return missing[0] if missing else None
+
+        db = SimpleNamespace(users=SimpleNamespace(find_one=find_one))
+        monkeypatch.setattr(user_search, "_fields_complete", False)
+
+        query = await search_query(db, "Lee@Ex.")
+        assert {"email": {"$regex": re.escape("Lee@Ex."), "$options": "i"}} in query["$or"]
+        assert "search_ngrams" not in query
+
+        missing.clear()
+        query = await search_query(db, "Lee@Ex.")
+        assert "search_ngrams" in query
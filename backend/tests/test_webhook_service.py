@@ -0,0 +1,442 @@
+"""Unit tests for webhook fan-out and batched delivery."""
+import asyncio
+import httpx
+import json
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from database import Database
+from models.webhook_model import WebhookDeliveryModel, WebhookModel
+from services.webhook_service import WebhookService
+from utils.cache import MemoryBackend
+from utils.http_client import HTTPClient
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lt" in condition and (value is None or not value < condition["$lt"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs[:length]]
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if _matches(doc, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def insert_many(self, docs):
+        self.docs.extend(dict(doc) for doc in docs)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update["$set"])
+                return
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update["$set"])
+
+    async def delete_one(self, query):
+        before = len(self.docs)
+        await self.delete_many(query)
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def delete_many(self, query):
+        self.docs = [doc for doc in self.docs if not _matches(doc, query)]
+
+class FakeDB:
+    def __init__(self, webhooks=None, outbox=None):
+        self.webhooks = FakeCollection(webhooks)
+        self.webhook_deliveries = FakeCollection()
+        self.webhook_batch_outbox = FakeCollection(outbox)
+
+def _webhook(webhook_id="wh-1", **extra):
+    fields = {"id": webhook_id, "user_id": "user-1", "url": "https://hooks.example.com/in", "name": "hook",
+              "events": ["tryon.completed"], "secret": "s", "batch_enabled": True,
+              "batch_window_seconds": 300, "batch_max_events": 2}
+    fields.update(extra)
+    return WebhookModel(**fields)
+
+def _outbox_event(event_id, webhook_id, age_seconds):
+    created_at = datetime.utcnow() - timedelta(seconds=age_seconds)
+    return {"id": event_id, "webhook_id": webhook_id, "event": "tryon.completed", "payload": {"n": event_id},
+            "timestamp": created_at.isoformat(), "created_at": created_at}
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Fresh batch state; records deliveries instead of sending them"""
+    monkeypatch.setattr(WebhookService, "_batch_buffers", {})
+    monkeypatch.setattr(WebhookService, "_batch_webhooks", {})
+    monkeypatch.setattr(WebhookService, "_batch_timers", {})
+    deliveries = []
+
+    async def deliver(webhook, delivery):
+        deliveries.append((webhook.id, delivery.payload))
+
+    monkeypatch.setattr(WebhookService, "deliver_webhook", staticmethod(deliver))
+    return deliveries
+
+@pytest.fixture
+def install_db(monkeypatch):
+    def install(**collections):
+        db = FakeDB(**collections)
+        monkeypatch.setattr(Database, "get_db", classmethod(lambda cls: db))
+        return db
+
+    return install
+
+class TestBatchOutbox:
+    """Test buffered batch events survive a crash."""
+
+    @pytest.mark.asyncio
+    async def test_events_persisted_until_recorded(self, install_db, sent, monkeypatch):
+        """Test a buffered event stays in the outbox until its batch delivery is recorded."""
+        webhook = _webhook()
+        db = install_db()
+
+        async def subscribed(user_id, event_type):
+            return [webhook.model_dump()]
+
+        monkeypatch.setattr(WebhookService, "get_subscribed_webhooks", staticmethod(subscribed))
+
+        await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": 1})
+        assert [e["payload"] for e in db.webhook_batch_outbox.docs] == [{"n": 1}]
+        assert sent == []
+
+        await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": 2})
+        assert db.webhook_batch_outbox.docs == []
+        assert len(db.webhook_deliveries.docs) == 1
+        (webhook_id, envelope), = sent
+        assert webhook_id == webhook.id
+        assert [e["payload"] for e in envelope["events"]] == [{"n": 1}, {"n": 2}]
+        assert set(envelope["events"][0]) == {"event", "payload", "timestamp"}
+
+    @pytest.mark.asyncio
+    async def test_recovers_stale_events(self, install_db, sent):
+        """Test events a crashed instance left behind are delivered, split by batch size."""
+        stale = settings.WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS + 60
+        db = install_db(
+            webhooks=[_webhook().model_dump()],
+            outbox=[
+                _outbox_event("e1", "wh-1", stale + 2),
+                _outbox_event("e2", "wh-1", stale + 1),
+                _outbox_event("e3", "wh-1", stale),
+                _outbox_event("deleted", "wh-gone", stale),
+                _outbox_event("fresh", "wh-1", 0),
+            ]
+        )
+
+        assert await WebhookService.recover_batches() == 3
+
+        assert [[e["payload"]["n"] for e in envelope["events"]] for _, envelope in sent] == [["e1", "e2"], ["e3"]]
+        assert [e["id"] for e in db.webhook_batch_outbox.docs] == ["fresh"]
+        assert await WebhookService.recover_batches() == 0
+        assert len(sent) == 2
+
+    @pytest.mark.asyncio
+    async def test_claimed_events_skipped(self, install_db, sent):
+        """Test events another sweep is delivering aren't delivered twice."""
+        stale = settings.WEBHOOK_BATCH_RECOVERY_AFTER_SECONDS + 60
+        event = _outbox_event("e1", "wh-1", stale)
+        event.update(claim="other-sweep", claimed_at=datetime.utcnow())
+        install_db(webhooks=[_webhook().model_dump()], outbox=[event])
+
+        assert await WebhookService.recover_batches() == 0
+        assert sent == []
+
+    @pytest.mark.asyncio
+    async def test_delete_discards_outbox(self, install_db, sent):
+        """Test deleting a webhook drops its persisted events."""
+        db = install_db(
+            webhooks=[_webhook().model_dump()],
+            outbox=[_outbox_event("e1", "wh-1", 0), _outbox_event("e2", "wh-2", 0)]
+        )
+
+        assert await WebhookService.delete_webhook("wh-1", "user-1")
+
+        assert [e["id"] for e in db.webhook_batch_outbox.docs] == ["e2"]
+
+class TestPooledClient:
+    """Test deliveries go out over the shared client."""
+
+    @pytest.mark.asyncio
+    async def test_deliveries_reuse_shared_client(self, install_db, monkeypatch):
+        """Test every delivery posts through HTTPClient's one client, signed over the sent bytes."""
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, text="ok")
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(HTTPClient, "client", client)
+        webhook = _webhook(url="https://pooled.example.com/in", batch_enabled=False)
+        db = install_db(webhooks=[webhook.model_dump()])
+
+        for n in range(2):
+            delivery = WebhookDeliveryModel(webhook_id=webhook.id, event_type="tryon.completed",
+                                            payload={"n": n}, status="pending")
+            await db.webhook_deliveries.insert_one(delivery.model_dump())
+            await WebhookService.deliver_webhook(webhook, delivery)
+
+        assert HTTPClient.get_client() is client
+        assert [json.loads(r.content) for r in requests] == [{"n": 0}, {"n": 1}]
+        for request in requests:
+            expected = WebhookService.generate_signature(request.content.decode(), webhook.secret)
+            assert request.headers["X-Webhook-Signature"] == expected
+        assert [d["status"] for d in db.webhook_deliveries.docs] == ["success", "success"]
+        await client.aclose()
+
+class InFlight:
+    """Stands in for deliver_webhook; tracks peak concurrency overall and per host"""
+
+    def __init__(self):
+        self.current = {}
+        self.peak = {}
+        self.order = []
+
+    async def __call__(self, webhook, delivery):
+        host = webhook.url.split("/")[2]
+        for key in (host, "*"):
+            self.current[key] = self.current.get(key, 0) + 1
+            self.peak[key] = max(self.peak.get(key, 0), self.current[key])
+        await asyncio.sleep(0.01 if host.startswith("slow") else 0)
+        for key in (host, "*"):
+            self.current[key] -= 1
+        self.order.append(host)
+
+@pytest.fixture
+def in_flight(monkeypatch):
+    monkeypatch.setattr(WebhookService, "_fanout_semaphore", None)
+    monkeypatch.setattr(WebhookService, "_host_semaphores", {})
+    tracker = InFlight()
+    monkeypatch.setattr(WebhookService, "deliver_webhook", staticmethod(tracker))
+    return tracker
+
+def _delivery(webhook):
+    return WebhookDeliveryModel(webhook_id=webhook.id, event_type="tryon.completed", payload={}, status="pending")
+
+class TestFanOut:
+    """Test concurrent fan-out stays within the per-host and global caps."""
+
+    @pytest.mark.asyncio
+    async def test_per_host_cap(self, in_flight, monkeypatch):
+        """Test one host never gets more than its concurrent deliveries."""
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENCY_PER_HOST", 2)
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENT_DELIVERIES", 100)
+        webhooks = [_webhook(f"wh-{i}", url=f"https://slow.example.com/{i}") for i in range(6)]
+
+        await asyncio.gather(*(WebhookService._deliver_bounded(w, _delivery(w)) for w in webhooks))
+
+        assert in_flight.peak["slow.example.com"] == 2
+        assert len(in_flight.order) == 6
+
+    @pytest.mark.asyncio
+    async def test_global_cap(self, in_flight, monkeypatch):
+        """Test deliveries across many hosts are capped process-wide."""
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENCY_PER_HOST", 4)
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENT_DELIVERIES", 3)
+        webhooks = [_webhook(f"wh-{i}", url=f"https://slow-{i}.example.com/in") for i in range(8)]
+
+        await asyncio.gather(*(WebhookService._deliver_bounded(w, _delivery(w)) for w in webhooks))
+
+        assert in_flight.peak["*"] == 3
+
+    @pytest.mark.asyncio
+    async def test_saturated_host_does_not_block_others(self, in_flight, monkeypatch):
+        """Test deliveries queued on a busy host don't hold global slots."""
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENCY_PER_HOST", 1)
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENT_DELIVERIES", 2)
+        slow = [_webhook(f"slow-{i}", url="https://slow.example.com/in") for i in range(4)]
+        fast = _webhook("fast", url="https://fast.example.com/in")
+
+        await asyncio.gather(*(WebhookService._deliver_bounded(w, _delivery(w)) for w in slow + [fast]))
+
+        assert in_flight.order[0] == "fast.example.com"
+
+    @pytest.mark.asyncio
+    async def test_trigger_fans_out_concurrently(self, in_flight, install_db, monkeypatch):
+        """Test one event is delivered to every subscriber at once, with one insert for all records."""
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENCY_PER_HOST", 4)
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_CONCURRENT_DELIVERIES", 100)
+        webhooks = [_webhook(f"wh-{i}", url=f"https://slow-{i}.example.com/in", batch_enabled=False)
+                    for i in range(3)]
+        db = install_db()
+        inserts = []
+        insert_many = db.webhook_deliveries.insert_many
+
+        async def record_insert(docs):
+            inserts.append(len(docs))
+            await insert_many(docs)
+
+        async def subscribed(user_id, event_type):
+            return [w.model_dump() for w in webhooks]
+
+        monkeypatch.setattr(db.webhook_deliveries, "insert_many", record_insert)
+        monkeypatch.setattr(WebhookService, "get_subscribed_webhooks", staticmethod(subscribed))
+
+        await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": 1})
+
+        assert in_flight.peak["*"] == 3
+        assert inserts == [3]
+
+@pytest.fixture
+def subscriptions(monkeypatch):
+    """Empty in-process subscription cache for each test"""
+    monkeypatch.setattr(WebhookService._load_active_webhooks.cache, "backend", MemoryBackend(100))
+
+class TestSubscriptionCache:
+    """Test cached subscription lookups and their invalidation on writes."""
+
+    @pytest.mark.asyncio
+    async def test_lookups_served_from_cache(self, install_db, subscriptions):
+        """Test repeated events for a user hit the database once, including users without webhooks."""
+        db = install_db(webhooks=[_webhook(batch_enabled=False).model_dump()])
+
+        assert [w["id"] for w in await WebhookService.get_subscribed_webhooks("user-1", "tryon.completed")] == ["wh-1"]
+        assert await WebhookService.get_subscribed_webhooks("user-1", "tryon.failed") == []
+        assert await WebhookService.get_subscribed_webhooks("user-2", "tryon.completed") == []
+        assert await WebhookService.get_subscribed_webhooks("user-2", "tryon.completed") == []
+
+        assert len(db.webhooks.queries) == 2
+
+    @pytest.mark.asyncio
+    async def test_create_invalidates(self, install_db, subscriptions):
+        """Test a new webhook receives the next event."""
+        install_db()
+        assert await WebhookService.get_subscribed_webhooks("user-1", "tryon.completed") == []
+
+        webhook = await WebhookService.create_webhook("user-1", "https://hooks.example.com/in", "hook",
+                                                      ["tryon.completed"])
+
+        assert [w["id"] for w in await WebhookService.get_subscribed_webhooks("user-1", "tryon.completed")] == [webhook.id]
+
+    @pytest.mark.asyncio
+    async def test_update_invalidates(self, install_db, subscriptions):
+        """Test event and active changes apply to the next event."""
+        install_db(webhooks=[_webhook(batch_enabled=False).model_dump()])
+        assert await WebhookService.get_subscribed_webhooks("user-1", "tryon.failed") == []
+
+        await WebhookService.update_webhook("wh-1", "user-1", events=["tryon.failed"])
+        assert len(await WebhookService.get_subscribed_webhooks("user-1", "tryon.failed")) == 1
+
+        await WebhookService.update_webhook("wh-1", "user-1", is_active=False)
+        assert await WebhookService.get_subscribed_webhooks("user-1", "tryon.failed") == []
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_only_owner(self, install_db, subscriptions):
+        """Test deleting a webhook stops its deliveries and leaves other users cached."""
+        db = install_db(webhooks=[
+            _webhook(batch_enabled=False).model_dump(),
+            _webhook("wh-2", user_id="user-2", batch_enabled=False).model_dump()
+        ])
+        await WebhookService.get_subscribed_webhooks("user-1", "tryon.completed")
+        await WebhookService.get_subscribed_webhooks("user-2", "tryon.completed")
+
+        assert await WebhookService.delete_webhook("wh-1", "user-1")
+
+        assert await WebhookService.get_subscribed_webhooks("user-1", "tryon.completed") == []
+        assert len(await WebhookService.get_subscribed_webhooks("user-2", "tryon.completed")) == 1
+        assert [q["user_id"] for q in db.webhooks.queries] == ["user-1", "user-2", "user-1"]
+
+@pytest.fixture
+def subscribe(monkeypatch):
+    def subscribe(*webhooks):
+        async def subscribed(user_id, event_type):
+            return [w.model_dump() for w in webhooks]
+
+        monkeypatch.setattr(WebhookService, "get_subscribed_webhooks", staticmethod(subscribed))
+
+    return subscribe
+
+class TestBatchFlush:
+    """Test a batch is flushed when full, when its window ends, and on shutdown."""
+
+    @pytest.mark.asyncio
+    async def test_flush_when_full(self, install_db, sent, subscribe):
+        """Test reaching batch_max_events delivers at once and cancels the window timer."""
+        install_db()
+        subscribe(_webhook(batch_max_events=3))
+
+        for n in range(3):
+            await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": n})
+            if n < 2:
+                timer = WebhookService._batch_timers["wh-1"]
+
+        assert [envelope["count"] for _, envelope in sent] == [3]
+        await asyncio.sleep(0)
+        assert timer.cancelled()
+        assert WebhookService._batch_timers == {}
+
+    @pytest.mark.asyncio
+    async def test_flush_when_window_ends(self, install_db, sent, subscribe):
+        """Test a partial batch is delivered once the first event's window has passed."""
+        db = install_db()
+        subscribe(_webhook(batch_window_seconds=0))
+
+        await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": 1})
+        assert sent == []
+        await WebhookService._batch_timers["wh-1"]
+
+        (_, envelope), = sent
+        assert envelope["count"] == 1
+        assert db.webhook_batch_outbox.docs == []
+        assert WebhookService._batch_buffers == {}
+
+    @pytest.mark.asyncio
+    async def test_flush_on_shutdown(self, install_db, sent, subscribe):
+        """Test every buffered batch is delivered by flush_batches()."""
+        db = install_db()
+        subscribe(_webhook("wh-1"), _webhook("wh-2"))
+
+        await WebhookService.trigger_webhook("user-1", "tryon.completed", {"n": 1})
+        timers = list(WebhookService._batch_timers.values())
+
+        await WebhookService.flush_batches()
+
+        assert sorted(webhook_id for webhook_id, _ in sent) == ["wh-1", "wh-2"]
+        await asyncio.sleep(0)
+        assert all(timer.cancelled() for timer in timers)
+        assert db.webhook_batch_outbox.docs == []
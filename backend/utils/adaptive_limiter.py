@@ -0,0 +1,192 @@
+"""
+Adaptive (AIMD) concurrency limit for calls to an external provider
+
+The limit grows by one per limit's worth of healthy calls made while the
+limiter is saturated, so it climbs only when more concurrency could be used.
+It is cut multiplicatively on overload signals: by LLM_LIMIT_BACKOFF_RATIO
+for 429 / 5xx / timeouts, and by LLM_LIMIT_LATENCY_BACKOFF_RATIO when a call
+takes longer than LLM_LIMIT_LATENCY_TOLERANCE x the baseline latency
+(a slow moving average of successful calls). Decreases are at most one per
+cooldown, so a burst of failures from one overload halves the limit once.
+
+Slow calls still feed the baseline, at a lower weight: a spike barely moves
+it, but if the provider's latency shifts for good the baseline catches up
+within a few dozen calls instead of pinning the limit at its minimum.
+"""
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504}
+# Provider SDK exception classes (matched by name, so none needs importing)
+OVERLOAD_ERROR_TYPES = {
+    "RateLimitError", "ServiceUnavailableError", "InternalServerError", "APITimeoutError", "Timeout",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+}
+# Fallback for errors that only carry a message. A bare number is never
+# enough: status codes must be labelled as such or followed by their reason
+OVERLOAD_PATTERNS = (
+    re.compile(r"\b(?:status|http|error)(?:[ _]?code)?\s*[:=]?\s*(?:429|50[0234])\b", re.IGNORECASE),
+    re.compile(
+        r"\b(?:429|50[0234])\b\W{0,3}(?:too many requests|resource[ _]exhausted|internal server error|"
+        r"bad gateway|service unavailable|unavailable|gateway time-?out|overloaded)",
+        re.IGNORECASE
+    ),
+    re.compile(r"\b(?:RESOURCE_EXHAUSTED|UNAVAILABLE|DEADLINE_EXCEEDED)\b"),  # gRPC status names
+    re.compile(
+        r"\b(?:rate limit(?:ed)?|too many requests|quota exceeded|overloaded|service unavailable|deadline exceeded)\b",
+        re.IGNORECASE
+    ),
+)
+BASELINE_ALPHA = 0.05  # Weight of each healthy call in the baseline latency
+SLOW_BASELINE_ALPHA = 0.01  # Weight of each slow call
+
+# name -> limiter, for metrics
+_limiters: Dict[str, "AdaptiveLimiter"] = {}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Rate limiting, provider 5xx or a timeout; anything else is the caller's problem"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    if any(cls.__name__ in OVERLOAD_ERROR_TYPES for cls in type(exc).__mro__):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in OVERLOAD_STATUS_CODES
+    message = str(exc)
+    return any(pattern.search(message) for pattern in OVERLOAD_PATTERNS)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted from call outcomes and latency"""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        backoff_ratio: Optional[float] = None,
+        latency_backoff_ratio: Optional[float] = None,
+        latency_tolerance: Optional[float] = None,
+        cooldown: Optional[float] = None
+    ):
+        self.name = name
+        self.min_limit = min_limit or settings.LLM_LIMIT_MIN
+        self.max_limit = max_limit or settings.LLM_LIMIT_MAX
+        self.limit = float(min(max(initial_limit or settings.LLM_LIMIT_INITIAL, self.min_limit), self.max_limit))
+        self.backoff_ratio = backoff_ratio or settings.LLM_LIMIT_BACKOFF_RATIO
+        self.latency_backoff_ratio = latency_backoff_ratio or settings.LLM_LIMIT_LATENCY_BACKOFF_RATIO
+        self.latency_tolerance = latency_tolerance or settings.LLM_LIMIT_LATENCY_TOLERANCE
+        self.cooldown = cooldown if cooldown is not None else settings.LLM_LIMIT_COOLDOWN_SECONDS
+        self.in_flight = 0
+        self.waiting = 0
+        self.baseline_latency: Optional[float] = None
+        self.successes = 0
+        self.overloads = 0
+        self.slow_calls = 0
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._changed = asyncio.Condition()
+        _limiters[name] = self
+
+    async def _acquire(self) -> bool:
+        """Wait for a slot; returns whether the limiter was saturated when it was taken"""
+        async with self._changed:
+            self.waiting += 1
+            try:
+                await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            return self.in_flight >= int(self.limit)
+
+    async def _release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def _decrease(self, ratio: float, now: float):
+        if now - self._last_decrease < self.cooldown:
+            return
+        old = self.limit
+        self.limit = max(float(self.min_limit), self.limit * ratio)
+        self._last_decrease = now
+        if int(self.limit) < int(old):
+            self.decreases += 1
+            logger.info(f"{self.name} concurrency limit {int(old)} -> {int(self.limit)}")
+
+    def record_success(self, latency: float, saturated: bool, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.successes += 1
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        elif latency > self.baseline_latency * self.latency_tolerance:
+            self.slow_calls += 1
+            self.baseline_latency += SLOW_BASELINE_ALPHA * (latency - self.baseline_latency)
+            self._decrease(self.latency_backoff_ratio, now)
+            return
+        else:
+            self.baseline_latency += BASELINE_ALPHA * (latency - self.baseline_latency)
+        if saturated and self.limit < self.max_limit:
+            old = int(self.limit)
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            if int(self.limit) > old:
+                self.increases += 1
+
+    def record_overload(self, now: Optional[float] = None):
+        self.overloads += 1
+        self._decrease(self.backoff_ratio, time.monotonic() if now is None else now)
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with limiter.slot():` around one provider call"""
+        saturated = await self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_overload_error(e):
+                self.record_overload()
+            raise
+        else:
+            self.record_success(time.monotonic() - started, saturated)
+        finally:
+            await self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency is not None else None,
+            "successes": self.successes,
+            "overloads": self.overloads,
+            "slow_calls": self.slow_calls,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,110 @@
+"""
+Derived fields that keep audit-log queries on indexes
+
+`search_tokens` holds lowercase tokens of the action, admin email and
+target id so search can run an anchored prefix match on a multikey index
+instead of unanchored regexes over three fields.
+"""
+import re
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+MIN_SEARCH_LENGTH = 2
+
+
+def naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert aware query bounds to match"""
+    if ts is not None and ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    """[start, end) of a YYYY-MM month, as timestamp bounds; raises ValueError for bad input"""
+    start = datetime.strptime(month, "%Y-%m")
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def search_tokens(action: str, admin_email: str, target_id: Optional[str]) -> List[str]:
+    """
+    Tokens for audit search. The action contributes its dotted prefixes and
+    segments ("user.credit.add" -> "user", "user.credit", "user.credit.add",
+    "credit", "add"); the email contributes itself, its local part and domain.
+    """
+    tokens: Set[str] = set()
+
+    action = (action or "").lower()
+    parts = [p for p in action.split(".") if p]
+    for i in range(len(parts)):
+        tokens.add(".".join(parts[:i + 1]))
+        tokens.add(parts[i])
+
+    email = (admin_email or "").lower()
+    if email:
+        tokens.add(email)
+        tokens.update(p for p in email.split("@") if p)
+
+    if target_id:
+        tokens.add(target_id.lower())
+
+    return sorted(tokens)
+
+
+def index_fields(action: str, admin_email: str, target_id: Optional[str]) -> Dict[str, Any]:
+    return {"search_tokens": search_tokens(action, admin_email, target_id)}
+
+
+def build_search_query(term: str) -> Dict[str, Any]:
+    """Anchored prefix match on search tokens; raises ValueError for too-short terms"""
+    term = term.strip().lower()
+    if len(term) < MIN_SEARCH_LENGTH:
+        raise ValueError(f"Search term must be at least {MIN_SEARCH_LENGTH} characters")
+    return {"search_tokens": {"$regex": "^" + re.escape(term)}}
+
+
+async def backfill_index_fields(batch_size: int = 1000) -> int:
+    """Populate search tokens on entries written before they existed"""
+    db = Database.get_db()
+    cursor = db.audit_logs.find(
+        {"search_tokens": {"$exists": False}},
+        {"_id": 1, "action": 1, "admin_email": 1, "target_id": 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    ops: List[UpdateOne] = []
+    async for log in cursor:
+        fields = index_fields(log.get("action"), log.get("admin_email"), log.get("target_id"))
+        ops.append(UpdateOne({"_id": log["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            await db.audit_logs.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.audit_logs.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    logger.info(f"Backfilled index fields for {updated} audit logs")
+    return updated
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def main():
+        await Database.connect_db()
+        try:
+            await backfill_index_fields()
+        finally:
+            await Database.close_db()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
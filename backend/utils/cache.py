@@ -0,0 +1,268 @@
+"""
+Read-through cache for hot, rarely-changing reference data
+
+A Cache serves values from its backend until they expire and loads misses
+through a caller-supplied coroutine. Concurrent misses for one key share a
+single load. Writers call `invalidate(key)`, which drops that key and stops
+its in-flight load from putting a (now stale) result back; other keys are
+untouched.
+
+Backends are chosen by CACHE_BACKEND:
+- "memory": per-process TTL + LRU dict (the default)
+- "mongo": entries in the shared `cache_entries` collection, so every worker
+  sees the same values and invalidations; values must be BSON-encodable
+
+Memory entries are invisible to invalidations on other workers, so only
+cache data that may be served stale for the TTL. Authentication and
+revocation checks (API keys, admin roles, suspensions) are not cached.
+
+Services opt in with the decorator; stats for every cache are available
+from `cache_stats()`:
+
+    @cached("active_prompt", ttl=60)
+    async def load_active_prompt(mode): ...
+
+    await load_active_prompt.invalidate(mode)
+"""
+import asyncio
+import functools
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import settings
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_COLLECTION = "cache_entries"
+
+# name -> Cache, for stats and bulk invalidation
+_registry: Dict[str, "Cache"] = {}
+
+
+class CacheBackend(ABC):
+    """Storage interface; `get` returns (found, value) so None can be cached"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """(True, value) for a live entry, else (False, None)"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for `ttl` seconds"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Drop one entry"""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Drop every entry"""
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process entries; least recently used are evicted past max_size"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.evictions = 0
+        # key -> (expires_at, value); LRU-ordered
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class MongoBackend(CacheBackend):
+    """
+    Entries shared by all workers. Expiry is checked on read; the TTL index
+    on expires_at (utils.database_indexes) removes old entries.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _id(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        doc = await Database.get_db()[SHARED_CACHE_COLLECTION].find_one(
+            {"_id": self._id(key), "expires_at": {"$gt": datetime.utcnow()}},
+            {"value": 1}
+        )
+        if doc is None:
+            return False, None
+        return True, doc.get("value")
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await Database.get_db()[SHARED_CACHE_COLLECTION].replace_one(
+            {"_id": self._id(key)},
+            {
+                "namespace": self.namespace,
+                "value": value,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl)
+            },
+            upsert=True
+        )
+
+    async def delete(self, key: str) -> None:
+        await Database.get_db()[SHARED_CACHE_COLLECTION].delete_one({"_id": self._id(key)})
+
+    async def clear(self) -> None:
+        await Database.get_db()[SHARED_CACHE_COLLECTION].delete_many({"namespace": self.namespace})
+
+
+def build_backend(name: str, max_size: int) -> CacheBackend:
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryBackend(max_size)
+    if settings.CACHE_BACKEND == "mongo":
+        return MongoBackend(name)
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
+
+
+class Cache:
+    """Named read-through cache with single-flight loads and hit/miss stats"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_size: Optional[int] = None,
+        backend: Optional[CacheBackend] = None,
+        cache_none: bool = False
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.cache_none = cache_none  # Off by default so unknown keys can't fill the cache
+        self.backend = backend or build_backend(name, max_size or settings.CACHE_DEFAULT_MAX_SIZE)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # Misses that joined an in-flight load
+        self.load_errors = 0
+        # key -> load task; a load only stores while it is still the key's current one
+        self._inflight: Dict[str, asyncio.Task] = {}
+        _registry[name] = self
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = await self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._load_done, key))
+        else:
+            self.coalesced += 1
+        # Shielded so one cancelled caller doesn't fail the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        except Exception:
+            self.load_errors += 1
+            raise
+        # Invalidated meanwhile (this load is no longer the key's current one): don't store
+        current = self._inflight.get(key) is asyncio.current_task()
+        if current and (value is not None or self.cache_none):
+            await self.backend.set(key, value, self.ttl)
+        return value
+
+    def _load_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def invalidate(self, key: str) -> None:
+        self._inflight.pop(key, None)
+        await self.backend.delete(key)
+
+    async def clear(self) -> None:
+        self._inflight.clear()
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "load_errors": self.load_errors,
+            "evictions": getattr(self.backend, "evictions", None),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def make_key(*args: Any) -> str:
+    return ":".join(str(arg) for arg in args)
+
+
+def cached(
+    name: str,
+    ttl: float,
+    max_size: Optional[int] = None,
+    cache_none: bool = False
+):
+    """
+    Cache an async function's result by its positional arguments. The
+    wrapper gains `.cache` and `.invalidate(*args)`.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        cache = Cache(name, ttl, max_size=max_size, cache_none=cache_none)
+
+        @functools.wraps(func)
+        async def wrapper(*args):
+            return await cache.get_or_load(make_key(*args), lambda: func(*args))
+
+        async def invalidate(*args):
+            await cache.invalidate(make_key(*args))
+
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
+
+
+def get_cache(name: str) -> Optional[Cache]:
+    return _registry.get(name)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -1,7 +1,21 @@
+"""
+Circuit breakers keyed per dependency (one per model, one per webhook host)
+
+A breaker opens when, over the last `window_seconds`, at least `min_calls`
+calls were made and the failure rate reached `failure_rate_threshold`.
+After `recovery_timeout` it lets `half_open_max_calls` concurrent probes
+through; it closes once that many succeed and re-opens on any probe
+failure. Rejected calls raise CircuitBreakerOpenError.
+
+State checks and transitions never await, so they are atomic with respect
+to other coroutines; the lock keeps `call` safe from threads too.
+"""
 import time
-import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Callable, Any
+from typing import Any, Callable, Deque, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,76 +25,190 @@ class CircuitState(Enum):
     OPEN = "open"      # Circuit is open, rejecting requests
     HALF_OPEN = "half_open"  # Testing if service recovered
 
+class CircuitBreakerOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+    
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit breaker '{name}' is OPEN; retry in {retry_after:.0f}s")
+
 class CircuitBreaker:
-    """Circuit breaker pattern implementation"""
+    """Sliding-window circuit breaker with limited half-open probes"""
     
     def __init__(
         self,
-        failure_threshold: int = 5,
-        recovery_timeout: int = 60,
-        expected_exception: type = Exception
+        name: str = "default",
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: int = 60,
+        recovery_timeout: float = 60,
+        half_open_max_calls: int = 1,
+        expected_exception: type = Exception,
+        is_failure: Optional[Callable[[BaseException], bool]] = None
     ):
-        self.failure_threshold = failure_threshold
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
         self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
         self.expected_exception = expected_exception
+        self.is_failure = is_failure
         
-        self.failure_count = 0
-        self.last_failure_time = None
         self.state = CircuitState.CLOSED
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # One [second, successes, failures] bucket per second with calls
+        self._buckets: Deque[List[int]] = deque()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        
+        # Metrics
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+        self.last_state_change: Optional[float] = None
+    
+    # Sliding window
+    def _trim(self, now: float):
+        oldest = int(now) - self.window_seconds
+        while self._buckets and self._buckets[0][0] <= oldest:
+            self._buckets.popleft()
+    
+    def _record(self, now: float, failed: bool):
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        self._buckets[-1][2 if failed else 1] += 1
+        self._trim(now)
+    
+    def window_counts(self, now: Optional[float] = None) -> tuple:
+        """(calls, failures) within the window"""
+        with self._lock:
+            self._trim(time.monotonic() if now is None else now)
+            successes = sum(bucket[1] for bucket in self._buckets)
+            failures = sum(bucket[2] for bucket in self._buckets)
+        return successes + failures, failures
+    
+    # Transitions (lock held)
+    def _transition(self, new_state: CircuitState, now: float):
+        old_state = self.state
+        if old_state == new_state:
+            return
+        self.state = new_state
+        self.last_state_change = time.time()
+        edge = f"{old_state.value}->{new_state.value}"
+        self.transitions[edge] = self.transitions.get(edge, 0) + 1
+        if new_state == CircuitState.OPEN:
+            self.opened_at = now
+            logger.warning(f"Circuit breaker '{self.name}': {edge}")
+        else:
+            logger.info(f"Circuit breaker '{self.name}': {edge}")
+        if new_state != CircuitState.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if new_state == CircuitState.CLOSED:
+            self._buckets.clear()
+    
+    def _before_call(self) -> bool:
+        """Admit or reject a call; returns whether it is a half-open probe"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                elapsed = now - self.opened_at
+                if elapsed < self.recovery_timeout:
+                    self.rejected += 1
+                    raise CircuitBreakerOpenError(self.name, self.recovery_timeout - elapsed)
+                self._transition(CircuitState.HALF_OPEN, now)
+            if self.state == CircuitState.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitBreakerOpenError(self.name, 0)
+                self._probes_in_flight += 1
+                return True
+            return False
+    
+    def _after_call(self, probe: bool, failed: Optional[bool]):
+        """Record an outcome; failed=None (e.g. cancelled) only frees a probe slot"""
+        now = time.monotonic()
+        with self._lock:
+            if failed is None:
+                if probe and self.state == CircuitState.HALF_OPEN:
+                    self._probes_in_flight -= 1
+                return
+            if probe:
+                if self.state != CircuitState.HALF_OPEN:
+                    return  # Another probe already decided the outcome
+                self._probes_in_flight -= 1
+                if failed:
+                    self._transition(CircuitState.OPEN, now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_max_calls:
+                        self._transition(CircuitState.CLOSED, now)
+                return
+            
+            self._record(now, failed)
+            if failed and self.state == CircuitState.CLOSED:
+                calls = sum(bucket[1] + bucket[2] for bucket in self._buckets)
+                failures = sum(bucket[2] for bucket in self._buckets)
+                if calls >= self.min_calls and failures / calls >= self.failure_rate_threshold:
+                    self._transition(CircuitState.OPEN, now)
+    
+    def _counts_as_failure(self, exc: BaseException) -> Optional[bool]:
+        if not isinstance(exc, Exception):
+            return None  # Cancellation says nothing about the dependency
+        if not isinstance(exc, self.expected_exception):
+            return False
+        return self.is_failure(exc) if self.is_failure else True
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
         """Execute function with circuit breaker protection"""
-        if self.state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                self.state = CircuitState.HALF_OPEN
-                logger.info("Circuit breaker: Moving to HALF_OPEN state")
-            else:
-                raise Exception("Circuit breaker is OPEN")
-        
+        probe = self._before_call()
         try:
             result = func(*args, **kwargs)
-            self._on_success()
-            return result
-        except self.expected_exception as e:
-            self._on_failure()
-            raise e
+        except BaseException as e:
+            self._after_call(probe, self._counts_as_failure(e))
+            raise
+        self._after_call(probe, False)
+        return result
     
     async def call_async(self, func: Callable, *args, **kwargs) -> Any:
         """Execute async function with circuit breaker protection"""
-        if self.state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                self.state = CircuitState.HALF_OPEN
-                logger.info("Circuit breaker: Moving to HALF_OPEN state")
-            else:
-                raise Exception("Circuit breaker is OPEN")
-        
-        try:
-            result = await func(*args, **kwargs)
-            self._on_success()
-            return result
-        except self.expected_exception as e:
-            self._on_failure()
-            raise e
-    
-    def _should_attempt_reset(self) -> bool:
-        """Check if enough time has passed to attempt reset"""
-        if self.last_failure_time is None:
-            return True
-        return time.time() - self.last_failure_time >= self.recovery_timeout
+        async with self.protect():
+            return await func(*args, **kwargs)
     
-    def _on_success(self):
-        """Reset circuit breaker on successful call"""
-        self.failure_count = 0
-        self.state = CircuitState.CLOSED
-        logger.debug("Circuit breaker: Success, state is CLOSED")
+    @asynccontextmanager
+    async def protect(self):
+        """`async with breaker.protect():` around one call"""
+        probe = self._before_call()
+        try:
+            yield
+        except BaseException as e:
+            self._after_call(probe, self._counts_as_failure(e))
+            raise
+        self._after_call(probe, False)
     
-    def _on_failure(self):
-        """Handle failure"""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
-            logger.warning(
-                f"Circuit breaker: OPENED after {self.failure_count} failures"
-            )
+    def stats(self) -> Dict[str, Any]:
+        calls, failures = self.window_counts()
+        return {
+            "state": self.state.value,
+            "window_calls": calls,
+            "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "last_state_change": self.last_state_change,
+        }
+
+# Process-wide breakers by key, e.g. "model:gemini/..." or "webhook_host:example.com"
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str, **options) -> CircuitBreaker:
+    """Breaker for a key, created with `options` on first use"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name=name, **options)
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
@@ -0,0 +1,49 @@
+"""
+Count strategies for admin listing totals
+
+Unfiltered totals come from collection metadata, filtered totals are cached
+for a short TTL, and exact counts run only when the caller asks for them.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from config import settings
+
+# (collection, canonical query) -> (expires_at, count); LRU-ordered
+_count_cache: "OrderedDict[Tuple[str, str], Tuple[float, int]]" = OrderedDict()
+
+
+def _cache_key(collection, query: Dict[str, Any]) -> Tuple[str, str]:
+    return collection.name, json.dumps(query, sort_keys=True, default=str)
+
+
+async def count_total(collection, query: Dict[str, Any], exact: bool = False) -> Tuple[int, bool]:
+    """
+    Total for a listing query as (count, is_estimate)
+
+    - exact: count_documents, and refresh the cached value
+    - unfiltered: estimated_document_count (collection metadata, no scan)
+    - filtered: cached count_documents result, reused for COUNT_CACHE_TTL seconds
+    """
+    key = _cache_key(collection, query)
+    now = time.monotonic()
+
+    if not exact:
+        if not query:
+            return await collection.estimated_document_count(), True
+
+        entry = _count_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _count_cache.move_to_end(key)
+            return entry[1], True
+
+    total = await collection.count_documents(query)
+    _count_cache[key] = (now + settings.COUNT_CACHE_TTL, total)
+    _count_cache.move_to_end(key)
+    while len(_count_cache) > settings.COUNT_CACHE_MAX_SIZE:
+        _count_cache.popitem(last=False)
+
+    # A fresh count is exact; for cache misses this is the same cost as before
+    return total, False
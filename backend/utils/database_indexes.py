@@ -1,71 +1,264 @@
 """
 Database index creation for performance optimization
+
+build_index_manifest lists every index by collection, each commented with
+the query shapes it serves. Compound keys follow equality -> sort -> range, so
+one index covers a filter, its newest-first ordering and the keyset tiebreak
+on id. Single-field indexes made redundant by a compound with the same prefix
+are listed in REDUNDANT_INDEXES and dropped. Check the plans against a live
+database with `python -m utils.verify_indexes`.
 """
 import logging
+from typing import Dict, Iterable, List
+
+from pymongo import ASCENDING as ASC, DESCENDING as DESC, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import settings
 from database import Database
 
 logger = logging.getLogger(__name__)
 
-async def create_indexes():
-    """Create database indexes for frequently queried fields"""
+# MongoDB error codes: dropping an index that does not exist; an existing
+# index with the same keys but other options (e.g. a changed TTL)
+INDEX_NOT_FOUND = 27
+INDEX_OPTIONS_CONFLICT = (85, 86)
+
+
+def build_index_manifest() -> Dict[str, List[IndexModel]]:
+    """Indexes per collection (retention TTL indexes are managed by RetentionService)"""
+    return {
+        "users": [
+            IndexModel([("id", ASC)], unique=True),
+            IndexModel([("email", ASC)], unique=True),
+            # Admin user list, newest first: unfiltered / by role / by suspension; role counts
+            IndexModel([("created_at", DESC), ("id", DESC)]),
+            IndexModel([("role", ASC), ("created_at", DESC), ("id", DESC)]),
+            IndexModel([("is_suspended", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Active users: daily credit reset scan and active-user counts
+            IndexModel(
+                [("is_suspended", ASC), ("id", ASC)],
+                name="active_users",
+                partialFilterExpression={"is_active": True}
+            ),
+            # Admin search (utils.user_search)
+            IndexModel([("email_lower", ASC)]),
+            IndexModel([("first_name_lower", ASC)]),
+            IndexModel([("last_name_lower", ASC)]),
+            IndexModel([("search_ngrams", ASC)]),
+        ],
+        "tryon_jobs": [
+            IndexModel([("id", ASC)], unique=True),
+            # Try-on history, abuse checks by user and time window, admin list by user
+            IndexModel([("user_id", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Admin list by user and status
+            IndexModel([("user_id", ASC), ("status", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Admin list by status, status counts
+            IndexModel([("status", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Stale queued/processing jobs for the recovery sweep
+            IndexModel([("status", ASC), ("updated_at", ASC)]),
+            # Admin list unfiltered, jobs-since aggregations
+            IndexModel([("created_at", DESC), ("id", DESC)]),
+        ],
+        "credit_transactions": [
+            IndexModel([("id", ASC)], unique=True),
+            # Credit history and usage analytics by user
+            IndexModel([("user_id", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Admin list by user and type
+            IndexModel([("user_id", ASC), ("type", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Admin list by type, purchase/usage totals
+            IndexModel([("type", ASC), ("created_at", DESC), ("id", DESC)]),
+            IndexModel([("created_at", DESC), ("id", DESC)]),
+            # One usage charge per job (CreditService.deduct_credits); existing
+            # duplicates only block this index, see _create_one_by_one
+            IndexModel(
+                [("reference_id", ASC), ("type", ASC)],
+                unique=True,
+                partialFilterExpression={"type": "usage", "reference_id": {"$type": "string"}}
+            ),
+        ],
+        "payments": [
+            IndexModel([("id", ASC)], unique=True),
+            IndexModel([("razorpay_order_id", ASC)], unique=True),
+            IndexModel([("razorpay_payment_id", ASC)]),
+            # Payment history by user
+            IndexModel([("user_id", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Failed-payment abuse check, admin list by user and status
+            IndexModel([("user_id", ASC), ("status", ASC), ("created_at", DESC), ("id", DESC)]),
+            # Revenue aggregations, failed-payment scan, admin list by status
+            IndexModel([("status", ASC), ("created_at", DESC), ("id", DESC)]),
+            IndexModel([("created_at", DESC), ("id", DESC)]),
+        ],
+        "invoices": [
+            IndexModel([("id", ASC)], unique=True),
+            IndexModel([("payment_id", ASC)]),
+            # Invoice list by user
+            IndexModel([("user_id", ASC), ("invoice_date", DESC), ("id", DESC)]),
+            # Latest invoice for invoice numbering
+            IndexModel([("invoice_date", DESC)]),
+        ],
+        "audit_logs": [
+            IndexModel([("timestamp", DESC), ("id", DESC)]),
+            IndexModel([("target_type", ASC), ("timestamp", DESC), ("id", DESC)]),
+            IndexModel([("target_id", ASC), ("timestamp", DESC), ("id", DESC)]),
+            IndexModel([("target_type", ASC), ("target_id", ASC), ("timestamp", DESC), ("id", DESC)]),
+            IndexModel([("admin_id", ASC), ("timestamp", DESC), ("id", DESC)]),
+            IndexModel([("admin_id", ASC), ("target_type", ASC), ("timestamp", DESC), ("id", DESC)]),
+            # Token search (utils.audit_index)
+            IndexModel([("search_tokens", ASC), ("timestamp", DESC)]),
+        ],
+        "webhooks": [
+            IndexModel([("id", ASC)], unique=True),
+            # Event fan-out: active subscriptions of a user for one event type; webhook list
+            IndexModel([("user_id", ASC), ("is_active", ASC), ("events", ASC)]),
+        ],
+        "webhook_deliveries": [
+            IndexModel([("id", ASC)], unique=True),
+            # Delivery history per webhook
+            IndexModel([("webhook_id", ASC), ("created_at", DESC)]),
+        ],
+        "webhook_batch_outbox": [
+            IndexModel([("id", ASC)], unique=True),
+            # Recovery sweep: oldest unrecorded events first; then the claimed events
+            IndexModel([("created_at", ASC)]),
+            IndexModel([("claim", ASC), ("created_at", ASC)]),
+            # Discard a deleted webhook's events
+            IndexModel([("webhook_id", ASC)]),
+        ],
+        "usage_events": [
+            # Usage stats and endpoint breakdown by user and period
+            IndexModel([("user_id", ASC), ("timestamp", DESC)]),
+        ],
+        "api_keys": [
+            IndexModel([("id", ASC)], unique=True),
+            IndexModel([("user_id", ASC)]),
+            # API key authentication
+            IndexModel([("key_hash", ASC)]),
+        ],
+        "prompts": [
+            IndexModel([("id", ASC)], unique=True),
+            # Active prompt per mode
+            IndexModel([("mode", ASC), ("is_active", ASC)]),
+            # Admin prompt list, all or by mode
+            IndexModel([("mode", ASC), ("created_at", DESC)]),
+            IndexModel([("created_at", DESC)]),
+        ],
+        "blocked_ips": [
+            # Blocklist refresh (covered) and unblock
+            IndexModel([("is_active", ASC), ("ip_address", ASC)]),
+        ],
+        "tryon_job_inputs": [
+            # Stored inputs by job for recovery and retries
+            IndexModel([("job_id", ASC)], unique=True),
+            # Inputs of failed or abandoned jobs expire
+            IndexModel([("created_at", ASC)], expireAfterSeconds=settings.TRYON_JOB_INPUT_TTL_HOURS * 3600),
+        ],
+        "rate_limit_events": [
+            # Sliding-window usage per key (utils.rate_limiter.MongoRateLimitStore)
+            IndexModel([("key", ASC), ("ts", ASC)]),
+            # Drop events once they leave the longest window
+            IndexModel([("expires_at", ASC)], expireAfterSeconds=0),
+        ],
+        "cache_entries": [
+            # Shared cache backend (utils.cache): drop entries once expired
+            IndexModel([("expires_at", ASC)], expireAfterSeconds=0),
+            # Cache.clear() per namespace
+            IndexModel([("namespace", ASC)]),
+        ],
+    }
+
+
+# Superseded by a compound index with the same leading key(s), or no longer queried
+REDUNDANT_INDEXES: Dict[str, List[str]] = {
+    "users": ["created_at_1"],
+    "tryon_jobs": ["user_id_1", "status_1", "created_at_1", "user_id_1_created_at_-1"],
+    "credit_transactions": ["user_id_1", "created_at_1", "user_id_1_created_at_-1"],
+    "payments": ["user_id_1", "created_at_1"],
+    "invoices": ["user_id_1", "created_at_1"],
+    "webhooks": ["user_id_1", "is_active_1"],
+    "api_keys": ["is_active_1"],
+    "audit_logs": ["month_1"],
+    # Retries are scheduled in-process; nothing queries pending deliveries by due time
+    "webhook_deliveries": ["pending_deliveries"],
+}
+
+
+async def drop_redundant_indexes(skip: Iterable[str] = ()):
+    db = Database.get_db()
+    for collection, names in REDUNDANT_INDEXES.items():
+        if collection in skip:
+            continue
+        for name in names:
+            try:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped redundant index {collection}.{name}")
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND:
+                    raise
+
+
+async def _create_one_by_one(collection, indexes: List[IndexModel]) -> List[str]:
+    """Build indexes separately so one that can't be built doesn't block the rest"""
+    failed = []
+    for index in indexes:
+        name = index.document["name"]
+        try:
+            await collection.create_indexes([index])
+        except OperationFailure as e:
+            if e.code in INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in index.document:
+                # TTL setting changed: retune the existing index in place
+                await collection.database.command("collMod", collection.name, index={
+                    "name": name,
+                    "expireAfterSeconds": index.document["expireAfterSeconds"]
+                })
+                logger.info(f"Updated TTL of index {collection.name}.{name}")
+                continue
+            # e.g. a unique index over existing duplicates: fix the data, then restart
+            logger.error(f"Could not create index {collection.name}.{name}: {e}")
+            failed.append(name)
+    return failed
+
+
+async def create_indexes() -> Dict[str, List[str]]:
+    """
+    Create the manifest's indexes, then drop the ones they supersede. Returns
+    the indexes that could not be built, by collection; other collections
+    are still indexed, and their redundant indexes dropped.
+    """
     db = Database.get_db()
-    
+    failed: Dict[str, List[str]] = {}
+
     try:
-        # Users collection indexes
-        await db.users.create_index("id", unique=True)
-        await db.users.create_index("email", unique=True)
-        await db.users.create_index("created_at")
-        logger.info("Created indexes for users collection")
-        
-        # TryOn Jobs collection indexes
-        await db.tryon_jobs.create_index("id", unique=True)
-        await db.tryon_jobs.create_index("user_id")
-        await db.tryon_jobs.create_index("status")
-        await db.tryon_jobs.create_index("created_at")
-        await db.tryon_jobs.create_index([("user_id", 1), ("created_at", -1)])
-        logger.info("Created indexes for tryon_jobs collection")
-        
-        # Credit Transactions collection indexes
-        await db.credit_transactions.create_index("id", unique=True)
-        await db.credit_transactions.create_index("user_id")
-        await db.credit_transactions.create_index("created_at")
-        await db.credit_transactions.create_index([("user_id", 1), ("created_at", -1)])
-        logger.info("Created indexes for credit_transactions collection")
-        
-        # Payments collection indexes
-        await db.payments.create_index("id", unique=True)
-        await db.payments.create_index("user_id")
-        await db.payments.create_index("razorpay_order_id", unique=True)
-        await db.payments.create_index("razorpay_payment_id")
-        await db.payments.create_index("created_at")
-        logger.info("Created indexes for payments collection")
-        
-        # Invoices collection indexes
-        await db.invoices.create_index("id", unique=True)
-        await db.invoices.create_index("user_id")
-        await db.invoices.create_index("payment_id")
-        await db.invoices.create_index("created_at")
-        logger.info("Created indexes for invoices collection")
-        
-        # Webhooks collection indexes
-        await db.webhooks.create_index("id", unique=True)
-        await db.webhooks.create_index("user_id")
-        await db.webhooks.create_index("is_active")
-        logger.info("Created indexes for webhooks collection")
-        
-        # API Keys collection indexes
-        await db.api_keys.create_index("id", unique=True)
-        await db.api_keys.create_index("user_id")
-        await db.api_keys.create_index("key_hash")
-        await db.api_keys.create_index("is_active")
-        logger.info("Created indexes for api_keys collection")
-        
-        logger.info("All database indexes created successfully")
-        
+        for collection, indexes in build_index_manifest().items():
+            try:
+                await db[collection].create_indexes(indexes)
+            except OperationFailure:
+                names = await _create_one_by_one(db[collection], indexes)
+                if names:
+                    failed[collection] = names
+            logger.info(f"Created indexes for {collection} collection")
+
+        # Only after the replacements exist, so no query shape goes unindexed
+        await drop_redundant_indexes(skip=failed)
+
+        if failed:
+            logger.error(f"Database indexes created except {failed}")
+        else:
+            logger.info("All database indexes created successfully")
+        return failed
+
     except Exception as e:
         logger.error(f"Error creating indexes: {str(e)}")
         raise
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(create_indexes())
+
+    async def main():
+        await Database.connect_db()
+        try:
+            await create_indexes()
+        finally:
+            await Database.close_db()
+
+    asyncio.run(main())
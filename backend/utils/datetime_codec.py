@@ -0,0 +1,105 @@
+"""
+Datetime storage for user, credit-transaction and API-key documents
+
+These documents used to store timestamps as ISO strings. They are now written
+as native BSON datetimes, like every other collection, so range queries,
+date indexes and $dateToString aggregations work on them. `decode_datetimes`
+only parses documents the migration has not reached yet:
+
+    python -m utils.datetime_codec
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+USER_DATETIME_FIELDS = ("created_at", "updated_at", "last_free_credit_reset", "last_login")
+CREDIT_TRANSACTION_DATETIME_FIELDS = ("created_at",)
+API_KEY_DATETIME_FIELDS = ("created_at", "last_used", "expires_at")
+
+MIGRATED_COLLECTIONS = {
+    "users": USER_DATETIME_FIELDS,
+    "credit_transactions": CREDIT_TRANSACTION_DATETIME_FIELDS,
+    "api_keys": API_KEY_DATETIME_FIELDS,
+}
+
+
+def parse_datetime(value: str) -> datetime:
+    """ISO string -> naive UTC datetime (the form MongoDB returns)"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def decode_datetimes(doc: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Parse any legacy string timestamps in place; returns the document"""
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, str):
+            doc[field] = parse_datetime(value)
+    return doc
+
+
+async def migrate_collection(name: str, fields: Iterable[str], batch_size: int = 1000) -> int:
+    """
+    Convert string timestamps to datetimes in batches. Each update matches
+    the old string values, so a concurrent write is never overwritten; the
+    migration can run online and be re-run until it reports zero.
+    """
+    fields = tuple(fields)
+    collection = Database.get_db()[name]
+    cursor = collection.find(
+        {"$or": [{field: {"$type": "string"}} for field in fields]},
+        {field: 1 for field in fields}
+    ).batch_size(batch_size)
+
+    migrated = 0
+    ops: List[UpdateOne] = []
+    async for doc in cursor:
+        legacy = {field: doc[field] for field in fields if isinstance(doc.get(field), str)}
+        converted = {}
+        for field, value in legacy.items():
+            try:
+                converted[field] = parse_datetime(value)
+            except ValueError:
+                logger.warning(f"Unparseable {name}.{field} on {doc['_id']}: {value!r}")
+        if not converted:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"], **{f: legacy[f] for f in converted}}, {"$set": converted}))
+        if len(ops) >= batch_size:
+            result = await collection.bulk_write(ops, ordered=False)
+            migrated += result.modified_count
+            ops = []
+    if ops:
+        result = await collection.bulk_write(ops, ordered=False)
+        migrated += result.modified_count
+
+    logger.info(f"Converted string timestamps on {migrated} {name} documents")
+    return migrated
+
+
+async def migrate_datetimes(batch_size: int = 1000) -> Dict[str, int]:
+    return {
+        name: await migrate_collection(name, fields, batch_size)
+        for name, fields in MIGRATED_COLLECTIONS.items()
+    }
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def main():
+        await Database.connect_db()
+        try:
+            await migrate_datetimes()
+        finally:
+            await Database.close_db()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Shared outbound HTTP client for webhook deliveries
+"""
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClient:
+    """Process-wide pooled httpx client, created and closed by the app lifespan"""
+
+    client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _http2_available() -> bool:
+        """HTTP/2 needs the optional `h2` package (installed via httpx[http2])"""
+        return importlib.util.find_spec("h2") is not None
+
+    @classmethod
+    def _build_client(cls) -> httpx.AsyncClient:
+        http2 = settings.WEBHOOK_HTTP2_ENABLED and cls._http2_available()
+        limits = httpx.Limits(
+            max_connections=settings.WEBHOOK_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.WEBHOOK_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.WEBHOOK_HTTP_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(
+            settings.WEBHOOK_HTTP_TIMEOUT,
+            connect=settings.WEBHOOK_HTTP_CONNECT_TIMEOUT
+        )
+        client = httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            http2=http2,
+            headers={"User-Agent": "TrailRoom-Webhook/1.0"}
+        )
+        logger.info(
+            f"HTTP client started (http2={http2}, "
+            f"max_connections={settings.WEBHOOK_HTTP_MAX_CONNECTIONS})"
+        )
+        return client
+
+    @classmethod
+    async def start(cls):
+        """Create the shared client"""
+        if cls.client is None or cls.client.is_closed:
+            cls.client = cls._build_client()
+
+    @classmethod
+    async def close(cls):
+        """Close the shared client and release pooled connections"""
+        if cls.client is not None and not cls.client.is_closed:
+            await cls.client.aclose()
+            logger.info("HTTP client closed")
+        cls.client = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Get the shared client, creating it lazily outside the app lifespan"""
+        if cls.client is None or cls.client.is_closed:
+            cls.client = cls._build_client()
+        return cls.client
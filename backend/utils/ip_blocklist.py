@@ -0,0 +1,113 @@
+"""
+In-memory IP blocklist with CIDR support
+"""
+import ipaddress
+import logging
+from typing import Iterable, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def normalize_ip_entry(value: str) -> str:
+    """
+    Canonical form for a blocklist entry: a bare address for single hosts,
+    otherwise a CIDR network. Raises ValueError for invalid input.
+    """
+    network = ipaddress.ip_network(value.strip(), strict=False)
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class PrefixTree:
+    """Binary trie over address bits; a node marked terminal blocks its whole subtree"""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root: List = [None, None, False]  # [zero child, one child, terminal]
+
+    def insert(self, network: IPNetwork):
+        address = int(network.network_address)
+        node = self.root
+        for shift in range(self.bits - 1, self.bits - 1 - network.prefixlen, -1):
+            if node[2]:
+                return  # Already covered by a shorter prefix
+            bit = (address >> shift) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        node[0] = node[1] = None  # Subtree is now fully covered
+        node[2] = True
+
+    def contains(self, address: int) -> bool:
+        node = self.root
+        for shift in range(self.bits - 1, -1, -1):
+            if node[2]:
+                return True
+            node = node[(address >> shift) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+class IPBlocklist:
+    """
+    Exact-address set plus per-family prefix trees for CIDR ranges.
+    `replace` rebuilds everything and swaps it in one assignment, so lookups
+    never see a half-built list.
+    """
+
+    def __init__(self, entries: Optional[Iterable[str]] = None):
+        self.replace(entries or [])
+
+    @staticmethod
+    def _build(entries: Iterable[str]):
+        exact: Set[str] = set()
+        v4 = PrefixTree(32)
+        v6 = PrefixTree(128)
+        has_ranges = False
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry.strip(), strict=False)
+            except ValueError:
+                logger.warning(f"Skipping invalid blocklist entry: {entry}")
+                continue
+            if network.prefixlen == network.max_prefixlen:
+                exact.add(str(network.network_address))
+            else:
+                (v4 if network.version == 4 else v6).insert(network)
+                has_ranges = True
+        return exact, v4, v6, has_ranges
+
+    def replace(self, entries: Iterable[str]):
+        entries = list(entries)
+        self._state = self._build(entries)
+        self._size = len(entries)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def is_blocked(self, ip: str) -> bool:
+        exact, v4, v6, has_ranges = self._state
+        if ip in exact:
+            return True
+        if not has_ranges and ":" not in ip:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if str(address) in exact:
+            return True
+        if not has_ranges:
+            return False
+        tree = v4 if address.version == 4 else v6
+        return tree.contains(int(address))
+
+
+# Process-wide blocklist consulted by IPBlockMiddleware
+ip_blocklist = IPBlocklist()
@@ -0,0 +1,197 @@
+"""
+Shared pool of model (LLM) chat clients
+
+Clients are keyed by provider, model and params and reused across jobs
+instead of being built per request. A checked-out client belongs to one
+call at a time; the pool's `reset` hook clears per-call state (such as
+chat history) before the client is handed out again, and clients are
+rebuilt after LLM_CLIENT_MAX_USES calls. Resets fail closed: unless the
+hook returns True, confirming it cleared the client's state, the client is
+discarded rather than reused, so one job's data never reaches the next. When every client for a key is
+busy and the pool is at LLM_CLIENT_POOL_SIZE, callers wait for one to
+come back.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 500  # Recent call durations kept per key for percentiles
+
+
+def client_key(provider: str, model: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Stable key, e.g. gemini/gemini-2.5-flash?modalities=image,text"""
+    key = f"{provider}/{model}"
+    if params:
+        encoded = "&".join(
+            f"{name}={','.join(map(str, value)) if isinstance(value, (list, tuple)) else value}"
+            for name, value in sorted(params.items())
+        )
+        key = f"{key}?{encoded}"
+    return key
+
+
+class PooledClient:
+    def __init__(self, client: Any):
+        self.client = client
+        self.uses = 0
+
+
+class ClientPool:
+    """Clients for one key, with in-flight and latency metrics"""
+
+    def __init__(
+        self,
+        key: str,
+        factory: Callable[[], Any],
+        reset: Optional[Callable[[Any], bool]] = None,
+        max_size: Optional[int] = None,
+        max_uses: Optional[int] = None
+    ):
+        self.key = key
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size or settings.LLM_CLIENT_POOL_SIZE
+        self.max_uses = max_uses if max_uses is not None else settings.LLM_CLIENT_MAX_USES
+        self._idle: List[PooledClient] = []
+        self._size = 0  # Idle plus checked out
+        self._available = asyncio.Condition()
+        self.in_flight = 0
+        self.created = 0
+        self.calls = 0
+        self.errors = 0
+        self.waits = 0  # Checkouts that had to wait for a free client
+        self.reset_failures = 0  # Clients discarded because reset couldn't confirm they were clean
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def _create(self) -> PooledClient:
+        self.created += 1
+        self._size += 1
+        return PooledClient(self.factory())
+
+    def warm_up(self, count: int) -> int:
+        """Build idle clients ahead of the first request; returns how many were added"""
+        added = 0
+        while self._size < min(count, self.max_size):
+            self._idle.append(self._create())
+            added += 1
+        return added
+
+    async def _acquire(self) -> PooledClient:
+        async with self._available:
+            if not self._idle and self._size >= self.max_size:
+                self.waits += 1
+                await self._available.wait_for(lambda: self._idle or self._size < self.max_size)
+            if self._idle:
+                return self._idle.pop()
+            return self._create()
+
+    async def _release(self, pooled: PooledClient, healthy: bool):
+        async with self._available:
+            pooled.uses += 1
+            if not healthy or (self.max_uses and pooled.uses >= self.max_uses):
+                self._size -= 1  # Dropped; the next checkout builds a fresh client
+            else:
+                try:
+                    clean = self.reset(pooled.client) if self.reset else True
+                except Exception as e:
+                    logger.warning(f"Discarding {self.key} client after reset error: {e}")
+                    clean = False
+                if clean:
+                    self._idle.append(pooled)
+                else:
+                    self.reset_failures += 1
+                    self._size -= 1
+            self._available.notify()
+
+    @asynccontextmanager
+    async def checkout(self):
+        pooled = await self._acquire()
+        self.in_flight += 1
+        self.calls += 1
+        started = time.monotonic()
+        healthy = True
+        try:
+            yield pooled.client
+        except BaseException:
+            # The client may hold a half-finished exchange; don't hand it out again
+            healthy = False
+            self.errors += 1
+            raise
+        finally:
+            self._latencies.append(time.monotonic() - started)
+            self.in_flight -= 1
+            await self._release(pooled, healthy)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 1)
+
+        return {
+            "in_flight": self.in_flight,
+            "idle": len(self._idle),
+            "size": self._size,
+            "max_size": self.max_size,
+            "created": self.created,
+            "calls": self.calls,
+            "errors": self.errors,
+            "waits": self.waits,
+            "reset_failures": self.reset_failures,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            },
+        }
+
+
+class ModelClientPool:
+    """Process-wide registry of client pools, one per model key"""
+
+    def __init__(self):
+        self._pools: Dict[str, ClientPool] = {}
+
+    def register(
+        self,
+        key: str,
+        factory: Callable[[], Any],
+        reset: Optional[Callable[[Any], bool]] = None,
+        max_size: Optional[int] = None
+    ) -> ClientPool:
+        """Register a key once; later registrations return the existing pool"""
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = ClientPool(key, factory, reset=reset, max_size=max_size)
+        return pool
+
+    def pool(self, key: str) -> ClientPool:
+        pool = self._pools.get(key)
+        if pool is None:
+            raise KeyError(f"No model client registered for {key}")
+        return pool
+
+    def checkout(self, key: str):
+        """`async with model_client_pool.checkout(key) as client:`"""
+        return self.pool(key).checkout()
+
+    def warm_up(self, count: Optional[int] = None) -> Dict[str, int]:
+        count = settings.LLM_CLIENT_POOL_WARM_SIZE if count is None else count
+        return {key: pool.warm_up(count) for key, pool in self._pools.items()}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {key: pool.stats() for key, pool in self._pools.items()}
+
+
+# Process-wide pool shared by try-on workers
+model_client_pool = ModelClientPool()
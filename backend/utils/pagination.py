@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination helpers for newest-first listings
+
+Pages are ordered by (sort_field desc, id desc). A cursor encodes the last
+row's (sort value, id) so the next page starts with an index seek instead of
+skipping over every earlier row.
+
+Sort values may be of mixed BSON types: rows not yet converted by
+`python -m utils.datetime_codec` still hold ISO strings. Mongo sorts
+by type first, so in descending order every date comes before every string,
+and a range on a date never matches a string. A date cursor therefore also
+admits all string values, so legacy rows are paged after the dated ones
+instead of being skipped.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def keyset_sort(sort_field: str) -> List[Tuple[str, int]]:
+    """Sort spec matching the cursor order; `id` breaks ties"""
+    return [(sort_field, -1), ("id", -1)]
+
+
+def encode_cursor(row: Dict[str, Any], sort_field: str) -> str:
+    """Opaque cursor pointing just past `row`"""
+    value = row.get(sort_field)
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": row["id"]}
+    else:
+        payload = {"t": "raw", "v": value, "id": row["id"]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor into (sort value, id); raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["v"]
+        if payload["t"] == "dt":
+            value = datetime.fromisoformat(value)
+        return value, str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def apply_cursor(query: Dict[str, Any], sort_field: str, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Restrict `query` to rows after the cursor
+    The top-level $lte bound lets the (…, sort_field, id) index seek straight
+    to the cursor position; the $or breaks ties on id.
+    """
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor)
+    after = {
+        sort_field: {"$lte": value},
+        "$or": [
+            {sort_field: {"$lt": value}},
+            {"id": {"$lt": last_id}}
+        ]
+    }
+    if isinstance(value, datetime):
+        # Legacy ISO-string values sort after every date (see module docstring)
+        after = {"$or": [after, {sort_field: {"$type": "string"}}]}
+    if not query:
+        return after
+    return {"$and": [query, after]}
+
+
+def next_cursor(rows: List[Dict[str, Any]], limit: int, sort_field: str) -> Optional[str]:
+    """Cursor for the following page, or None when this page wasn't full"""
+    if len(rows) < limit or not rows:
+        return None
+    return encode_cursor(rows[-1], sort_field)
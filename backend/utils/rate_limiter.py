@@ -0,0 +1,217 @@
+"""
+Sliding-window rate limiting and usage counters
+
+Usage is kept in memory by default, so a request over its limit is refused
+without touching the database; each worker then enforces its limits on its
+own traffic. RATE_LIMIT_STORE=mongo opts into the shared `rate_limit_events`
+collection, which holds limits across workers and instances but costs
+queries on every request.
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from config import settings
+from database import Database
+
+RATE_LIMIT_COLLECTION = "rate_limit_events"
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    count: int  # Usage in the window, including this hit if allowed
+    limit: int
+    retry_after: float  # Seconds until enough usage leaves the window
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.count, 0)
+
+
+def _retry_after(events: List[Tuple[float, int]], excess: int, window: float, now: float) -> float:
+    """Seconds until `excess` units of the oldest usage slide out of the window"""
+    for ts, c in events:
+        excess -= c
+        if excess <= 0:
+            return max(ts + window - now, 0.0)
+    return window
+
+
+class RateLimitStore(ABC):
+    """
+    Storage backend for sliding-window counters. `clock` supplies the
+    timestamps passed in as `now`; shared stores need wall-clock time.
+    """
+
+    shared = False
+    clock: Callable[[], float] = staticmethod(time.monotonic)
+
+    @abstractmethod
+    async def acquire(self, key: str, cost: int, limit: int, window: float, now: float) -> RateLimitResult:
+        """Record `cost` if the key stays within `limit` over the window"""
+
+    @abstractmethod
+    async def record(self, key: str, cost: int, now: float, retention: float) -> None:
+        """Record usage without enforcing a limit"""
+
+    @abstractmethod
+    async def count(self, key: str, since: float, now: float, retention: float) -> int:
+        """Usage recorded after `since`"""
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-key deque of (timestamp, cost) entries; pruned on access"""
+
+    SWEEP_EVERY = 10000  # Operations between sweeps of idle keys
+
+    def __init__(self):
+        self._events: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._ops = 0
+
+    def _prune(self, key: str, cutoff: float) -> Deque[Tuple[float, int]]:
+        events = self._events.get(key)
+        if events is None:
+            events = deque()
+            self._events[key] = events
+        while events and events[0][0] <= cutoff:
+            events.popleft()
+        return events
+
+    def _maybe_sweep(self, cutoff: float):
+        self._ops += 1
+        if self._ops % self.SWEEP_EVERY:
+            return
+        for key in [k for k, events in self._events.items() if not events or events[-1][0] <= cutoff]:
+            del self._events[key]
+
+    async def acquire(self, key: str, cost: int, limit: int, window: float, now: float) -> RateLimitResult:
+        cutoff = now - window
+        self._maybe_sweep(cutoff)
+        events = self._prune(key, cutoff)
+        used = sum(c for _, c in events)
+
+        if used + cost > limit:
+            # Wait until enough of the oldest usage slides out of the window
+            return RateLimitResult(False, used, limit, _retry_after(list(events), used + cost - limit, window, now))
+
+        events.append((now, cost))
+        return RateLimitResult(True, used + cost, limit, 0.0)
+
+    async def record(self, key: str, cost: int, now: float, retention: float) -> None:
+        self._maybe_sweep(now - retention)
+        self._prune(key, now - retention).append((now, cost))
+
+    async def count(self, key: str, since: float, now: float, retention: float) -> int:
+        events = self._events.get(key)
+        if not events:
+            return 0
+        self._prune(key, now - retention)
+        return sum(c for ts, c in events if ts > since)
+
+
+class MongoRateLimitStore(RateLimitStore):
+    """
+    One document per hit in `rate_limit_events`, shared by every worker.
+    acquire inserts first and counts after, withdrawing the hit if it went
+    over the limit: concurrent callers may both be refused near the limit,
+    but never both admitted past it. The TTL index on expires_at
+    (utils.database_indexes) removes old events.
+    """
+
+    shared = True
+    clock = staticmethod(time.time)
+
+    async def _events(self, key: str, since: float) -> List[Tuple[float, int]]:
+        docs = await Database.get_db()[RATE_LIMIT_COLLECTION].find(
+            {"key": key, "ts": {"$gt": since}},
+            {"_id": 0, "ts": 1, "cost": 1}
+        ).sort("ts", 1).to_list(length=None)
+        return [(doc["ts"], doc["cost"]) for doc in docs]
+
+    async def _insert(self, key: str, cost: int, now: float, retention: float) -> ObjectId:
+        event_id = ObjectId()
+        await Database.get_db()[RATE_LIMIT_COLLECTION].insert_one({
+            "_id": event_id,
+            "key": key,
+            "ts": now,
+            "cost": cost,
+            "expires_at": datetime.utcnow() + timedelta(seconds=retention)
+        })
+        return event_id
+
+    async def acquire(self, key: str, cost: int, limit: int, window: float, now: float) -> RateLimitResult:
+        event_id = await self._insert(key, cost, now, window)
+        events = await self._events(key, now - window)
+        used = sum(c for _, c in events)
+        if used <= limit:
+            return RateLimitResult(True, used, limit, 0.0)
+
+        await Database.get_db()[RATE_LIMIT_COLLECTION].delete_one({"_id": event_id})
+        used -= cost
+        # Own hit included above; the oldest entries decide when there is room
+        return RateLimitResult(False, used, limit, _retry_after(events, used + cost - limit, window, now))
+
+    async def record(self, key: str, cost: int, now: float, retention: float) -> None:
+        await self._insert(key, cost, now, retention)
+
+    async def count(self, key: str, since: float, now: float, retention: float) -> int:
+        return sum(c for _, c in await self._events(key, since))
+
+
+def build_rate_limit_store() -> RateLimitStore:
+    if settings.RATE_LIMIT_STORE == "memory":
+        return InMemoryRateLimitStore()
+    if settings.RATE_LIMIT_STORE == "mongo":
+        return MongoRateLimitStore()
+    raise ValueError(f"Unknown rate limit store: {settings.RATE_LIMIT_STORE}")
+
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` units of cost per key within a rolling window"""
+
+    def __init__(self, limit: int, window_seconds: float, store: Optional[RateLimitStore] = None):
+        self.limit = limit
+        self.window = window_seconds
+        self.store = store or build_rate_limit_store()
+        self.started_at = time.monotonic()
+
+    async def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Consume `cost` units if the key is under its limit"""
+        return await self.store.acquire(key, cost, self.limit, self.window, self.store.clock())
+
+    async def record(self, key: str, cost: int = 1) -> None:
+        """Count usage without enforcing the limit"""
+        await self.store.record(key, cost, self.store.clock(), self.window)
+
+    async def count(self, key: str, window_seconds: Optional[float] = None) -> int:
+        """Usage for a key over the last `window_seconds` (at most the limiter window)"""
+        now = self.store.clock()
+        window = min(window_seconds or self.window, self.window)
+        return await self.store.count(key, now - window, now, self.window)
+
+    def covers(self, window_seconds: float) -> bool:
+        """
+        Whether counts for this window are complete: the window fits in the
+        retention, and the store sees every process's traffic and has been
+        counting at least that long (a shared store outlives restarts).
+        """
+        if window_seconds > self.window:
+            return False
+        if self.store.shared:
+            return True
+        if not settings.RATE_LIMIT_SINGLE_PROCESS:
+            return False
+        return time.monotonic() - self.started_at >= window_seconds
+
+
+# Try-on request rate per user (enforced at the route)
+tryon_request_limiter = SlidingWindowLimiter(settings.TRYON_REQUESTS_PER_MINUTE, 60)
+
+# Try-on jobs created per user per hour (enforced at the route, read by abuse detection)
+tryon_job_counter = SlidingWindowLimiter(settings.TRYON_JOBS_PER_HOUR, 3600)
@@ -0,0 +1,213 @@
+"""
+Deadline, retry and hedging for calls to a model provider
+
+ResilientCaller.call runs an attempt function under an overall deadline:
+- each attempt gets min(attempt_timeout, time left) and is cancelled past it
+- retryable failures (429 / 5xx / timeouts) are retried with full-jitter
+  exponential backoff, up to max_attempts and never past the deadline
+- with hedging on, an attempt still running at the observed p95 latency
+  gets one duplicate; whichever finishes first wins and the other is
+  cancelled
+
+Every attempt, including hedges and cancelled losers, is appended to the
+caller's `attempts` list so it can be stored with the job.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import settings
+from utils.adaptive_limiter import is_overload_error
+from utils.circuit_breaker import CircuitBreakerOpenError
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 500
+# Backstop on top of the attempt timeout, so the timeout inside `fn` (seen by
+# its limiter and breaker) normally fires first
+ATTEMPT_GRACE_SECONDS = 1.0
+
+# name -> caller, for metrics
+_callers: Dict[str, "ResilientCaller"] = {}
+
+
+class DeadlineExceededError(Exception):
+    """The call ran out of time before an attempt succeeded"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitBreakerOpenError):
+        return False  # Retrying would only be rejected again
+    return is_overload_error(exc)
+
+
+class ResilientCaller:
+    """Shared per model; keeps the latency samples hedging is based on"""
+
+    def __init__(
+        self,
+        name: str,
+        deadline: Optional[float] = None,
+        attempt_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_min_samples: Optional[int] = None,
+        retryable: Callable[[BaseException], bool] = is_retryable
+    ):
+        self.name = name
+        self.deadline = deadline or settings.LLM_CALL_DEADLINE_SECONDS
+        self.attempt_timeout = attempt_timeout or settings.LLM_ATTEMPT_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or settings.LLM_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else settings.LLM_RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else settings.LLM_RETRY_MAX_DELAY
+        self.hedge = settings.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self.hedge_min_samples = hedge_min_samples or settings.LLM_HEDGE_MIN_SAMPLES
+        self.retryable = retryable
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        _callers[name] = self
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def backoff(self, retry: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^retry)]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+    async def call(
+        self,
+        fn: Callable[[float], Awaitable[Any]],
+        attempts: Optional[List[Dict[str, Any]]] = None
+    ) -> Any:
+        """
+        Run `fn(timeout)` until it succeeds, a non-retryable error is raised
+        or the deadline passes. `fn` should apply the timeout to the provider
+        call itself so its own limiter and breaker see timeouts.
+        """
+        attempts = attempts if attempts is not None else []
+        deadline_at = time.monotonic() + self.deadline
+        self.calls += 1
+        last_error: Optional[BaseException] = None
+
+        for retry in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return await self._round(fn, min(self.attempt_timeout, remaining), attempts)
+            except Exception as e:
+                last_error = e
+                if not self.retryable(e) or retry == self.max_attempts - 1:
+                    self.failures += 1
+                    raise
+            delay = self.backoff(retry)
+            if time.monotonic() + delay >= deadline_at:
+                break
+            self.retries += 1
+            logger.info(f"{self.name}: retrying in {delay:.1f}s after {last_error}")
+            await asyncio.sleep(delay)
+
+        self.failures += 1
+        raise DeadlineExceededError(
+            f"Model call deadline of {self.deadline:.0f}s exceeded after {len(attempts)} attempts"
+        ) from last_error
+
+    async def _round(self, fn, timeout: float, attempts: List[Dict[str, Any]]) -> Any:
+        """One attempt, plus a hedge if it outlives the p95 latency"""
+        tasks = {asyncio.ensure_future(self._attempt(fn, timeout, attempts, hedge=False))}
+        hedge_tasks = set()
+        hedge_delay = self.p95() if self.hedge else None
+        errors: List[BaseException] = []
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=hedge_delay,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is past p95: race a duplicate against it
+                    hedge_delay = None
+                    self.hedges += 1
+                    hedge_task = asyncio.ensure_future(self._attempt(fn, timeout, attempts, hedge=True))
+                    hedge_tasks.add(hedge_task)
+                    tasks.add(hedge_task)
+                    continue
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task in hedge_tasks:
+                            self.hedge_wins += 1
+                        return task.result()
+                    errors.append(task.exception())
+                hedge_delay = None  # Don't hedge an attempt after its twin failed
+            raise errors[-1]
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _attempt(self, fn, timeout: float, attempts: List[Dict[str, Any]], hedge: bool) -> Any:
+        self.attempts += 1
+        record: Dict[str, Any] = {
+            "attempt": len(attempts) + 1,
+            "hedge": hedge,
+            "started_at": datetime.utcnow(),
+            "timeout_seconds": round(timeout, 1),
+        }
+        attempts.append(record)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(timeout), timeout + ATTEMPT_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            record["outcome"] = "timeout"
+            record["error"] = f"Timed out after {timeout:.0f}s"
+            raise
+        except asyncio.CancelledError:
+            record["outcome"] = "cancelled"
+            raise
+        except Exception as e:
+            record["outcome"] = "error"
+            record["error"] = str(e)[:500]
+            raise
+        else:
+            record["outcome"] = "success"
+            self._latencies.append(time.monotonic() - started)
+            return result
+        finally:
+            record["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+def caller_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: caller.stats() for name, caller in _callers.items()}
@@ -0,0 +1,61 @@
+"""
+Batched user enrichment for admin listings
+
+Emails are cached per process for USER_EMAIL_CACHE_TTL. A user's email is
+set at signup and never changed or removed afterwards, so entries need no
+invalidation. Lookups read the primary: a user created moments ago may not
+have reached a secondary yet.
+"""
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from config import settings
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# user_id -> (expires_at, email); LRU-ordered
+_email_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+
+async def get_user_emails(user_ids: Iterable[str]) -> Dict[str, str]:
+    """Resolve emails for many users with at most one $in query"""
+    now = time.monotonic()
+    emails: Dict[str, str] = {}
+    missing = []
+    for user_id in set(user_ids):
+        if not user_id:
+            continue
+        entry = _email_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _email_cache.move_to_end(user_id)
+            emails[user_id] = entry[1]
+        else:
+            missing.append(user_id)
+
+    if missing:
+        db = Database.get_db()
+        expires_at = now + settings.USER_EMAIL_CACHE_TTL
+        async for user in db.users.find(
+            {"id": {"$in": missing}},
+            {"_id": 0, "id": 1, "email": 1}
+        ):
+            emails[user["id"]] = user.get("email")
+            _email_cache[user["id"]] = (expires_at, user.get("email"))
+            _email_cache.move_to_end(user["id"])
+        while len(_email_cache) > settings.USER_EMAIL_CACHE_MAX_SIZE:
+            _email_cache.popitem(last=False)
+
+    return emails
+
+
+async def attach_user_emails(rows: List[dict], user_field: str = "user_id") -> List[dict]:
+    """Set `user_email` on each row whose user exists"""
+    emails = await get_user_emails(row.get(user_field) for row in rows)
+    for row in rows:
+        email = emails.get(row.get(user_field))
+        if email is not None:
+            row["user_email"] = email
+    return rows
@@ -0,0 +1,120 @@
+"""
+Indexed user search for the admin user list
+
+Each user document carries lowercase copies of its searchable fields and a
+`search_ngrams` array of trigrams. Short terms run prefix-anchored regexes on
+the lowercase fields; longer terms narrow candidates through the multikey
+trigram index and confirm the substring match on those candidates only.
+
+Users created before the fields existed are filled in by
+backfill_search_fields() at startup; until no user lacks them, searches
+fall back to the unindexed regex scan so nobody drops out of the results.
+"""
+import re
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import UpdateOne
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ("email", "first_name", "last_name")
+NGRAM_SIZE = 3
+
+# Set once no user lacks search fields; never cleared, as new users get them on signup
+_fields_complete = False
+
+
+def normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def ngrams(value: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """All length-n substrings of an already-normalized value"""
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+
+def search_fields(email: Optional[str], first_name: Optional[str], last_name: Optional[str]) -> Dict[str, Any]:
+    """Derived search fields to store alongside a user document"""
+    values = dict(zip(SEARCH_FIELDS, (normalize(email), normalize(first_name), normalize(last_name))))
+    grams: Set[str] = set()
+    for value in values.values():
+        grams |= ngrams(value)
+    fields = {f"{name}_lower": value for name, value in values.items()}
+    fields["search_ngrams"] = sorted(grams)
+    return fields
+
+
+def build_search_query(term: str) -> Dict[str, Any]:
+    """Index-friendly query for a case-insensitive substring search"""
+    term = normalize(term)
+    if len(term) < NGRAM_SIZE:
+        # Too short for trigrams; anchored regexes can seek the lowercase indexes
+        prefix = "^" + re.escape(term)
+        return {"$or": [{f"{name}_lower": {"$regex": prefix}} for name in SEARCH_FIELDS]}
+
+    # Every trigram of the term must appear; the regex then drops false positives
+    pattern = re.escape(term)
+    return {
+        "search_ngrams": {"$all": sorted(ngrams(term))},
+        "$or": [{f"{name}_lower": {"$regex": pattern}} for name in SEARCH_FIELDS]
+    }
+
+
+def build_regex_search_query(term: str) -> Dict[str, Any]:
+    """Unindexed case-insensitive match on the original fields"""
+    pattern = re.escape(term.strip())
+    return {"$or": [{name: {"$regex": pattern, "$options": "i"}} for name in SEARCH_FIELDS]}
+
+
+async def search_query(db, term: str) -> Dict[str, Any]:
+    """The indexed query once every user has search fields, the regex scan until then"""
+    global _fields_complete
+    if not _fields_complete:
+        _fields_complete = await db.users.find_one({"search_ngrams": {"$exists": False}}, {"_id": 1}) is None
+    if _fields_complete:
+        return build_search_query(term)
+    return build_regex_search_query(term)
+
+
+async def backfill_search_fields(batch_size: int = 1000) -> int:
+    """Populate search fields on users created before they existed"""
+    db = Database.get_db()
+    cursor = db.users.find(
+        {"search_ngrams": {"$exists": False}},
+        {"_id": 1, "email": 1, "first_name": 1, "last_name": 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    ops: List[UpdateOne] = []
+    async for user in cursor:
+        fields = search_fields(user.get("email"), user.get("first_name"), user.get("last_name"))
+        ops.append(UpdateOne({"_id": user["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            await db.users.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    global _fields_complete
+    _fields_complete = True
+    logger.info(f"Backfilled search fields for {updated} users")
+    return updated
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def main():
+        await Database.connect_db()
+        try:
+            await backfill_search_fields()
+        finally:
+            await Database.close_db()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
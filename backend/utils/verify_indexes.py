@@ -0,0 +1,155 @@
+"""
+Explain-based check that hot query shapes are served by indexes
+
+Runs `explain` (queryPlanner verbosity, nothing is executed) for each listed
+query shape and fails any whose winning plan contains a collection scan or
+an in-memory sort. Run against a database with indexes created:
+
+    python -m utils.verify_indexes
+"""
+import sys
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+@dataclass
+class QueryShape:
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Dict[str, int]] = None
+    projection: Optional[Dict[str, int]] = None
+    allowed_stages: Set[str] = field(default_factory=set)  # e.g. SORT for unsorted multikey matches
+
+
+def _query_shapes() -> List[QueryShape]:
+    now = datetime.utcnow()
+    hour_ago = now - timedelta(hours=1)
+    week_ago = now - timedelta(days=7)
+    newest = {"created_at": -1, "id": -1}
+    return [
+        # users
+        QueryShape("admin users", "users", {}, newest),
+        QueryShape("admin users by role", "users", {"role": "paid"}, newest),
+        QueryShape("admin users by suspension", "users", {"is_suspended": True}, newest),
+        QueryShape("user by id", "users", {"id": "x"}),
+        QueryShape("user by email", "users", {"email": "x@example.com"}),
+        QueryShape("user search prefix", "users", {"email_lower": {"$regex": "^ab"}}),
+        QueryShape("user search trigram", "users", {"search_ngrams": {"$all": ["abc", "bcd"]}}),
+        QueryShape("daily reset scan", "users", {"is_active": True, "is_suspended": False}, projection={"id": 1}),
+        # tryon_jobs
+        QueryShape("try-on history", "tryon_jobs", {"user_id": "x"}, newest),
+        QueryShape("admin jobs", "tryon_jobs", {}, newest),
+        QueryShape("admin jobs by status", "tryon_jobs", {"status": "failed"}, newest),
+        QueryShape("admin jobs by user and status", "tryon_jobs", {"user_id": "x", "status": "failed"}, newest),
+        QueryShape("abuse usage window", "tryon_jobs", {"user_id": "x", "created_at": {"$gte": hour_ago}}),
+        QueryShape("jobs since", "tryon_jobs", {"created_at": {"$gte": hour_ago}}),
+        QueryShape("stale jobs", "tryon_jobs", {"status": {"$in": ["queued", "processing"]}, "updated_at": {"$lt": hour_ago}},
+                   {"updated_at": 1}),
+        # credit_transactions
+        QueryShape("credit history", "credit_transactions", {"user_id": "x"}, newest),
+        QueryShape("admin transactions by type", "credit_transactions", {"type": "usage"}, newest),
+        QueryShape("admin transactions by user and type", "credit_transactions", {"user_id": "x", "type": "usage"}, newest),
+        QueryShape("usage charge by reference", "credit_transactions", {"reference_id": "x", "type": "usage"}),
+        QueryShape("usage analytics", "credit_transactions", {"user_id": "x", "created_at": {"$gte": week_ago}}),
+        # payments
+        QueryShape("payment history", "payments", {"user_id": "x"}, newest),
+        QueryShape("admin payments by status", "payments", {"status": "completed"}, newest),
+        QueryShape("failed payments by user", "payments", {"user_id": "x", "status": "failed", "created_at": {"$gte": week_ago}}),
+        QueryShape("revenue since", "payments", {"status": "completed", "created_at": {"$gte": week_ago}}),
+        QueryShape("payment by order", "payments", {"razorpay_order_id": "x"}),
+        # invoices
+        QueryShape("invoice list", "invoices", {"user_id": "x"}, {"invoice_date": -1, "id": -1}),
+        QueryShape("latest invoice", "invoices", {}, {"invoice_date": -1}),
+        QueryShape("invoice by payment", "invoices", {"payment_id": "x"}),
+        # audit_logs
+        QueryShape("audit logs", "audit_logs", {}, {"timestamp": -1, "id": -1}),
+        QueryShape("audit logs by target", "audit_logs", {"target_type": "user", "target_id": "x"}, {"timestamp": -1, "id": -1}),
+        QueryShape("audit logs by admin", "audit_logs", {"admin_id": "x"}, {"timestamp": -1, "id": -1}),
+        QueryShape("audit search", "audit_logs", {"search_tokens": {"$regex": "^user"}}, {"timestamp": -1},
+                   allowed_stages={"SORT"}),
+        # webhooks
+        QueryShape("webhook fan-out", "webhooks", {"user_id": "x", "is_active": True, "events": "tryon.completed"}),
+        QueryShape("webhook deliveries", "webhook_deliveries", {"webhook_id": "x"}, {"created_at": -1}),
+        QueryShape("batch outbox recovery", "webhook_batch_outbox", {"created_at": {"$lt": now}}, {"created_at": 1}),
+        QueryShape("batch outbox claim", "webhook_batch_outbox", {"claim": "x"}, {"created_at": 1}),
+        # usage_events
+        QueryShape("usage events", "usage_events", {"user_id": "x", "timestamp": {"$gte": week_ago, "$lte": now}}),
+        # rate_limit_events
+        QueryShape("rate limit window", "rate_limit_events", {"key": "x", "ts": {"$gt": 0}}, {"ts": 1}),
+        # api_keys, prompts, blocked_ips
+        QueryShape("api key auth", "api_keys", {"key_hash": "x", "is_active": True}),
+        QueryShape("api keys by user", "api_keys", {"user_id": "x"}),
+        QueryShape("active prompt", "prompts", {"mode": "top", "is_active": True}),
+        QueryShape("admin prompts by mode", "prompts", {"mode": "top"}, {"created_at": -1}),
+        QueryShape("active blocklist", "blocked_ips", {"is_active": True}, projection={"_id": 0, "ip_address": 1}),
+    ]
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    pending = [plan.get("queryPlan", plan)]
+    while pending:
+        node = pending.pop()
+        yield node
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+        pending.extend(node.get("inputStages", []))
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Stage names in an explain plan tree"""
+    return [node["stage"] for node in _plan_nodes(plan) if "stage" in node]
+
+
+def plan_indexes(plan: Dict[str, Any]) -> List[str]:
+    """Index names used by an explain plan tree"""
+    return [node["indexName"] for node in _plan_nodes(plan) if "indexName" in node]
+
+
+async def verify_indexes() -> List[str]:
+    """Explain every shape; returns descriptions of the failing ones"""
+    db = Database.get_db()
+    failures = []
+    for shape in _query_shapes():
+        command: Dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = shape.sort
+        if shape.projection:
+            command["projection"] = shape.projection
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        plan = explain["queryPlanner"]["winningPlan"]
+        bad = (BAD_STAGES - shape.allowed_stages) & set(plan_stages(plan))
+        indexes = ", ".join(plan_indexes(plan)) or "none"
+        if bad:
+            failures.append(f"{shape.name} ({shape.collection}): {', '.join(sorted(bad))}")
+            logger.error(f"FAIL {shape.name}: {', '.join(sorted(bad))} (indexes: {indexes})")
+        else:
+            logger.info(f"ok   {shape.name}: {indexes}")
+    return failures
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def main() -> int:
+        await Database.connect_db()
+        try:
+            failures = await verify_indexes()
+        finally:
+            await Database.close_db()
+        if failures:
+            logger.error(f"{len(failures)} query shapes are not fully indexed")
+            return 1
+        logger.info("All query shapes are served by indexes")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(asyncio.run(main()))